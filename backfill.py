@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Resumable historical backfill into the historical_data collection
+
+Usage:
+    python backfill.py --symbols SPY,QQQ --intervals 1d,1h --years 5
+    python backfill.py --symbols @symbols.txt          # resumes from the checkpoint
+
+Requires the MONGODB_URI environment variable.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pymongo import ASCENDING, MongoClient
+
+from bar_store import yahoo_download
+from indicator_engine import BarPanel, compute_panel_indicators
+from market_data_fetcher import NUMPY_CODEC_OPTIONS, MarketDataBatchWriter
+
+# interval: (history Yahoo serves in days, days per chunk, warm-up days for a 50-bar SMA)
+INTERVALS = {
+    '1d': (None, 365, 80),
+    '1h': (729, 180, 14),
+    '30m': (59, 30, 5),
+    '15m': (59, 30, 4),
+    '5m': (59, 15, 3),
+    '1m': (7, 7, 1)
+}
+
+DEFAULT_CHECKPOINT = os.path.join('data', 'backfill_checkpoint.json')
+EPOCH = datetime(1970, 1, 1)
+
+
+class BackfillChunk:
+    def __init__(self, symbols: List[str], interval: str, start: datetime, end: datetime):
+        """One batched download: a group of symbols over [start, end) at one interval"""
+        self.symbols = symbols
+        self.interval = interval
+        self.start = start
+        self.end = end
+
+    @property
+    def key(self) -> str:
+        return f"{','.join(self.symbols)}|{self.interval}|{self.start:%Y-%m-%d}|{self.end:%Y-%m-%d}"
+
+
+class Checkpoint:
+    def __init__(self, path: str):
+        """
+        JSON file of completed chunk keys, rewritten atomically after every chunk
+
+        Args:
+            path: Checkpoint file location
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.completed = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.completed = set(json.load(f).get('completed', []))
+
+    def done(self, chunk: BackfillChunk) -> bool:
+        return chunk.key in self.completed
+
+    def mark_done(self, chunk: BackfillChunk):
+        with self.lock:
+            self.completed.add(chunk.key)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'completed': sorted(self.completed), 'updated': datetime.utcnow().isoformat()}, f)
+            os.replace(tmp_path, self.path)
+
+
+def plan_chunks(symbols: List[str], intervals: List[str], years: float, group_size: int = 20,
+                now: Optional[datetime] = None) -> List[BackfillChunk]:
+    """
+    Split the backfill into (symbol group, interval, date window) chunks
+
+    Args:
+        symbols: Symbols to backfill
+        intervals: Bar intervals (keys of INTERVALS)
+        years: Daily history to load; intraday history is capped at what Yahoo serves
+        group_size: Symbols per batched download
+        now: End of the backfill (defaults to today)
+
+    Returns:
+        Chunks in chronological order per interval (the first daily window
+        may start up to chunk_days earlier than requested)
+    """
+    end = (now or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    groups = [symbols[i:i + group_size] for i in range(0, len(symbols), group_size)]
+    chunks = []
+    for interval in intervals:
+        max_days, chunk_days, warmup_days = INTERVALS[interval]
+        # Intraday warm-up bars must also fall inside the window Yahoo serves
+        days = int(years * 365) if max_days is None else min(int(years * 365), max_days - warmup_days)
+        # Windows sit on fixed chunk_days boundaries so completed chunks keep
+        # their checkpoint keys when the backfill is resumed on a later day
+        first = end - timedelta(days=days)
+        boundary = EPOCH + timedelta(days=(first - EPOCH).days // chunk_days * chunk_days)
+        # ...except that the first intraday window cannot reach past the history
+        # Yahoo serves; only its start is clamped, later boundaries stay on the grid
+        start = max(boundary, first) if max_days is not None else boundary
+        while start < end:
+            boundary += timedelta(days=chunk_days)
+            chunk_end = min(boundary, end)
+            chunks.extend(BackfillChunk(group, interval, start, chunk_end) for group in groups)
+            start = chunk_end
+    return chunks
+
+
+def chunk_documents(chunk: BackfillChunk, panel: BarPanel) -> List[Dict]:
+    """
+    historical_data documents for a chunk, with indicators computed on the whole panel
+
+    Warm-up bars before chunk.start only feed the indicators and are not returned.
+    """
+    indicators = compute_panel_indicators(panel.close, panel.volume)
+    dates = pd.DatetimeIndex(panel.index)
+    dates = (dates.tz_convert('UTC').tz_localize(None) if dates.tz is not None else dates).to_pydatetime()
+    first_row = int(np.searchsorted(dates, chunk.start))
+
+    documents = []
+    for j, symbol in enumerate(panel.symbols):
+        for i in range(first_row, len(dates)):
+            close = panel.close[i, j]
+            if np.isnan(close):
+                continue
+            documents.append({
+                '_id': f"{symbol}_{chunk.interval}_{dates[i]:%Y%m%d_%H%M}",
+                'symbol': symbol,
+                'interval': chunk.interval,
+                'date': dates[i],
+                'open': panel.open[i, j],
+                'high': panel.high[i, j],
+                'low': panel.low[i, j],
+                'price': close,
+                'volume': int(np.nan_to_num(panel.volume[i, j])),
+                'indicators': {name: None if np.isnan(values[i, j]) else values[i, j]
+                               for name, values in indicators.items()}
+            })
+    return documents
+
+
+class Backfill:
+    def __init__(self, collection, checkpoint: Checkpoint, max_workers: int = 4,
+                 download: Callable[..., pd.DataFrame] = yahoo_download, batch_size: int = 1000):
+        """
+        Parallel chunked backfill with bulk upserts and a resumable checkpoint
+
+        Args:
+            collection: Target MongoDB collection (historical_data)
+            checkpoint: Completed-chunk checkpoint
+            max_workers: Chunks downloaded and processed concurrently
+            download: Bar download function (see bar_store.yahoo_download)
+            batch_size: Documents per bulk write
+        """
+        self.collection = collection
+        self.checkpoint = checkpoint
+        self.max_workers = max_workers
+        self.download = download
+        self.batch_size = batch_size
+        self.rows = 0
+        self.lock = threading.Lock()
+
+    def run_chunk(self, chunk: BackfillChunk) -> int:
+        """Download, compute and store one chunk; returns the rows written"""
+        warmup_start = chunk.start - timedelta(days=INTERVALS[chunk.interval][2])
+        frame = self.download(chunk.symbols, start=warmup_start.strftime('%Y-%m-%d'),
+                              end=chunk.end.strftime('%Y-%m-%d'), interval=chunk.interval)
+        written = 0
+        if frame is not None and not frame.empty:
+            documents = chunk_documents(chunk, BarPanel.from_yfinance(frame, chunk.symbols))
+            writer = MarketDataBatchWriter(self.collection, flush_size=self.batch_size)
+            for document in documents:
+                writer.add(document)
+            writer.flush()
+            if writer.errors:
+                raise RuntimeError(f"{len(writer.errors)} documents failed to store")
+            written = writer.written
+        self.checkpoint.mark_done(chunk)
+        return written
+
+    def run(self, chunks: List[BackfillChunk]) -> int:
+        """
+        Run every chunk not yet in the checkpoint
+
+        Returns:
+            Rows written by this run
+        """
+        pending = [chunk for chunk in chunks if not self.checkpoint.done(chunk)]
+        print(f"📚 {len(pending)}/{len(chunks)} chunks to backfill "
+              f"({len(chunks) - len(pending)} already done)")
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.run_chunk, chunk): chunk for chunk in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                chunk = futures[future]
+                try:
+                    written = future.result()
+                except Exception as e:
+                    print(f"❌ Chunk {chunk.key} failed (will be retried on the next run): {e}")
+                    continue
+                with self.lock:
+                    self.rows += written
+                elapsed = time.monotonic() - started
+                print(f"   [{done}/{len(pending)}] {chunk.interval} {chunk.start:%Y-%m-%d}..{chunk.end:%Y-%m-%d} "
+                      f"{len(chunk.symbols)} symbols: {written} rows "
+                      f"({self.rows / max(elapsed, 1e-9):,.0f} rows/s overall)")
+
+        elapsed = time.monotonic() - started
+        print(f"✅ Backfilled {self.rows} rows in {elapsed:.1f}s ({self.rows / max(elapsed, 1e-9):,.0f} rows/s)")
+        return self.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill historical bars into MongoDB")
+    parser.add_argument('--symbols', default='SPY,QQQ,IWM,DIA,VIX',
+                        help="Comma separated symbols, or @file with one symbol per line")
+    parser.add_argument('--intervals', default='1d', help=f"Comma separated intervals: {', '.join(INTERVALS)}")
+    parser.add_argument('--years', type=float, default=5, help="Years of daily history")
+    parser.add_argument('--workers', type=int, default=4, help="Chunks processed concurrently")
+    parser.add_argument('--group-size', type=int, default=20, help="Symbols per batched download")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help="Checkpoint file used to resume")
+    parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint and start over")
+    args = parser.parse_args()
+
+    intervals = [interval.strip() for interval in args.intervals.split(',') if interval.strip()]
+    unknown = [interval for interval in intervals if interval not in INTERVALS]
+    if unknown:
+        parser.error(f"unknown interval(s): {', '.join(unknown)}")
+
+    mongo_connection_string = os.getenv('MONGODB_URI')
+    if not mongo_connection_string:
+        print("Error: Please set the MONGODB_URI environment variable")
+        return
+
+    if args.symbols.startswith('@'):
+        with open(args.symbols[1:]) as f:
+            symbols = [line.strip() for line in f if line.strip()]
+    else:
+        symbols = [symbol.strip() for symbol in args.symbols.split(',') if symbol.strip()]
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    db = MongoClient(mongo_connection_string).get_database('adaptive_market_db', codec_options=NUMPY_CODEC_OPTIONS)
+    collection = db['historical_data']
+    collection.create_index([('symbol', ASCENDING), ('interval', ASCENDING), ('date', ASCENDING)],
+                            name='symbol_interval_date')
+
+    chunks = plan_chunks(symbols, intervals, args.years, group_size=args.group_size)
+    Backfill(collection, Checkpoint(args.checkpoint), max_workers=args.workers).run(chunks)
+
+
+if __name__ == "__main__":
+    main()
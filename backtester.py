@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Score strategy recommendations against the forward returns that followed them
+
+Usage:
+    python backtester.py --symbols SPY,QQQ,IWM,DIA --years 5        # replay the rules on stored bars
+    python backtester.py --symbols @symbols.txt --source stored      # db.strategies, needs MONGODB_URI
+
+Bars are read from the local bar store ($BAR_STORE_DIR, see bar_store.py);
+--update downloads missing history first.
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BarStore
+from indicator_engine import BarPanel, bar_timestamps, rolling_mean, rsi
+from regime_engine import STRONG_MOVE_PERCENT
+from strategy_engine import TRACKED_SYMBOLS, VIX_SYMBOL
+from strategy_rules import (AVG_CHANGE, AVG_RSI, CHANGE_RANGE, EVENTS, FEATURE_FIELDS, HIGH_VOLATILITY_FLAG,
+                            HIGH_VOLUME, REGIMES, STRATEGY_NAMES, STRATEGY_PROFILES, STRONG_TRENDS, UP_TRENDS,
+                            VOLATILITY_CONFIDENCE, replay_strategies)
+from volatility_engine import TRADING_DAYS, volatility_regime_batch
+
+# Position a recommendation implies: 1 = long, -1 = short, 0 = direction-neutral
+# (scored on the size of the move). Mean reversion fires after strong up days,
+# so it bets on a pullback; defensive is scored as the loss it avoids.
+STRATEGY_DIRECTIONS = {
+    'Mean Reversion Strategy': -1,
+    'Momentum Breakout Strategy': 1,
+    'Trend Following Strategy': 1,
+    'Volatility Trading Strategy': 0,
+    'Event-Driven Strategy': 0,
+    'Defensive Strategy': -1
+}
+
+# Trading bars per timeframe unit (daily bars)
+TIMEFRAME_UNITS = {'day': 1, 'week': 5, 'month': 21}
+
+# Partial sums kept per (strategy, regime); workers' results are merged by summing
+# every field except max_drawdown, which is merged with max
+STAT_FIELDS = ('trades', 'hits', 'return_sum', 'drawdown_sum', 'max_drawdown')
+TRADES, HITS, RETURN_SUM, DRAWDOWN_SUM, MAX_DRAWDOWN = range(len(STAT_FIELDS))
+
+VOLATILITY_WINDOW = 20
+
+
+def timeframe_bars(timeframe: str) -> int:
+    """Holding period in daily bars: the upper end of a timeframe like '1-3 weeks'"""
+    match = re.fullmatch(r'\s*(\d+)(?:\s*-\s*(\d+))?\s*(day|week|month)s?\s*', timeframe)
+    if not match:
+        raise ValueError(f"Unrecognized timeframe: {timeframe!r}")
+    return int(match.group(2) or match.group(1)) * TIMEFRAME_UNITS[match.group(3)]
+
+
+class Recommendations:
+    def __init__(self, timestamps: np.ndarray, strategies: np.ndarray, regimes: np.ndarray):
+        """
+        Primary strategy recommendations as parallel arrays
+
+        Args:
+            timestamps: int64 nanoseconds since epoch (UTC)
+            strategies: Strategy codes (index into STRATEGY_NAMES)
+            regimes: Regime codes (index into REGIMES)
+        """
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.strategies = np.asarray(strategies, dtype=np.int64)
+        self.regimes = np.asarray(regimes, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def since(self, start: datetime) -> 'Recommendations':
+        """Recommendations made at or after a naive UTC datetime"""
+        keep = self.timestamps >= pd.Timestamp(start, tz='UTC').value
+        return Recommendations(self.timestamps[keep], self.strategies[keep], self.regimes[keep])
+
+    @classmethod
+    def from_documents(cls, documents: List[Dict]) -> 'Recommendations':
+        """
+        Recommendations stored in db.strategies by the strategy engine
+
+        Documents with an unknown strategy or regime are skipped. Their
+        timestamps are naive local time (datetime.now()).
+        """
+        timestamps, strategies, regimes = [], [], []
+        for document in documents:
+            name = document.get('primary_strategy', {}).get('name')
+            regime = document.get('market_analysis', {}).get('regime')
+            if name not in STRATEGY_NAMES or regime not in REGIMES or not document.get('timestamp'):
+                continue
+            timestamps.append(pd.Timestamp(document['timestamp'].astimezone()).value)
+            strategies.append(STRATEGY_NAMES.index(name))
+            regimes.append(REGIMES.index(regime))
+        order = np.argsort(timestamps, kind='stable')
+        return cls(np.array(timestamps, dtype=np.int64)[order], np.array(strategies, dtype=np.int64)[order],
+                   np.array(regimes, dtype=np.int64)[order])
+
+    @classmethod
+    def replay(cls, panel: BarPanel, vix_close: Optional[np.ndarray] = None) -> 'Recommendations':
+        """
+        Replay the strategy rules on every daily bar of the tracked ETFs
+
+        See replay_features. Rows before the indicators have warmed up
+        are dropped.
+        """
+        features, timestamps = replay_features(panel, vix_close)
+        replay = replay_strategies(features)
+        return cls(timestamps, replay['primary'], replay['regime'])
+
+
+def replay_features(panel: BarPanel, vix_close: Optional[np.ndarray] = None):
+    """
+    Strategy rule features for every daily bar, as the strategy engine would
+    have computed them from that day's market documents
+
+    Only rows where every ETF has a bar are used. Historical events are not
+    stored, so the event count is zero throughout.
+
+    Args:
+        panel: Daily bars of the tracked ETFs
+        vix_close: VIX close per panel row (NaN or None if unavailable)
+
+    Returns:
+        Tuple of (features in FEATURE_FIELDS order, bar timestamps) for rows with a full RSI
+    """
+    rows = ~np.isnan(panel.close).any(axis=1)
+    close, volume = panel.close[rows], panel.volume[rows]
+    timestamps = bar_timestamps(panel.index)[rows]
+    vix = np.full(len(close), np.nan) if vix_close is None else np.asarray(vix_close, dtype=np.float64)[rows]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = np.full(close.shape, np.nan)
+        change[1:] = (close[1:] / close[:-1] - 1) * 100
+        volume_ratio = volume / rolling_mean(volume, 20)
+        log_return = np.full(close.shape, np.nan)
+        log_return[1:] = np.log(close[1:] / close[:-1])
+        mean = rolling_mean(log_return, VOLATILITY_WINDOW)
+        variance = (rolling_mean(log_return ** 2, VOLATILITY_WINDOW) - mean ** 2) \
+            * VOLATILITY_WINDOW / (VOLATILITY_WINDOW - 1)
+        realized = np.sqrt(np.maximum(variance, 0) * TRADING_DAYS)
+    rsi_values = rsi(close, 14)
+
+    complete = ~np.isnan(change).any(axis=1) & ~np.isnan(rsi_values).any(axis=1)
+    change, volume_ratio, realized, rsi_values = change[complete], volume_ratio[complete], \
+        realized[complete], rsi_values[complete]
+    # Rows before the volatility window fills have no realized volatility vote
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median_realized = np.nanmedian(realized, axis=1) if realized.size else np.empty(0)
+    high_volatility, volatility_confidence = volatility_regime_batch(
+        vix[complete], median_realized, np.abs(change).max(axis=1, initial=0.0))
+
+    features = np.zeros((int(complete.sum()), len(FEATURE_FIELDS)))
+    features[:, AVG_CHANGE] = change.mean(axis=1)
+    features[:, AVG_RSI] = rsi_values.mean(axis=1)
+    features[:, CHANGE_RANGE] = change.max(axis=1, initial=-np.inf) - change.min(axis=1, initial=np.inf)
+    features[:, STRONG_TRENDS] = ((change > 1) | (change < -1)).sum(axis=1)
+    features[:, UP_TRENDS] = (change > 0).sum(axis=1)
+    features[:, HIGH_VOLUME] = (volume_ratio > 1.5).sum(axis=1)
+    features[:, EVENTS] = 0
+    features[:, HIGH_VOLATILITY_FLAG] = high_volatility
+    features[:, VOLATILITY_CONFIDENCE] = volatility_confidence
+    return features, timestamps[complete]
+
+
+def empty_stats() -> np.ndarray:
+    return np.zeros((len(STRATEGY_NAMES), len(REGIMES), len(STAT_FIELDS)))
+
+
+def score_symbols(root: Optional[str], interval: str, symbols: List[str], timestamps: np.ndarray,
+                  strategies: np.ndarray, regimes: np.ndarray) -> np.ndarray:
+    """
+    Score every recommendation on a group of symbols (runs in a worker process)
+
+    A recommendation enters at the close of the last bar at or before it
+    and exits `timeframe_bars` bars later; trades that would exit past the
+    stored history are left out. Recommendations that share an entry bar,
+    strategy and regime are scored once and weighted by their count.
+
+    Returns:
+        (strategies, regimes, STAT_FIELDS) partial sums
+    """
+    store = BarStore(root, interval=interval)
+    horizons = [timeframe_bars(STRATEGY_PROFILES[name][1]) for name in STRATEGY_NAMES]
+    directions = [STRATEGY_DIRECTIONS[name] for name in STRATEGY_NAMES]
+    stats = empty_stats()
+    for symbol in symbols:
+        bars = store.read(symbol)
+        if len(bars) < 2:
+            continue
+        closes = np.asarray(bars['close'])
+        entries = np.searchsorted(bars['ts'], timestamps, side='right') - 1
+        valid = entries >= 0
+        keys, counts = np.unique((entries[valid] * len(STRATEGY_NAMES) + strategies[valid]) * len(REGIMES)
+                                 + regimes[valid], return_counts=True)
+        trade_regimes = keys % len(REGIMES)
+        trade_strategies = keys // len(REGIMES) % len(STRATEGY_NAMES)
+        trade_entries = keys // (len(REGIMES) * len(STRATEGY_NAMES))
+
+        for code in np.unique(trade_strategies):
+            bars_held, direction = horizons[code], directions[code]
+            selected = (trade_strategies == code) & (trade_entries + bars_held < len(closes))
+            entry = trade_entries[selected]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                path = closes[entry[:, None] + np.arange(bars_held + 1)] / closes[entry, None] - 1
+            value = np.abs(path) if direction == 0 else direction * path
+            equity = 1 + value
+            drawdown = np.max(1 - equity / np.maximum.accumulate(equity, axis=1), axis=1)
+            forward = value[:, -1]
+            # A direction-neutral call is right when the move is strong for its horizon
+            hit = forward > (STRONG_MOVE_PERCENT * np.sqrt(bars_held) / 100 if direction == 0 else 0)
+
+            finite = np.isfinite(forward) & np.isfinite(drawdown)
+            regime, weight = trade_regimes[selected][finite], counts[selected][finite]
+            np.add.at(stats[code, :, TRADES], regime, weight)
+            np.add.at(stats[code, :, HITS], regime, weight * hit[finite])
+            np.add.at(stats[code, :, RETURN_SUM], regime, weight * forward[finite])
+            np.add.at(stats[code, :, DRAWDOWN_SUM], regime, weight * drawdown[finite])
+            np.maximum.at(stats[code, :, MAX_DRAWDOWN], regime, drawdown[finite])
+    return stats
+
+
+def merge_stats(total: np.ndarray, partial: np.ndarray) -> np.ndarray:
+    merged = total + partial
+    merged[..., MAX_DRAWDOWN] = np.maximum(total[..., MAX_DRAWDOWN], partial[..., MAX_DRAWDOWN])
+    return merged
+
+
+def summarize_stats(stats: np.ndarray) -> List[Dict]:
+    """
+    Per-strategy and per-regime scores from merged partial sums
+
+    Returns:
+        One row per strategy and regime with trades (regime 'all' is the
+        strategy total), with returns and drawdowns in percent
+    """
+    summary = []
+    for code, name in enumerate(STRATEGY_NAMES):
+        total = stats[code].sum(axis=0)
+        total[MAX_DRAWDOWN] = stats[code, :, MAX_DRAWDOWN].max()
+        for regime, values in [('all', total)] + list(zip(REGIMES, stats[code])):
+            trades = values[TRADES]
+            if not trades:
+                continue
+            summary.append({
+                'strategy': name,
+                'regime': regime,
+                'direction': STRATEGY_DIRECTIONS[name],
+                'holding_bars': timeframe_bars(STRATEGY_PROFILES[name][1]),
+                'trades': int(trades),
+                'hit_rate': values[HITS] / trades,
+                'average_return': values[RETURN_SUM] / trades * 100,
+                'average_drawdown': values[DRAWDOWN_SUM] / trades * 100,
+                'max_drawdown': values[MAX_DRAWDOWN] * 100
+            })
+    return summary
+
+
+class Backtester:
+    def __init__(self, root: Optional[str] = None, interval: str = '1d', max_workers: Optional[int] = None,
+                 group_size: int = 50):
+        """
+        Parallel recommendation scoring over a local bar store
+
+        Args:
+            root: Bar store directory (defaults to $BAR_STORE_DIR or data/bars)
+            interval: Bar interval the holding periods are counted in (daily)
+            max_workers: Worker processes (defaults to the CPU count)
+            group_size: Symbols scored per task
+        """
+        self.root = root
+        self.interval = interval
+        self.max_workers = max_workers or os.cpu_count()
+        self.group_size = group_size
+
+    def run(self, symbols: List[str], recommendations: Recommendations) -> List[Dict]:
+        """
+        Score recommendations on every symbol
+
+        Returns:
+            summarize_stats rows
+        """
+        groups = [symbols[i:i + self.group_size] for i in range(0, len(symbols), self.group_size)]
+        print(f"🧪 Scoring {len(recommendations)} recommendations on {len(symbols)} symbols "
+              f"({len(groups)} tasks, {self.max_workers} workers)")
+        started = time.monotonic()
+        stats = empty_stats()
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(score_symbols, self.root, self.interval, group, recommendations.timestamps,
+                                       recommendations.strategies, recommendations.regimes): group
+                       for group in groups}
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    stats = merge_stats(stats, future.result())
+                except Exception as e:
+                    print(f"❌ Scoring {len(futures[future])} symbols failed: {e}")
+                    continue
+                if done % max(1, len(groups) // 10) == 0 or done == len(groups):
+                    print(f"   [{done}/{len(groups)}] {int(stats[..., TRADES].sum())} trades scored "
+                          f"({time.monotonic() - started:.1f}s)")
+
+        print(f"✅ Backtest finished in {time.monotonic() - started:.1f}s")
+        return summarize_stats(stats)
+
+
+def print_report(summary: List[Dict]):
+    print(f"{'Strategy':<28} {'Regime':<16} {'Trades':>8} {'Hit rate':>9} {'Avg ret':>9} "
+          f"{'Avg DD':>8} {'Max DD':>8}")
+    print("-" * 92)
+    for row in summary:
+        print(f"{row['strategy']:<28} {row['regime']:<16} {row['trades']:>8} {row['hit_rate'] * 100:>8.1f}% "
+              f"{row['average_return']:>8.2f}% {row['average_drawdown']:>7.2f}% {row['max_drawdown']:>7.2f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest strategy recommendations against forward returns")
+    parser.add_argument('--symbols', default=','.join(TRACKED_SYMBOLS),
+                        help="Comma separated symbols to score on, or @file with one symbol per line")
+    parser.add_argument('--source', choices=['replay', 'stored'], default='replay',
+                        help="Replay the strategy rules on stored ETF bars, or use db.strategies")
+    parser.add_argument('--years', type=float, default=5, help="Years of recommendations to score")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--group-size', type=int, default=50, help="Symbols per task")
+    parser.add_argument('--store-dir', default=None, help="Bar store directory (default: $BAR_STORE_DIR)")
+    parser.add_argument('--update', action='store_true', help="Download missing bars into the store first")
+    parser.add_argument('--output', default=None, help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.symbols.startswith('@'):
+        with open(args.symbols[1:]) as f:
+            symbols = [line.strip() for line in f if line.strip()]
+    else:
+        symbols = [symbol.strip() for symbol in args.symbols.split(',') if symbol.strip()]
+
+    store = BarStore(args.store_dir, interval='1d')
+    if args.update:
+        store.update(sorted(set(symbols) | set(TRACKED_SYMBOLS) | {VIX_SYMBOL}), period='max')
+
+    start = datetime.utcnow() - timedelta(days=args.years * 365)
+    if args.source == 'stored':
+        from pymongo import MongoClient
+        mongo_connection_string = os.getenv('MONGODB_URI')
+        if not mongo_connection_string:
+            print("Error: Please set the MONGODB_URI environment variable")
+            return
+        db = MongoClient(mongo_connection_string).get_database('adaptive_market_db')
+        documents = db.strategies.find({}, {'primary_strategy.name': 1, 'market_analysis.regime': 1, 'timestamp': 1})
+        recommendations = Recommendations.from_documents(list(documents)).since(start)
+    else:
+        # VIX bars are stored under VIX_SYMBOL; yahoo_download fetches them as ^VIX (see YAHOO_TICKERS)
+        panel = store.panel(list(TRACKED_SYMBOLS) + [VIX_SYMBOL])
+        vix_close = panel.close[:, panel.column(VIX_SYMBOL)]
+        if np.isnan(vix_close).all():
+            print(f"⚠️  No {VIX_SYMBOL} bars in the bar store (run with --update): the replay has no VIX vote")
+        recommendations = Recommendations.replay(panel.select(list(TRACKED_SYMBOLS)), vix_close).since(start)
+    if not len(recommendations):
+        print("No recommendations to score")
+        return
+
+    summary = Backtester(args.store_dir, max_workers=args.workers, group_size=args.group_size).run(
+        symbols, recommendations)
+    print()
+    print_report(summary)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'source': args.source, 'symbols': len(symbols), 'recommendations': len(recommendations),
+                       'generated': datetime.utcnow().isoformat(), 'results': summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
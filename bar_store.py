@@ -0,0 +1,292 @@
+import os
+import time
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from indicator_engine import BarPanel, bar_timestamps
+
+# One fixed-size record per bar; files are raw little-endian records so new
+# bars can be appended and the whole history memory-mapped without parsing
+BAR_DTYPE = np.dtype([
+    ('ts', '<i8'),  # Bar timestamp, nanoseconds since epoch (UTC)
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8')
+])
+
+DEFAULT_BAR_STORE_DIR = os.getenv('BAR_STORE_DIR', os.path.join('data', 'bars'))
+
+# Relative close difference on a re-downloaded completed bar that means Yahoo
+# has re-adjusted the history (dividend or split since the bar was stored)
+ADJUSTMENT_TOLERANCE = 1e-5
+
+
+# Symbols Yahoo Finance lists under a different ticker (indices carry a ^ prefix)
+YAHOO_TICKERS = {'VIX': '^VIX'}
+
+
+def yahoo_ticker(symbol: str) -> str:
+    """Yahoo Finance ticker for one of our symbols"""
+    return YAHOO_TICKERS.get(symbol, symbol)
+
+
+def yahoo_download(symbols: List[str], start: Optional[str] = None, period: Optional[str] = None,
+                   interval: str = '1d', end: Optional[str] = None) -> pd.DataFrame:
+    """Batched multi-ticker download from Yahoo Finance, with columns keyed by our symbols"""
+    tickers = [yahoo_ticker(symbol) for symbol in symbols]
+    frame = yf.download(
+        tickers, start=start, end=end, period=None if start else period, interval=interval,
+        group_by='column', auto_adjust=True, threads=True, progress=False
+    )
+    aliases = {yahoo_ticker(symbol): symbol for symbol in symbols if yahoo_ticker(symbol) != symbol}
+    if aliases and frame is not None and isinstance(frame.columns, pd.MultiIndex):
+        frame = frame.rename(columns=aliases, level=1)
+    return frame
+
+
+class BarStore:
+    def __init__(self, root: Optional[str] = None, interval: str = '1d',
+                 download: Callable[..., pd.DataFrame] = yahoo_download):
+        """
+        Local on-disk OHLCV store with one memory-mapped file per symbol
+
+        Args:
+            root: Base directory (defaults to $BAR_STORE_DIR or data/bars)
+            interval: Bar interval stored in this instance (e.g. '1d', '5m')
+            download: Function used to fetch bars, called as
+                download(symbols, start=..., period=..., interval=...)
+        """
+        self.interval = interval
+        self.directory = os.path.join(root or DEFAULT_BAR_STORE_DIR, interval)
+        self.download = download
+        self.lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, symbol: str) -> str:
+        return os.path.join(self.directory, f"{symbol.replace('^', '_').replace('/', '_')}.bin")
+
+    def read(self, symbol: str) -> np.ndarray:
+        """
+        Zero-copy read of a symbol's full history
+
+        Args:
+            symbol: Stock symbol
+
+        Returns:
+            Read-only memory-mapped structured array with BAR_DTYPE records
+            (an empty array if nothing is stored)
+        """
+        path = self.path(symbol)
+        if not os.path.exists(path) or os.path.getsize(path) < BAR_DTYPE.itemsize:
+            return np.empty(0, dtype=BAR_DTYPE)
+        return np.memmap(path, dtype=BAR_DTYPE, mode='r')
+
+    def last_timestamp(self, symbol: str) -> Optional[int]:
+        bars = self.read(symbol)
+        return int(bars['ts'][-1]) if len(bars) else None
+
+    def write(self, symbol: str, bars: np.ndarray, replace: bool = False) -> int:
+        """
+        Merge new bars into the store
+
+        Stored bars at or after the first new timestamp are replaced (this is
+        how a partial last bar gets refreshed), then the new bars are appended.
+        The merged history goes to a temporary file that is renamed over the
+        old one, so readers in any process (backtester pools, sharded ingest
+        workers) see either the old or the new file, never a partial write,
+        and memory maps they hold stay valid.
+
+        Args:
+            symbol: Stock symbol
+            bars: Structured array with BAR_DTYPE records in time order
+            replace: Drop every stored bar instead of merging
+
+        Returns:
+            Number of records written
+        """
+        if not len(bars):
+            return 0
+        path = self.path(symbol)
+        with self.lock:
+            stored = self.read(symbol)
+            keep = int(np.searchsorted(stored['ts'], bars['ts'][0])) if len(stored) and not replace else 0
+            merged = np.concatenate([np.asarray(stored[:keep]), np.asarray(bars, dtype=BAR_DTYPE)])
+            del stored
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(merged.tobytes())
+            os.replace(tmp_path, path)
+        return len(bars)
+
+    def is_fresh(self, symbol: str, max_age: float) -> bool:
+        path = self.path(symbol)
+        return max_age > 0 and os.path.exists(path) and time.time() - os.path.getmtime(path) < max_age
+
+    def update(self, symbols: List[str], period: str = '2y', max_age: float = 0) -> Dict[str, int]:
+        """
+        Fetch only the missing tail of every symbol's history
+
+        Symbols with no stored bars get `period` of history. Symbols with
+        history are grouped by the day of their second to last bar so each
+        group costs one batched download starting from that day. Yahoo bars
+        are dividend and split adjusted, so a re-downloaded completed bar
+        that no longer matches the stored one means the whole history was
+        re-adjusted: that symbol's history is downloaded again and replaced
+        rather than spliced onto bars on the old basis.
+
+        Args:
+            symbols: Symbols to refresh
+            period: History to load for symbols that are not stored yet
+            max_age: Skip symbols whose file was written less than this many seconds ago
+
+        Returns:
+            Dictionary mapping symbol to the number of bars written
+        """
+        groups = {}
+        for symbol in symbols:
+            if self.is_fresh(symbol, max_age):
+                continue
+            stored_ts = self.read(symbol)['ts']
+            if not len(stored_ts):
+                start = None
+            else:
+                # Re-request the last stored day so a partial bar is refreshed,
+                # and the completed bar before it to check the adjustment basis
+                overlap = int(stored_ts[max(0, len(stored_ts) - 2)])
+                start = (pd.Timestamp(overlap, tz='UTC') - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+            groups.setdefault(start, []).append(symbol)
+
+        written = {}
+        for start, group in groups.items():
+            try:
+                frame = self.download(group, start=start, period=period, interval=self.interval)
+                if frame is None or frame.empty:
+                    continue
+                panel = BarPanel.from_yfinance(frame, group)
+                rebased = [symbol for symbol in group if start is not None and self.adjustment_changed(symbol, panel)]
+                for symbol in rebased:
+                    written[symbol] = self.rebuild(symbol, period)
+                written.update(self.write_panel(panel.select([symbol for symbol in group if symbol not in rebased])))
+            except Exception as e:
+                print(f"❌ Error updating bar store for {group}: {e}")
+        return written
+
+    def adjustment_changed(self, symbol: str, panel: BarPanel) -> bool:
+        """True if a completed stored bar re-downloaded in the panel has a different close"""
+        stored = self.read(symbol)
+        if len(stored) < 2:
+            return False
+        completed = stored[:-1]  # The last stored bar may have been partial
+        timestamps = bar_timestamps(panel.index)
+        close = panel.close[:, panel.column(symbol)]
+        rows = np.searchsorted(timestamps, completed['ts'])
+        matched = (rows < len(timestamps)) & (timestamps[np.minimum(rows, len(timestamps) - 1)] == completed['ts'])
+        if not matched.any():
+            return False
+        new_close = close[rows[matched]]
+        old_close = np.asarray(completed['close'][matched])
+        known = ~np.isnan(new_close)
+        return not np.allclose(new_close[known], old_close[known], rtol=ADJUSTMENT_TOLERANCE, atol=0)
+
+    def rebuild(self, symbol: str, period: str = '2y') -> int:
+        """
+        Download a symbol's whole stored history again and replace it
+
+        Returns:
+            Number of bars written (0 if nothing could be downloaded)
+        """
+        stored_ts = self.read(symbol)['ts']
+        start = pd.Timestamp(int(stored_ts[0]), tz='UTC').strftime('%Y-%m-%d') if len(stored_ts) else None
+        print(f"🔁 {symbol} was re-adjusted (dividend or split), reloading its history from {start or period}")
+        frame = self.download([symbol], start=start, period=period, interval=self.interval)
+        if frame is None or frame.empty:
+            # Older intraday bars may be past what Yahoo serves: fall back to the default history
+            frame = self.download([symbol], start=None, period=period, interval=self.interval)
+        if frame is None or frame.empty:
+            print(f"⚠️  Could not reload {symbol}, keeping the stored history")
+            return 0
+        panel = BarPanel.from_yfinance(frame, [symbol])
+        return self.write(symbol, self.panel_bars(panel, 0), replace=True)
+
+    @staticmethod
+    def panel_bars(panel: BarPanel, j: int) -> np.ndarray:
+        """BAR_DTYPE records of one panel column, rows without a close dropped"""
+        timestamps = bar_timestamps(panel.index)
+        rows = ~np.isnan(panel.close[:, j])
+        bars = np.empty(int(rows.sum()), dtype=BAR_DTYPE)
+        bars['ts'] = timestamps[rows]
+        bars['open'] = panel.open[rows, j]
+        bars['high'] = panel.high[rows, j]
+        bars['low'] = panel.low[rows, j]
+        bars['close'] = panel.close[rows, j]
+        bars['volume'] = np.nan_to_num(panel.volume[rows, j])
+        return bars
+
+    def write_panel(self, panel: BarPanel) -> Dict[str, int]:
+        """Write every symbol column of a BarPanel into the store"""
+        return {symbol: self.write(symbol, self.panel_bars(panel, j)) for j, symbol in enumerate(panel.symbols)}
+
+    def since(self, symbol: str, days: Optional[float] = None, start_ts: Optional[int] = None) -> np.ndarray:
+        """Zero-copy slice of the bars from the last `days` calendar days or from bar timestamp `start_ts` on"""
+        bars = self.read(symbol)
+        if start_ts is not None:
+            bars = bars[int(np.searchsorted(bars['ts'], start_ts)):]
+        if days is None or not len(bars):
+            return bars
+        cutoff = pd.Timestamp(datetime.utcnow() - pd.Timedelta(days=days), tz='UTC').value
+        return bars[int(np.searchsorted(bars['ts'], cutoff)):]
+
+    def frame(self, symbol: str, days: Optional[float] = None, start_ts: Optional[int] = None) -> pd.DataFrame:
+        """
+        Symbol history as a DataFrame with yfinance column names
+
+        Args:
+            symbol: Stock symbol
+            days: Only include bars from the last `days` calendar days
+            start_ts: Only include bars at or after this bar timestamp (ns)
+
+        Returns:
+            DataFrame indexed by UTC bar timestamp
+        """
+        bars = self.since(symbol, days, start_ts)
+        return pd.DataFrame({
+            'Open': bars['open'],
+            'High': bars['high'],
+            'Low': bars['low'],
+            'Close': bars['close'],
+            'Volume': bars['volume']
+        }, index=pd.to_datetime(bars['ts'], utc=True))
+
+    def panel(self, symbols: List[str], days: Optional[float] = None) -> BarPanel:
+        """
+        Align stored histories into a (time x symbol) BarPanel
+
+        Args:
+            symbols: Symbols in column order
+            days: Only include bars from the last `days` calendar days
+
+        Returns:
+            BarPanel over the union of stored timestamps
+        """
+        histories = [self.since(symbol, days) for symbol in symbols]
+        timestamps = np.unique(np.concatenate([bars['ts'] for bars in histories])) if histories else np.empty(0, dtype='<i8')
+
+        matrices = {field: np.full((len(timestamps), len(symbols)), np.nan)
+                    for field in ('open', 'high', 'low', 'close', 'volume')}
+        for j, bars in enumerate(histories):
+            rows = np.searchsorted(timestamps, bars['ts'])
+            for field, matrix in matrices.items():
+                matrix[rows, j] = bars[field]
+
+        return BarPanel(
+            pd.to_datetime(timestamps, utc=True), symbols,
+            matrices['open'], matrices['high'], matrices['low'],
+            matrices['close'], matrices['volume']
+        )
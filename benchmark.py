@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for the market data pipeline
+
+Usage:
+    python benchmark.py                # run every benchmark
+    python benchmark.py bar_store      # run selected benchmarks
+    python benchmark.py pipeline --universe 10000
+    python benchmark.py replay         # strategy rule replay vs the scalar rules
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+import bson
+import numpy as np
+
+from bar_store import BarStore
+from data_providers import SyntheticProvider
+from market_data_fetcher import NUMPY_CODEC_OPTIONS, MarketDataFetcher
+from strategy_rules import (AVG_CHANGE, AVG_RSI, CHANGE_RANGE, EVENTS, FEATURE_FIELDS, HIGH_VOLATILITY_FLAG,
+                            HIGH_VOLUME, STRONG_TRENDS, UP_TRENDS, VOLATILITY_CONFIDENCE, replay_strategies,
+                            select_strategies)
+
+DEFAULT_SYMBOLS = ['SPY', 'QQQ', 'IWM', 'DIA', 'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'NVDA', 'META']
+
+
+def timed(func, *args, **kwargs):
+    """Run func and return (result, elapsed seconds)"""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def bench_bar_store(symbols, runs: int = 3):
+    """Cold vs warm cache timings for the local OHLCV store"""
+    print("📦 BAR STORE: cold vs warm cache")
+    print("-" * 50)
+    directory = tempfile.mkdtemp(prefix="bar_store_bench_")
+    try:
+        store = BarStore(directory, interval='1d')
+
+        # Cold: empty store, full history download
+        written, cold_update = timed(store.update, symbols)
+        panel, cold_read = timed(store.panel, symbols, days=60)
+        print(f"   ❄️  Cold update: {cold_update:.2f}s ({sum(written.values())} bars written)")
+        print(f"   ❄️  Cold read:   {cold_read * 1000:.1f}ms ({panel.close.shape[0]} x {panel.close.shape[1]} panel)")
+
+        # Warm: only the missing tail is requested
+        warm_updates, warm_reads = [], []
+        for _ in range(runs):
+            written, elapsed = timed(store.update, symbols)
+            warm_updates.append(elapsed)
+            _, elapsed = timed(store.panel, symbols, days=60)
+            warm_reads.append(elapsed)
+        print(f"   🔥 Warm update: {min(warm_updates):.2f}s best of {runs} ({sum(written.values())} bars rewritten)")
+        print(f"   🔥 Warm read:   {min(warm_reads) * 1000:.1f}ms best of {runs}")
+
+        # Zero-copy reads of every symbol's full history
+        rows, elapsed = timed(lambda: sum(len(store.read(symbol)['close']) for symbol in symbols))
+        print(f"   📖 Memory-mapped read of {len(symbols)} histories ({rows} bars): {elapsed * 1000:.2f}ms")
+        print(f"   ⚡ Warm update speedup: {cold_update / max(min(warm_updates), 1e-9):.1f}x")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def legacy_convert_numpy_types(obj):
+    """The recursive converter MarketDataFetcher used before the BSON codec"""
+    if isinstance(obj, dict):
+        return {key: legacy_convert_numpy_types(value) for key, value in obj.items()}
+    elif isinstance(obj, list):
+        return [legacy_convert_numpy_types(item) for item in obj]
+    elif isinstance(obj, np.integer):
+        return int(obj)
+    elif isinstance(obj, np.floating):
+        return float(obj)
+    elif isinstance(obj, np.bool_):
+        return bool(obj)
+    elif isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif hasattr(obj, 'dtype'):
+        if 'bool' in str(obj.dtype):
+            return bool(obj)
+        elif 'int' in str(obj.dtype):
+            return int(obj)
+        elif 'float' in str(obj.dtype):
+            return float(obj)
+    return obj
+
+
+def sample_market_documents(symbols, count: int):
+    """Market documents shaped like the fetcher's output, with NumPy values"""
+    rng = np.random.default_rng(42)
+    documents = []
+    for i in range(count):
+        price = np.float64(rng.uniform(50, 500))
+        change_percent = np.float64(rng.normal(0, 1))
+        volume = np.int64(rng.integers(1_000_000, 50_000_000))
+        documents.append({
+            'symbol': symbols[i % len(symbols)],
+            'price': price,
+            'change': price * change_percent / 100,
+            'change_percent': change_percent,
+            'volume': volume,
+            'previous_close': price / (1 + change_percent / 100),
+            'timestamp': datetime.utcnow(),
+            'indicators': {
+                'sma_20': price * np.float64(0.99),
+                'sma_50': price * np.float64(0.97),
+                'rsi': np.float64(rng.uniform(20, 80)),
+                'volume_sma_20': np.int64(volume * 0.9),
+                'volume_ratio': np.float64(1.11),
+                'above_sma_20': np.bool_(True),
+                'above_sma_50': np.bool_(False)
+            },
+            'regime_signals': {'trend': 'up', 'volume': 'above_average', 'momentum': 'neutral'}
+        })
+    return documents
+
+
+def bench_encoder(symbols, runs: int = 3, count: int = 10000):
+    """Recursive Python conversion vs the BSON fallback-encoder codec"""
+    print(f"🧬 DOCUMENT ENCODING: {count} market documents")
+    print("-" * 50)
+    documents = sample_market_documents(symbols, count)
+
+    def legacy():
+        return [bson.encode(legacy_convert_numpy_types(doc)) for doc in documents]
+
+    def codec():
+        return [bson.encode(doc, codec_options=NUMPY_CODEC_OPTIONS) for doc in documents]
+
+    legacy_encoded, codec_encoded = legacy(), codec()
+    assert [bson.decode(doc) for doc in legacy_encoded] == [bson.decode(doc) for doc in codec_encoded], \
+        "codec output differs from the legacy converter"
+
+    legacy_time = min(timed(legacy)[1] for _ in range(runs))
+    codec_time = min(timed(codec)[1] for _ in range(runs))
+    print(f"   🐢 Recursive convert + encode: {legacy_time * 1000:.1f}ms ({legacy_time / count * 1e6:.1f}µs/doc)")
+    print(f"   🚀 Codec encode:               {codec_time * 1000:.1f}ms ({codec_time / count * 1e6:.1f}µs/doc)")
+    print(f"   ⚡ Speedup: {legacy_time / max(codec_time, 1e-9):.1f}x (outputs identical)")
+
+
+def bench_pipeline(symbols, runs: int = 3, universe: int = 1000):
+    """End-to-end cycle on the synthetic feed: fetcher, strategy engine and API, no network"""
+    print(f"🏭 PIPELINE: {universe} synthetic symbols")
+    print("-" * 50)
+    try:
+        import mongomock
+    except ImportError:
+        print("   ⚠️  mongomock is not installed (pip install -r requirements-dev.txt), skipping")
+        return
+
+    import strategy_engine
+
+    provider = SyntheticProvider(seed=42, latency=0.002, latency_jitter=0.003, error_rate=0.01)
+    # The strategy engine only reads the tracked ETFs and VIX, so they lead the universe
+    tracked = [*strategy_engine.TRACKED_SYMBOLS, strategy_engine.VIX_SYMBOL]
+    universe_symbols = (tracked + [f"SYN{i:05d}" for i in range(universe)])[:max(universe, len(tracked))]
+    universe = len(universe_symbols)
+    db = mongomock.MongoClient()['adaptive_market_db']
+    directory = tempfile.mkdtemp(prefix="pipeline_bench_")
+    try:
+        fetcher = MarketDataFetcher(
+            None, None, max_workers=16, symbols=universe_symbols, hedge_delay=None,
+            write_batch_size=1000, quote_provider=provider, bar_provider=provider, database=db,
+            bar_store=BarStore(directory, interval='1d', download=provider.download_bars)
+        )
+
+        # Fetcher output is per symbol, so keep it out of the report
+        def cycle():
+            with contextlib.redirect_stdout(io.StringIO()):
+                return fetcher.fetch_and_store_all_symbols(symbols=universe_symbols)
+
+        stored, cold = timed(cycle)
+        if not stored:
+            raise SystemExit(f"   ❌ Cold cycle stored 0/{universe} documents, the timings would be meaningless")
+        print(f"   ❄️  Cold cycle: {cold:.2f}s ({stored}/{universe} stored, {universe / cold:,.0f} symbols/s)")
+        warm = []
+        for _ in range(runs):
+            stored, elapsed = timed(cycle)
+            if not stored:
+                raise SystemExit(f"   ❌ Warm cycle stored 0/{universe} documents, the timings would be meaningless")
+            warm.append(elapsed)
+        print(f"   🔥 Warm cycle: {min(warm):.2f}s best of {runs} ({stored}/{universe} stored, "
+              f"{universe / min(warm):,.0f} symbols/s)")
+        print(f"   🎲 Provider calls: {provider.calls}, injected errors: {provider.errors}")
+
+        analysis, elapsed = timed(strategy_engine.analyze_market_conditions, db)
+        if analysis is None:
+            raise SystemExit("   ❌ Strategy analysis found no tracked ETF documents")
+        print(f"   🤖 Strategy analysis: {elapsed * 1000:.1f}ms over {db.market_conditions.count_documents({})} documents")
+
+        # The API connects at import time; point it at nothing and hand it the in-memory database
+        os.environ.setdefault('MONGODB_URI', 'mongodb://127.0.0.1:9/?serverSelectionTimeoutMS=100')
+        os.environ['NEWS_API_KEY'] = 'demo'
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                import main as api
+        except ImportError as e:
+            print(f"   ⚠️  API not benchmarked ({e})")
+            return
+        api.db, api.mongodb_connected = db, True
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, elapsed = timed(asyncio.run, api.get_current_analysis())
+        print(f"   🌐 /api/current-analysis: {elapsed * 1000:.1f}ms")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def sample_strategy_features(count: int, seed: int = 7) -> np.ndarray:
+    """Random strategy rule feature matrix spread across every rule's thresholds"""
+    rng = np.random.default_rng(seed)
+    features = np.zeros((count, len(FEATURE_FIELDS)))
+    features[:, AVG_CHANGE] = rng.normal(0.5, 1.5, count)
+    features[:, AVG_RSI] = rng.uniform(25, 80, count)
+    features[:, CHANGE_RANGE] = np.abs(rng.normal(1.5, 2.0, count))
+    features[:, STRONG_TRENDS] = rng.integers(0, 5, count)
+    features[:, UP_TRENDS] = rng.integers(0, 5, count)
+    features[:, HIGH_VOLUME] = rng.integers(0, 5, count)
+    features[:, EVENTS] = rng.integers(0, 6, count)
+    features[:, HIGH_VOLATILITY_FLAG] = rng.random(count) < 0.2
+    features[:, VOLATILITY_CONFIDENCE] = rng.uniform(0.6, 1.0, count)
+    return features
+
+
+def bench_replay(symbols, runs: int = 3, years: int = 10, scalar_sample: int = 20000):
+    """Vectorized strategy rule replay vs the scalar rules (equivalence is covered by test_strategy_rules.py)"""
+    snapshots = years * 252 * 78  # 5-minute snapshots of a regular session
+    print(f"🔁 STRATEGY REPLAY: {snapshots:,} snapshots ({years} years of 5-minute cycles)")
+    print("-" * 50)
+
+    features = sample_strategy_features(snapshots)
+    rows = [dict(zip(FEATURE_FIELDS, row)) for row in features[:scalar_sample].tolist()]
+    _, scalar_time = timed(lambda: [select_strategies(row) for row in rows])
+    replay_time = min(timed(replay_strategies, features)[1] for _ in range(runs))
+    scalar_estimate = scalar_time / len(rows) * snapshots
+    print(f"   🐢 Scalar rules:     {scalar_estimate:.2f}s (extrapolated, {scalar_time / len(rows) * 1e6:.1f}µs/snapshot)")
+    print(f"   🚀 Vectorized replay: {replay_time * 1000:.1f}ms best of {runs}")
+    print(f"   ⚡ Speedup: {scalar_estimate / max(replay_time, 1e-9):.0f}x")
+
+
+BENCHMARKS = {
+    'bar_store': bench_bar_store,
+    'encoder': bench_encoder,
+    'pipeline': bench_pipeline,
+    'replay': bench_replay
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Market data pipeline benchmarks")
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                        help=f"Benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument('--symbols', nargs='+', default=DEFAULT_SYMBOLS, help="Symbols to benchmark with")
+    parser.add_argument('--runs', type=int, default=3, help="Repetitions for warm timings")
+    parser.add_argument('--universe', type=int, default=1000, help="Synthetic symbols for the pipeline benchmark")
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    print("⏱️  ADAPTIVE MARKET STRATEGY AGENT - BENCHMARKS")
+    print("=" * 50)
+    for name in args.benchmarks or list(BENCHMARKS):
+        if name == 'pipeline':
+            bench_pipeline(args.symbols, args.runs, universe=args.universe)
+        else:
+            BENCHMARKS[name](args.symbols, args.runs)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from indicator_engine import BarPanel, bar_timestamps
+
+# Dense N x N matrices: keep the correlation universe to a few hundred symbols
+MAX_SYMBOLS = 500
+
+
+class RollingCorrelation:
+    # Recompute the matrices from the window this often to stop float drift
+    RESUM_INTERVAL = 1000
+
+    def __init__(self, symbols: Sequence[str], window: int = 60):
+        """
+        Rolling covariance and correlation of daily log returns across a universe
+
+        Pairwise sums over the last `window` returns are kept as N x N
+        matrices. A new bar adds the outer products of its return vector
+        and drops those of the return leaving the window, so each bar costs
+        O(N^2) instead of recomputing from the whole window. Pairs only use
+        bars where both symbols have a return (pairwise complete, like
+        pandas DataFrame.corr).
+
+        Args:
+            symbols: Symbols in column order
+            window: Returns in the rolling window
+        """
+        self.symbols = list(symbols)
+        self.window = window
+        n = len(self.symbols)
+        self.returns = np.zeros((window, n))
+        self.present = np.zeros((window, n))
+        self.head = 0
+        self.rows = 0
+        self.cross = np.zeros((n, n))      # sum r_i r_j
+        self.sums = np.zeros((n, n))       # sum r_i over bars where j is present
+        self.squares = np.zeros((n, n))    # sum r_i^2 over bars where j is present
+        self.pairs = np.zeros((n, n))      # bars where both are present
+        self.dispersion_sum = 0.0
+        self.dispersions = np.full(window, np.nan)
+        self.last_close = np.full(n, np.nan)
+        self.last_bar_ts = None  # Bar timestamp as int nanoseconds since epoch (UTC)
+        self.updates_since_resum = 0
+
+    def _apply(self, returns: np.ndarray, present: np.ndarray, sign: float):
+        """Rank-one update (sign=1) or downdate (sign=-1) of every pairwise sum"""
+        self.cross += sign * np.outer(returns, returns)
+        self.sums += sign * np.outer(returns, present)
+        self.squares += sign * np.outer(returns * returns, present)
+        self.pairs += sign * np.outer(present, present)
+
+    def update(self, close: np.ndarray, bar_ts: Optional[int] = None):
+        """
+        Commit a row of daily closes
+
+        Args:
+            close: (N,) closes in symbol order (NaN = no bar)
+            bar_ts: Bar timestamp in nanoseconds since epoch
+        """
+        close = np.asarray(close, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_return = np.log(close / self.last_close)
+        present = np.isfinite(log_return).astype(np.float64)
+        log_return = np.where(present > 0, log_return, 0.0)
+
+        if self.rows == self.window:
+            self._apply(self.returns[self.head], self.present[self.head], -1.0)
+            if not np.isnan(self.dispersions[self.head]):
+                self.dispersion_sum -= self.dispersions[self.head]
+        self._apply(log_return, present, 1.0)
+        self.returns[self.head] = log_return
+        self.present[self.head] = present
+
+        # Cross-sectional dispersion of this bar's returns
+        dispersion = np.std(log_return[present > 0], ddof=1) if present.sum() >= 2 else np.nan
+        self.dispersions[self.head] = dispersion
+        if not np.isnan(dispersion):
+            self.dispersion_sum += dispersion
+
+        self.head = (self.head + 1) % self.window
+        self.rows = min(self.rows + 1, self.window)
+        self.last_close = np.where(np.isnan(close), self.last_close, close)
+        self.last_bar_ts = bar_ts
+
+        self.updates_since_resum += 1
+        if self.updates_since_resum >= self.RESUM_INTERVAL:
+            self._resum()
+
+    def _resum(self):
+        returns, present = self.returns, self.present
+        self.cross = returns.T @ returns
+        self.sums = returns.T @ present
+        self.squares = (returns * returns).T @ present
+        self.pairs = present.T @ present
+        self.dispersion_sum = float(np.nansum(self.dispersions))
+        self.updates_since_resum = 0
+
+    def covariance(self, min_periods: int = 2) -> np.ndarray:
+        """(N, N) pairwise-complete covariance of daily log returns (NaN below min_periods)"""
+        pairs = self.pairs
+        with np.errstate(divide='ignore', invalid='ignore'):
+            covariance = (self.cross - self.sums * self.sums.T / pairs) / (pairs - 1)
+        return np.where(pairs >= max(min_periods, 2), covariance, np.nan)
+
+    def correlation(self, min_periods: int = 2) -> np.ndarray:
+        """(N, N) pairwise-complete correlation of daily log returns"""
+        pairs = self.pairs
+        with np.errstate(divide='ignore', invalid='ignore'):
+            covariance = self.cross - self.sums * self.sums.T / pairs
+            variance = self.squares - self.sums ** 2 / pairs  # Of i over the bars shared with j
+            correlation = covariance / np.sqrt(variance * variance.T)
+        correlation = np.clip(correlation, -1.0, 1.0)
+        return np.where(pairs >= max(min_periods, 2), correlation, np.nan)
+
+    def average_correlation(self, min_periods: Optional[int] = None) -> Optional[float]:
+        """Mean correlation over all distinct pairs (None if no pair has enough data)"""
+        correlation = self.correlation(min_periods or self.window // 2)
+        upper = correlation[np.triu_indices(len(self.symbols), k=1)]
+        upper = upper[~np.isnan(upper)]
+        return float(upper.mean()) if len(upper) else None
+
+    def dispersion(self) -> Optional[float]:
+        """Mean cross-sectional standard deviation of daily returns over the window"""
+        count = int(np.sum(~np.isnan(self.dispersions)))
+        return float(self.dispersion_sum / count) if count else None
+
+    def features(self) -> Dict:
+        """Regime features: average pairwise correlation and return dispersion"""
+        return {
+            'average_correlation': self.average_correlation(),
+            'dispersion': self.dispersion(),
+            'window': self.window,
+            'bars': self.rows,
+            'symbols': len(self.symbols)
+        }
+
+    def to_dict(self, min_periods: Optional[int] = None) -> Dict:
+        """JSON-ready matrices and features (NaN becomes None)"""
+        min_periods = min_periods or self.window // 2
+
+        def matrix(values: np.ndarray) -> List[List[Optional[float]]]:
+            cells = values.astype(object)
+            cells[np.isnan(values)] = None
+            return cells.tolist()
+
+        return {
+            'symbols': self.symbols,
+            'as_of': None if self.last_bar_ts is None else datetime.utcfromtimestamp(self.last_bar_ts / 1e9),
+            **self.features(),
+            'correlation': matrix(self.correlation(min_periods)),
+            'covariance': matrix(self.covariance(min_periods))
+        }
+
+    def sync(self, panel: BarPanel, completed_rows: Optional[int] = None) -> int:
+        """
+        Commit the panel's rows that are newer than the last committed bar
+
+        Args:
+            panel: Daily bars with the same symbols as this engine
+            completed_rows: Only rows before this index are committed
+
+        Returns:
+            Number of rows committed
+        """
+        timestamps = bar_timestamps(panel.index)
+        end = len(timestamps) if completed_rows is None else completed_rows
+        start = 0 if self.last_bar_ts is None else int(np.searchsorted(timestamps, self.last_bar_ts, side='right'))
+        # Rows that would leave the window again only need to move last_close
+        skip = max(start, end - self.window - 1)
+        for i in range(start, skip):
+            self.last_close = np.where(np.isnan(panel.close[i]), self.last_close, panel.close[i])
+        for i in range(skip, end):
+            self.update(panel.close[i], int(timestamps[i]))
+        return max(0, end - start)
+
+    def connects_to(self, panel: BarPanel) -> bool:
+        """True if the panel covers this engine's symbols and its last committed bar"""
+        if panel.symbols != self.symbols:
+            return False
+        return self.last_bar_ts is None or self.last_bar_ts in bar_timestamps(panel.index)
+
+    @classmethod
+    def from_panel(cls, panel: BarPanel, window: int = 60,
+                   completed_rows: Optional[int] = None) -> 'RollingCorrelation':
+        """Build the engine from a bar panel, one rank-one update per row"""
+        engine = cls(panel.symbols, window)
+        engine.sync(panel, completed_rows)
+        return engine
@@ -0,0 +1,348 @@
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from bar_store import yahoo_download
+from indicator_engine import OHLCV_FIELDS
+from upstream_client import UpstreamClient, get_upstream_client
+
+
+class ProviderError(Exception):
+    """A provider failed to serve a request"""
+
+
+class QuotaExhaustedError(ProviderError):
+    """The provider's daily allowance is used up"""
+
+
+class MarketDataProvider:
+    """
+    Source of quotes and OHLCV bars used by MarketDataFetcher
+
+    rate_limit is (burst capacity, calls per second) or None for no limit,
+    daily_quota is calls per day or None, and unsupported_symbols lists
+    symbols the provider cannot quote.
+    """
+    name = 'provider'
+    rate_limit: Optional[Tuple[float, float]] = None
+    daily_quota: Optional[int] = None
+    unsupported_symbols = frozenset()
+
+    def get_quote(self, symbol: str) -> Optional[Dict]:
+        """
+        Latest quote for a symbol
+
+        Returns:
+            Dictionary with symbol, price, change, change_percent, volume,
+            previous_close, timestamp and source, or None if unavailable
+
+        Raises:
+            ProviderError: If the provider failed
+        """
+        raise NotImplementedError(f"{self.name} does not serve quotes")
+
+    def download_bars(self, symbols: List[str], start: Optional[str] = None, period: Optional[str] = None,
+                      interval: str = '1d', end: Optional[str] = None) -> pd.DataFrame:
+        """
+        Batched OHLCV download in the yf.download(group_by='column') layout
+
+        Returns:
+            DataFrame with (field, ticker) MultiIndex columns
+        """
+        raise NotImplementedError(f"{self.name} does not serve bars")
+
+
+class AlphaVantageProvider(MarketDataProvider):
+    name = 'alpha_vantage'
+    rate_limit = (5, 5 / 60)  # Free tier: 5 calls per minute
+    daily_quota = 25
+    unsupported_symbols = frozenset({'VIX'})
+    base_url = "https://www.alphavantage.co/query"
+
+    def __init__(self, api_key: str, http: Optional[UpstreamClient] = None):
+        """
+        Alpha Vantage GLOBAL_QUOTE quotes over the shared upstream client
+
+        Args:
+            api_key: Alpha Vantage API key
+            http: Upstream HTTP client (defaults to the process-wide one)
+        """
+        self.api_key = api_key
+        self.http = http or get_upstream_client()
+
+    def get_quote(self, symbol: str) -> Optional[Dict]:
+        params = {'function': 'GLOBAL_QUOTE', 'symbol': symbol, 'apikey': self.api_key}
+        data = self.http.get('alpha_vantage', self.base_url, params=params).json()
+
+        if 'rate limit' in str(data.get('Information', '')).lower():
+            raise QuotaExhaustedError(data['Information'])
+        if 'Global Quote' not in data:
+            print(f"Error fetching {symbol}: {data}")
+            return None
+
+        quote = data['Global Quote']
+        return {
+            'symbol': symbol,
+            'price': float(quote['05. price']),
+            'change': float(quote['09. change']),
+            'change_percent': float(quote['10. change percent'].replace('%', '')),
+            'volume': int(quote['06. volume']),
+            'previous_close': float(quote['08. previous close']),
+            'timestamp': datetime.utcnow(),
+            'source': self.name
+        }
+
+
+class YahooFinanceProvider(MarketDataProvider):
+    name = 'yahoo_finance'
+    rate_limit = (10, 2.0)
+
+    def download_bars(self, symbols: List[str], start: Optional[str] = None, period: Optional[str] = None,
+                      interval: str = '1d', end: Optional[str] = None) -> pd.DataFrame:
+        return yahoo_download(symbols, start=start, period=period, interval=interval, end=end)
+
+    def get_quote(self, symbol: str) -> Optional[Dict]:
+        frame = self.download_bars([symbol], period='5d')
+        closes = frame['Close'].iloc[:, 0].dropna() if frame is not None and not frame.empty else []
+        if len(closes) < 2:
+            return None
+        price, previous_close = float(closes.iloc[-1]), float(closes.iloc[-2])
+        return {
+            'symbol': symbol,
+            'price': price,
+            'change': price - previous_close,
+            'change_percent': (price - previous_close) / previous_close * 100,
+            'volume': int(frame['Volume'].iloc[-1, 0]),
+            'previous_close': previous_close,
+            'timestamp': datetime.utcnow(),
+            'source': self.name
+        }
+
+
+# Volume regimes of the synthetic feed: (volume multiplier, volatility multiplier)
+VOLUME_REGIMES = np.array([[0.6, 0.8], [1.0, 1.0], [2.5, 1.6]])
+
+INTRADAY_MINUTES = {'1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30, '60m': 60, '1h': 60, '90m': 90}
+
+
+@lru_cache(maxsize=64)
+def business_days(first: pd.Timestamp, year: int) -> pd.DatetimeIndex:
+    """Weekdays of a year from first on (cached, every quote needs them)"""
+    return pd.bdate_range(max(pd.Timestamp(year, 1, 1), first), pd.Timestamp(year, 12, 31))
+
+
+class SyntheticProvider(MarketDataProvider):
+    name = 'synthetic'
+
+    def __init__(self, seed: int = 42, latency: float = 0.0, latency_jitter: float = 0.0,
+                 error_rate: float = 0.0, origin: str = '2015-01-02', regime_persistence: float = 0.95,
+                 clock: Callable[[], float] = time.time, sleep: Callable[[float], None] = time.sleep):
+        """
+        Deterministic offline feed for load tests and benchmarks
+
+        Every symbol gets its own seeded geometric Brownian motion (drift and
+        volatility drawn from the seed) whose volume and volatility switch
+        between quiet, normal and active regimes. Yearly log prices follow a
+        seeded random walk from `origin` and each year (or intraday session)
+        is a Brownian bridge between its anchors, so a symbol always has the
+        same history, intraday bars end on the daily close, and only the
+        requested window is simulated. Any symbol name is valid, so universes
+        of 10,000+ symbols can be emulated.
+
+        Args:
+            seed: Global seed
+            latency: Seconds added to every call
+            latency_jitter: Extra uniform random latency up to this many seconds
+            error_rate: Probability that a call raises ProviderError
+            origin: First daily bar
+            regime_persistence: Probability of staying in a volume regime each bar
+            clock: Wall clock in epoch seconds, used for live quote ticks
+            sleep: Sleep function used to inject latency
+        """
+        self.seed = seed
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.origin = pd.Timestamp(origin)
+        self.regime_persistence = regime_persistence
+        self.clock = clock
+        self.sleep = sleep
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self._params_cache = {}
+
+    def _simulate_call(self):
+        """Apply latency and error injection to one call"""
+        with self.lock:
+            self.calls += 1
+            delay = self.latency + self.random.uniform(0, self.latency_jitter)
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if delay > 0:
+            self.sleep(delay)
+        if failed:
+            raise ProviderError(f"{self.name}: injected error")
+
+    def _rng(self, *parts) -> np.random.Generator:
+        return np.random.default_rng([self.seed, zlib.crc32(':'.join(map(str, parts)).encode())])
+
+    def _params(self, symbols: List[str]) -> np.ndarray:
+        """(N, 4) start price, annual drift, annual volatility and base volume per symbol"""
+        params = np.empty((len(symbols), 4))
+        for j, symbol in enumerate(symbols):
+            cached = self._params_cache.get(symbol)
+            if cached is None:
+                rng = self._rng(symbol, 'params')
+                cached = (rng.uniform(10, 500), rng.normal(0.07, 0.05), rng.uniform(0.1, 0.6),
+                          10 ** rng.uniform(5, 7.5))
+                self._params_cache[symbol] = cached
+            params[j] = cached
+        return params
+
+    def _year_anchors(self, symbols: List[str], params: np.ndarray, last_year: int) -> np.ndarray:
+        """(N, years + 1) log price on the first day of every year from the origin year"""
+        years = last_year + 2 - self.origin.year
+        anchors = np.empty((len(symbols), years))
+        for j, symbol in enumerate(symbols):
+            _, drift, volatility, _ = params[j]
+            yearly = (drift - 0.5 * volatility ** 2) + volatility * self._rng(symbol, 'anchors').standard_normal(years - 1)
+            anchors[j] = np.log(params[j, 0]) + np.concatenate([[0.0], np.cumsum(yearly)])
+        return anchors
+
+    def _block(self, symbols: List[str], params: np.ndarray, bars: int, bars_per_year: float, salt,
+               start_log: np.ndarray, end_log: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Simulate (N, bars) OHLCV rows that run from one anchored log price to the next
+
+        Each symbol's draws come from its own generator seeded by the block,
+        so a block never depends on the window requested or on which other
+        symbols were requested with it.
+        """
+        n = len(symbols)
+        draws = np.empty((n, 5, bars))
+        for j, symbol in enumerate(symbols):
+            stream = self._rng(symbol, salt)
+            draws[j, :4] = stream.standard_normal((4, bars))
+            draws[j, 4] = stream.random(bars)
+        volatility, base_volume = params[:, 2:3], params[:, 3:4]
+        z, noise, u = draws[:, 0], draws[:, 1:4], draws[:, 4]
+
+        # Markov-switching volume regime: every switch moves the state 1 or 2
+        # steps around the three regimes, so the state is a running sum mod 3
+        steps = np.where(u > self.regime_persistence, 1 + (u * 1000).astype(np.int64) % 2, 0)
+        regimes = (1 + np.cumsum(steps, axis=1)) % 3
+        sigma = volatility * VOLUME_REGIMES[regimes, 1] / np.sqrt(bars_per_year)
+
+        # Brownian bridge: spread the gap to the next anchor evenly over the block
+        log_returns = sigma * z
+        log_returns += ((end_log - start_log) - log_returns.sum(axis=1))[:, None] / bars
+        close = np.exp(start_log[:, None] + np.cumsum(log_returns, axis=1))
+        previous = np.hstack([np.exp(start_log)[:, None], close[:, :-1]])
+        open_ = previous * np.exp(0.2 * sigma * noise[:, 0])
+        high = np.maximum(open_, close) * np.exp(0.5 * sigma * np.abs(noise[:, 1]))
+        low = np.minimum(open_, close) * np.exp(-0.5 * sigma * np.abs(noise[:, 2]))
+        # Volume rises with the size of the move
+        volume = np.round(base_volume * VOLUME_REGIMES[regimes, 0] * np.exp(0.2 * np.abs(z) + 0.1 * noise[:, 0]))
+        return {'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}
+
+    def _daily(self, symbols: List[str], first: pd.Timestamp, last: pd.Timestamp) -> Tuple[pd.DatetimeIndex, Dict[str, np.ndarray]]:
+        """
+        Daily bars in [first, last] as (index, {field: (T, N) matrix})
+
+        Every calendar year is one block anchored to a yearly random walk, so
+        only the years overlapping the window are simulated.
+        """
+        first = max(first, self.origin)
+        params = self._params(symbols)
+        anchors = self._year_anchors(symbols, params, max(last.year, self.origin.year))
+        indexes, blocks = [], []
+        for year in range(first.year, last.year + 1):
+            days = business_days(self.origin, year)
+            k = year - self.origin.year
+            block = self._block(symbols, params, len(days), 252, f"daily:{year}", anchors[:, k], anchors[:, k + 1])
+            keep = (days >= first) & (days <= last)
+            indexes.append(days[keep])
+            blocks.append({field: values[:, keep] for field, values in block.items()})
+        index = indexes[0].append(indexes[1:]) if indexes else pd.DatetimeIndex([])
+        matrices = {field: np.hstack([block[field] for block in blocks]).T if blocks else np.empty((0, len(symbols)))
+                    for field in OHLCV_FIELDS}
+        return index, matrices
+
+    def _window(self, start: Optional[str], end: Optional[str], period: Optional[str]) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        today = pd.Timestamp(datetime.fromtimestamp(self.clock())).normalize()
+        end_day = min(pd.Timestamp(end) - pd.Timedelta(days=1), today) if end else today
+        if start:
+            return pd.Timestamp(start), end_day
+        match = re.fullmatch(r'(\d+)(d|wk|mo|y)', period or '1y')
+        if not match:
+            return self.origin, end_day
+        count, unit = int(match.group(1)), match.group(2)
+        days = count * {'d': 1, 'wk': 7, 'mo': 31, 'y': 366}[unit]
+        return end_day - pd.Timedelta(days=days - 1), end_day
+
+    def _frame(self, matrices: Dict[str, np.ndarray], index: pd.DatetimeIndex, symbols: List[str]) -> pd.DataFrame:
+        return pd.concat({field: pd.DataFrame(matrices[field], index=index, columns=symbols)
+                          for field in OHLCV_FIELDS}, axis=1)
+
+    def download_bars(self, symbols: List[str], start: Optional[str] = None, period: Optional[str] = None,
+                      interval: str = '1d', end: Optional[str] = None) -> pd.DataFrame:
+        self._simulate_call()
+        first, last = self._window(start, end, period)
+
+        if interval == '1d':
+            index, matrices = self._daily(symbols, first, last)
+            return self._frame(matrices, index.tz_localize('America/New_York'), symbols)
+
+        if interval not in INTRADAY_MINUTES:
+            raise ProviderError(f"{self.name}: unsupported interval {interval}")
+        # Each session is a block bridging the previous daily close to that day's close
+        session = pd.timedelta_range('9h30min', '15h59min', freq=f'{INTRADAY_MINUTES[interval]}min')
+        days, daily = self._daily(symbols, first - pd.Timedelta(days=7), last)
+        params = self._params(symbols)
+        log_close = np.log(daily['Close'])
+        indexes, blocks = [], []
+        for i in range(1, len(days)):
+            if days[i] < first:
+                continue
+            block = self._block(symbols, params, len(session), 252 * len(session),
+                                f"{interval}:{days[i]:%Y%m%d}", log_close[i - 1], log_close[i])
+            indexes.append(days[i] + session)
+            blocks.append(block)
+        index = indexes[0].append(indexes[1:]) if indexes else pd.DatetimeIndex([])
+        matrices = {field: np.hstack([block[field] for block in blocks]).T if blocks else np.empty((0, len(symbols)))
+                    for field in OHLCV_FIELDS}
+        return self._frame(matrices, index.tz_localize('America/New_York'), symbols)
+
+    def get_quote(self, symbol: str) -> Optional[Dict]:
+        self._simulate_call()
+        today = pd.Timestamp(datetime.fromtimestamp(self.clock())).normalize()
+        _, daily = self._daily([symbol], today - pd.Timedelta(days=10), today)
+        closes, volumes = daily['Close'][:, 0], daily['Volume'][:, 0]
+        if len(closes) < 2:
+            return None
+        # Live tick: a deterministic move away from today's close per minute
+        minute = int(self.clock() // 60)
+        tick = self._rng(symbol, 'tick', minute).normal(0, 0.002)
+        price = float(closes[-1] * np.exp(tick))
+        previous_close = float(closes[-2])
+        return {
+            'symbol': symbol,
+            'price': price,
+            'change': price - previous_close,
+            'change_percent': (price - previous_close) / previous_close * 100,
+            'volume': int(volumes[-1]),
+            'previous_close': previous_close,
+            'timestamp': datetime.utcnow(),
+            'source': self.name
+        }
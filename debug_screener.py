@@ -3,8 +3,8 @@
 Debug script to test stock screener functionality
 """
 
-import yfinance as yf
 import pandas as pd
+from bar_store import BarStore
 
 def calculate_rsi(prices, period=14):
     """Calculate RSI indicator"""
@@ -27,12 +27,15 @@ def test_momentum_screening():
     
     results = []
     
+    # Reuse locally stored bars; only the missing tail is downloaded
+    bar_store = BarStore(interval='1d')
+    bar_store.update(test_stocks)
+    
     for symbol in test_stocks:
         try:
             print(f"\n📊 Analyzing {symbol}:")
             
-            stock = yf.Ticker(symbol)
-            hist = stock.history(period="3mo")
+            hist = bar_store.frame(symbol, days=92)
             
             if len(hist) < 50:
                 print(f"   ❌ Insufficient data (only {len(hist)} days)")
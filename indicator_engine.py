@@ -0,0 +1,470 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+# Column names used by yfinance for daily bars
+OHLCV_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+class BarPanel:
+    def __init__(self, index: pd.DatetimeIndex, symbols: List[str], open_: np.ndarray,
+                 high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray):
+        """
+        Aligned (time x symbol) OHLCV matrices for a universe of symbols
+
+        Rows are the union of all bar timestamps; a symbol without a bar at a
+        given timestamp has NaN in that row.
+
+        Args:
+            index: Bar timestamps (length T)
+            symbols: Symbols in column order (length N)
+            open_, high, low, close, volume: float64 matrices of shape (T, N)
+        """
+        self.index = index
+        self.symbols = list(symbols)
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    @classmethod
+    def from_yfinance(cls, frame: pd.DataFrame, symbols: List[str]) -> 'BarPanel':
+        """
+        Build a panel from the result of a multi-ticker yf.download call
+
+        Args:
+            frame: DataFrame with (field, ticker) MultiIndex columns
+            symbols: Requested symbols; missing tickers become NaN columns
+
+        Returns:
+            BarPanel with one column per requested symbol
+        """
+        if not isinstance(frame.columns, pd.MultiIndex):
+            # Single ticker download without a ticker level
+            frame = pd.concat({symbols[0]: frame}, axis=1).swaplevel(0, 1, axis=1)
+
+        matrices = {}
+        for field in OHLCV_FIELDS:
+            if field in frame.columns.get_level_values(0):
+                matrices[field] = frame[field].reindex(columns=symbols).to_numpy(dtype=np.float64)
+            else:
+                matrices[field] = np.full((len(frame), len(symbols)), np.nan)
+
+        # Drop rows where no symbol has a close
+        keep = ~np.isnan(matrices['Close']).all(axis=1)
+        return cls(
+            frame.index[keep], symbols,
+            matrices['Open'][keep], matrices['High'][keep], matrices['Low'][keep],
+            matrices['Close'][keep], matrices['Volume'][keep]
+        )
+
+    def column(self, symbol: str) -> int:
+        return self.symbols.index(symbol)
+
+    def select(self, symbols: List[str]) -> 'BarPanel':
+        """Panel restricted to a subset of its symbols, in the given order"""
+        columns = [self.column(symbol) for symbol in symbols]
+        return BarPanel(self.index, symbols, self.open[:, columns], self.high[:, columns],
+                        self.low[:, columns], self.close[:, columns], self.volume[:, columns])
+
+    def frame(self, symbol: str) -> pd.DataFrame:
+        """Per-symbol OHLCV DataFrame (yfinance column names), NaN rows dropped"""
+        j = self.column(symbol)
+        frame = pd.DataFrame({
+            'Open': self.open[:, j],
+            'High': self.high[:, j],
+            'Low': self.low[:, j],
+            'Close': self.close[:, j],
+            'Volume': self.volume[:, j]
+        }, index=self.index)
+        return frame[~np.isnan(self.close[:, j])]
+
+
+def bar_timestamps(index: pd.DatetimeIndex) -> np.ndarray:
+    """Bar timestamps as int64 nanoseconds since epoch (UTC)"""
+    return pd.DatetimeIndex(index).as_unit('ns').asi8
+
+
+def rolling_mean(matrix: np.ndarray, window: int) -> np.ndarray:
+    """
+    Rolling mean down the time axis of a (T, N) matrix
+
+    Matches pandas ``rolling(window).mean()``: a value is only produced when
+    the full window contains no missing observations.
+
+    Args:
+        matrix: (T, N) float matrix, NaN for missing values
+        window: Window length in rows
+
+    Returns:
+        (T, N) matrix of rolling means, NaN where the window is incomplete
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.ndim == 1:
+        matrix = matrix[:, None]
+    rows, cols = matrix.shape
+    result = np.full((rows, cols), np.nan)
+    if rows < window:
+        return result
+
+    valid = ~np.isnan(matrix)
+    sums = np.zeros((rows + 1, cols))
+    counts = np.zeros((rows + 1, cols))
+    np.cumsum(np.where(valid, matrix, 0.0), axis=0, out=sums[1:])
+    np.cumsum(valid, axis=0, out=counts[1:])
+
+    window_sums = sums[window:] - sums[:-window]
+    window_counts = counts[window:] - counts[:-window]
+    result[window - 1:] = np.where(window_counts == window, window_sums / window, np.nan)
+    return result
+
+
+def rsi(closes: np.ndarray, window: int = 14) -> np.ndarray:
+    """
+    RSI down the time axis of a (T, N) close matrix
+
+    Uses simple rolling means of gains and losses, the same definition as
+    MarketDataFetcher.calculate_technical_indicators.
+
+    Args:
+        closes: (T, N) close matrix
+        window: RSI lookback in bars
+
+    Returns:
+        (T, N) RSI matrix
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    if closes.ndim == 1:
+        closes = closes[:, None]
+    delta = np.full(closes.shape, np.nan)
+    delta[1:] = np.diff(closes, axis=0)
+
+    # NaN deltas count as zero gain/loss, like Series.where(delta > 0, 0)
+    gain = rolling_mean(np.where(delta > 0, delta, 0.0), window)
+    loss = rolling_mean(np.where(delta < 0, -delta, 0.0), window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = gain / loss
+        return 100 - (100 / (1 + rs))
+
+
+def latest_realized_volatility(closes: np.ndarray, window: int = 20) -> np.ndarray:
+    """
+    Annualized close-to-close volatility over the last `window` returns
+
+    Args:
+        closes: (T, N) close matrix (NaN where a symbol has no bar)
+        window: Number of daily returns to use
+
+    Returns:
+        (N,) volatility vector, NaN for symbols with too little history
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    if closes.ndim == 1:
+        closes = closes[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.diff(np.log(closes), axis=0)[-window:]
+    counts = np.sum(~np.isnan(returns), axis=0)
+    result = np.full(closes.shape[1], np.nan)
+    enough = counts >= max(2, window // 2)
+    if enough.any():
+        result[enough] = np.nanstd(returns[:, enough], axis=0, ddof=1) * np.sqrt(252)
+    return result
+
+
+def compute_panel_indicators(closes: np.ndarray, volumes: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Compute every technical indicator for every symbol in one vectorized pass
+
+    Args:
+        closes: (T, N) close matrix
+        volumes: (T, N) volume matrix
+
+    Returns:
+        Dictionary of (T, N) indicator matrices
+    """
+    return {
+        'sma_20': rolling_mean(closes, 20),
+        'sma_50': rolling_mean(closes, 50),
+        'rsi': rsi(closes, 14),
+        'volume_sma_20': rolling_mean(volumes, 20)
+    }
+
+
+def latest_panel_indicators(panel: BarPanel, min_bars: int = 20) -> Dict[str, Dict]:
+    """
+    Latest indicator values per symbol, in the shape calculate_technical_indicators uses
+
+    Args:
+        panel: Bar panel for the universe
+        min_bars: Minimum number of bars a symbol needs to get indicators
+
+    Returns:
+        Dictionary mapping symbol to its latest indicator values; symbols
+        without enough history or without a bar in the latest row are omitted
+    """
+    if len(panel.index) == 0:
+        return {}
+
+    # The panel spans the union of all symbols' timestamps, so a symbol can
+    # have empty rows inside its windows. Move every symbol's own bars to the
+    # bottom of its column (in order) so windows and RSI deltas run over its
+    # own consecutive bars, like the per-symbol history does.
+    has_bar = ~np.isnan(panel.close)
+    order = np.argsort(has_bar, axis=0, kind='stable')
+    series = compute_panel_indicators(np.take_along_axis(panel.close, order, axis=0),
+                                      np.take_along_axis(panel.volume, order, axis=0))
+
+    bar_counts = has_bar.sum(axis=0)
+    last = {name: values[-1] for name, values in series.items()}
+    has_last_bar = has_bar[-1]
+
+    latest = {}
+    for j, symbol in enumerate(panel.symbols):
+        if bar_counts[j] < min_bars or not has_last_bar[j]:
+            continue
+        latest[symbol] = {
+            'sma_20': float(last['sma_20'][j]),
+            'sma_50': float(last['sma_50'][j]),
+            'rsi': float(last['rsi'][j]),
+            'volume_sma_20': float(last['volume_sma_20'][j])
+        }
+    return latest
+
+
+def finalize_indicators(panel_values: Dict, data: Dict) -> Dict:
+    """
+    Combine precomputed indicator values with the live quote
+
+    Args:
+        panel_values: Latest values from latest_panel_indicators
+        data: Current market data (price and volume)
+
+    Returns:
+        Indicator dictionary as consumed by determine_regime_signals
+    """
+    indicators = {
+        'sma_20': panel_values['sma_20'],
+        'sma_50': panel_values['sma_50'],
+        'rsi': panel_values['rsi'],
+        'volume_sma_20': int(panel_values['volume_sma_20'])
+    }
+    indicators['volume_ratio'] = float(data['volume'] / indicators['volume_sma_20'])
+
+    current_price = data['price']
+    indicators['above_sma_20'] = bool(current_price > indicators['sma_20'])
+    indicators['above_sma_50'] = bool(current_price > indicators['sma_50'])
+    return indicators
+
+
+class RingBuffer:
+    def __init__(self, size: int, values: Optional[List[float]] = None):
+        """
+        Fixed-size ring buffer with O(1) push and lookback
+
+        Args:
+            size: Maximum number of values kept
+            values: Initial values in chronological order
+        """
+        self.size = size
+        self.buffer = [0.0] * size
+        self.head = 0  # Next write position
+        self.count = 0
+        for value in (values or [])[-size:]:
+            self.push(value)
+
+    def push(self, value: float) -> Optional[float]:
+        """Append a value and return the one it evicted (None while filling up)"""
+        evicted = self.buffer[self.head] if self.count == self.size else None
+        self.buffer[self.head] = value
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        return evicted
+
+    def ago(self, k: int) -> float:
+        """Value pushed k steps ago (0 is the most recent)"""
+        return self.buffer[(self.head - 1 - k) % self.size]
+
+    def values(self) -> List[float]:
+        """Values in chronological order"""
+        return [self.ago(k) for k in range(self.count - 1, -1, -1)]
+
+
+class IncrementalIndicatorState:
+    SMA_SHORT = 20
+    SMA_LONG = 50
+    RSI_WINDOW = 14
+    VOLUME_WINDOW = 20
+    # Recompute running sums from the buffers this often to stop float drift
+    RESUM_INTERVAL = 1000
+
+    def __init__(self, symbol: str, timeframe: str = '1d'):
+        """
+        Streaming SMA/RSI/volume state for one symbol, updated in O(1) per bar
+
+        RSI uses simple means of the gains and losses of the last 14 changes,
+        the same definition as rsi() and the per-symbol pandas calculation, so
+        the stored value means the same whichever path produced it.
+
+        Args:
+            symbol: Stock symbol
+            timeframe: Bar timeframe this state tracks
+        """
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.closes = RingBuffer(self.SMA_LONG)
+        self.volumes = RingBuffer(self.VOLUME_WINDOW)
+        self.sum_short = 0.0
+        self.sum_long = 0.0
+        self.sum_volume = 0.0
+        self.sum_gain = 0.0
+        self.sum_loss = 0.0
+        self.last_close = None
+        self.last_bar_ts = None  # Bar timestamp as int nanoseconds since epoch (UTC)
+        self.bar_count = 0
+        self.updates_since_resum = 0
+
+    def _rsi_sums(self, close: float):
+        """Gain and loss sums over the last RSI_WINDOW changes after adding a bar (no mutation)"""
+        if self.last_close is None:
+            return self.sum_gain, self.sum_loss
+        delta = close - self.last_close
+        sum_gain = self.sum_gain + max(delta, 0.0)
+        sum_loss = self.sum_loss + max(-delta, 0.0)
+        if self.closes.count > self.RSI_WINDOW:
+            # Drop the change that leaves the window
+            evicted = self.closes.ago(self.RSI_WINDOW - 1) - self.closes.ago(self.RSI_WINDOW)
+            sum_gain -= max(evicted, 0.0)
+            sum_loss -= max(-evicted, 0.0)
+        return sum_gain, sum_loss
+
+    def _window_sums(self, close: float, volume: float):
+        """Running sums after adding a bar (no mutation)"""
+        sum_short = self.sum_short + close
+        if self.closes.count >= self.SMA_SHORT:
+            sum_short -= self.closes.ago(self.SMA_SHORT - 1)
+        sum_long = self.sum_long + close
+        if self.closes.count >= self.SMA_LONG:
+            sum_long -= self.closes.ago(self.SMA_LONG - 1)
+        sum_volume = self.sum_volume + volume
+        if self.volumes.count >= self.VOLUME_WINDOW:
+            sum_volume -= self.volumes.ago(self.VOLUME_WINDOW - 1)
+        return sum_short, sum_long, sum_volume
+
+    def update(self, close: float, volume: float, bar_ts: Optional[int] = None):
+        """
+        Commit a completed bar
+
+        Args:
+            close: Bar close
+            volume: Bar volume
+            bar_ts: Bar timestamp in nanoseconds since epoch
+        """
+        close = float(close)
+        volume = float(volume)
+        self.sum_short, self.sum_long, self.sum_volume = self._window_sums(close, volume)
+        self.sum_gain, self.sum_loss = self._rsi_sums(close)
+        self.closes.push(close)
+        self.volumes.push(volume)
+        self.bar_count += 1
+        self.last_close = close
+        self.last_bar_ts = bar_ts
+
+        self.updates_since_resum += 1
+        if self.updates_since_resum >= self.RESUM_INTERVAL:
+            self._resum()
+
+    def _resum(self):
+        closes = self.closes.values()
+        self.sum_short = float(sum(closes[-self.SMA_SHORT:]))
+        self.sum_long = float(sum(closes))
+        self.sum_volume = float(sum(self.volumes.values()))
+        changes = np.diff(closes[-(self.RSI_WINDOW + 1):])
+        self.sum_gain = float(changes[changes > 0].sum())
+        self.sum_loss = float(-changes[changes < 0].sum())
+        self.updates_since_resum = 0
+
+    def values(self, close: Optional[float] = None, volume: Optional[float] = None) -> Dict[str, float]:
+        """
+        Latest indicator values, optionally including a provisional bar
+
+        Args:
+            close: Close of an in-progress bar to include without committing it
+            volume: Volume of the in-progress bar
+
+        Returns:
+            Dictionary with sma_20, sma_50, rsi and volume_sma_20 (NaN while warming up)
+        """
+        closes_count = self.closes.count
+        volumes_count = self.volumes.count
+        bar_count = self.bar_count
+        sum_short, sum_long, sum_volume = self.sum_short, self.sum_long, self.sum_volume
+        sum_gain, sum_loss = self.sum_gain, self.sum_loss
+
+        if close is not None:
+            sum_short, sum_long, sum_volume = self._window_sums(float(close), float(volume or 0.0))
+            sum_gain, sum_loss = self._rsi_sums(float(close))
+            closes_count = min(closes_count + 1, self.SMA_LONG)
+            volumes_count = min(volumes_count + 1, self.VOLUME_WINDOW)
+            bar_count += 1
+
+        if bar_count - 1 < self.RSI_WINDOW:
+            rsi_value = float('nan')
+        elif sum_loss <= 0:
+            rsi_value = 100.0 if sum_gain > 0 else float('nan')
+        else:
+            rsi_value = 100 - (100 / (1 + sum_gain / sum_loss))
+
+        return {
+            'sma_20': sum_short / self.SMA_SHORT if closes_count >= self.SMA_SHORT else float('nan'),
+            'sma_50': sum_long / self.SMA_LONG if closes_count >= self.SMA_LONG else float('nan'),
+            'rsi': rsi_value,
+            'volume_sma_20': sum_volume / self.VOLUME_WINDOW if volumes_count >= self.VOLUME_WINDOW else float('nan')
+        }
+
+    @classmethod
+    def from_history(cls, symbol: str, closes, volumes, bar_ts=None, timeframe: str = '1d') -> 'IncrementalIndicatorState':
+        """
+        Rebuild the state from a full bar history (the resync path)
+
+        Args:
+            symbol: Stock symbol
+            closes: Closes in chronological order
+            volumes: Volumes in chronological order
+            bar_ts: Bar timestamps in nanoseconds since epoch
+            timeframe: Bar timeframe
+
+        Returns:
+            State positioned after the last bar of the history
+        """
+        state = cls(symbol, timeframe)
+        if bar_ts is None:
+            bar_ts = [None] * len(closes)
+        for close, volume, ts in zip(closes, volumes, bar_ts):
+            state.update(close, volume, None if ts is None else int(ts))
+        return state
+
+    def to_document(self) -> Dict:
+        """Serialize for storage in MongoDB"""
+        return {
+            '_id': f"{self.symbol}_{self.timeframe}",
+            'symbol': self.symbol,
+            'timeframe': self.timeframe,
+            'closes': self.closes.values(),
+            'volumes': self.volumes.values(),
+            'last_close': self.last_close,
+            'last_bar_ts': self.last_bar_ts,
+            'bar_count': self.bar_count
+        }
+
+    @classmethod
+    def from_document(cls, document: Dict) -> 'IncrementalIndicatorState':
+        """Restore a state saved with to_document"""
+        state = cls(document['symbol'], document.get('timeframe', '1d'))
+        state.closes = RingBuffer(cls.SMA_LONG, document.get('closes', []))
+        state.volumes = RingBuffer(cls.VOLUME_WINDOW, document.get('volumes', []))
+        state._resum()
+        state.last_close = document.get('last_close')
+        state.last_bar_ts = document.get('last_bar_ts')
+        state.bar_count = document.get('bar_count', 0)
+        return state
@@ -0,0 +1,241 @@
+import argparse
+import bisect
+import hashlib
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import MongoClient
+
+from market_data_fetcher import MarketDataFetcher
+from market_scheduler import IngestScheduler
+
+
+class HashRing:
+    def __init__(self, nodes: List[str], vnodes: int = 128):
+        """
+        Consistent hash ring mapping symbols to workers
+
+        Every node is placed on the ring vnodes times, so shards stay balanced
+        and a node joining or leaving only moves about 1/N of the symbols.
+
+        Args:
+            nodes: Worker ids
+            vnodes: Virtual nodes per worker
+        """
+        self.nodes = sorted(set(nodes))
+        ring = sorted((self._hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self.positions = [position for position, _ in ring]
+        self.owners = [node for _, node in ring]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+    def node_for(self, key: str) -> Optional[str]:
+        """Worker owning a key (the first virtual node clockwise from its hash)"""
+        if not self.owners:
+            return None
+        index = bisect.bisect(self.positions, self._hash(key)) % len(self.positions)
+        return self.owners[index]
+
+    def shards(self, symbols: List[str]) -> Dict[str, List[str]]:
+        """Split symbols into one list per worker, keeping their order"""
+        shards = {node: [] for node in self.nodes}
+        for symbol in symbols:
+            node = self.node_for(symbol)
+            if node is not None:
+                shards[node].append(symbol)
+        return shards
+
+
+class WorkerRegistry:
+    def __init__(self, collection, stale_after: float = 30):
+        """
+        Worker membership kept as heartbeat documents in MongoDB
+
+        Args:
+            collection: MongoDB collection holding one document per worker
+            stale_after: Seconds without a heartbeat before a worker is dropped
+        """
+        self.collection = collection
+        self.stale_after = stale_after
+
+    def heartbeat(self, worker_id: str):
+        self.collection.update_one(
+            {'_id': worker_id},
+            {'$set': {'heartbeat': datetime.utcnow(), 'host': socket.gethostname(), 'pid': os.getpid()}},
+            upsert=True
+        )
+
+    def leave(self, worker_id: str):
+        self.collection.delete_one({'_id': worker_id})
+
+    def live_workers(self) -> List[str]:
+        """Ids of workers with a recent heartbeat, sorted"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        return sorted(doc['_id'] for doc in self.collection.find({'heartbeat': {'$gte': cutoff}}, {'_id': 1}))
+
+
+class ShardedIngestWorker:
+    def __init__(self, worker_id: str, mongo_connection_string: str, alpha_vantage_key: str,
+                 universe: List[str], heartbeat_interval: float = 10, **fetcher_options):
+        """
+        One ingest process owning the shard of the universe the hash ring gives it
+
+        Membership is re-read before every cycle; when workers join or leave,
+        the shard, indicator state and rate-limit slice are reassigned.
+
+        Args:
+            worker_id: Unique worker id
+            mongo_connection_string: MongoDB connection URI
+            alpha_vantage_key: Alpha Vantage API key
+            universe: Full symbol universe shared by all workers
+            heartbeat_interval: Seconds between heartbeats
+            **fetcher_options: Extra MarketDataFetcher arguments
+        """
+        self.worker_id = worker_id
+        self.universe = universe
+        self.heartbeat_interval = heartbeat_interval
+        self.fetcher = MarketDataFetcher(mongo_connection_string, alpha_vantage_key,
+                                         symbols=[], **fetcher_options)
+        self.registry = WorkerRegistry(self.fetcher.db['ingest_workers'], stale_after=3 * heartbeat_interval)
+        self.members = []
+        self.stop_event = threading.Event()
+
+    def _heartbeat_loop(self):
+        while not self.stop_event.wait(self.heartbeat_interval):
+            try:
+                self.registry.heartbeat(self.worker_id)
+            except Exception as e:
+                print(f"⚠️  [{self.worker_id}] Heartbeat failed: {e}")
+
+    def rebalance(self) -> bool:
+        """
+        Take the shard for the current membership
+
+        Returns:
+            True if membership changed since the last call
+        """
+        members = self.registry.live_workers()
+        if self.worker_id not in members:
+            members = sorted(members + [self.worker_id])
+        if members == self.members:
+            return False
+
+        shard = HashRing(members).shards(self.universe)[self.worker_id]
+        self.fetcher.assign_shard(shard, slot=members.index(self.worker_id), slots=len(members))
+        print(f"🔀 [{self.worker_id}] {len(members)} workers, owning {len(shard)}/{len(self.universe)} symbols")
+        self.members = members
+        return True
+
+    def run_cycle(self):
+        self.rebalance()
+        if self.fetcher.symbols:
+            self.fetcher.fetch_and_store_all_symbols()
+
+    def run(self, interval_minutes: int = 5, offhours_interval_minutes: Optional[int] = 60):
+        """Heartbeat in the background and fetch the shard on every scheduled slot"""
+        self.registry.heartbeat(self.worker_id)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat.start()
+        self.fetcher.priority_scheduler.base_interval = interval_minutes * 60
+        try:
+            IngestScheduler(interval_minutes, offhours_interval_minutes).run(self.run_cycle)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop_event.set()
+            self.registry.leave(self.worker_id)
+            print(f"🛑 [{self.worker_id}] Left the ingest group")
+
+
+def run_worker(worker_id: str, mongo_connection_string: str, alpha_vantage_key: str,
+               universe: List[str], interval_minutes: int, offhours_interval_minutes: Optional[int]):
+    """Process entry point for one worker"""
+    worker = ShardedIngestWorker(worker_id, mongo_connection_string, alpha_vantage_key, universe)
+    worker.run(interval_minutes, offhours_interval_minutes)
+
+
+class IngestCoordinator:
+    def __init__(self, mongo_connection_string: str, alpha_vantage_key: str, universe: List[str],
+                 workers: int = os.cpu_count() or 1, interval_minutes: int = 5,
+                 offhours_interval_minutes: Optional[int] = 60):
+        """
+        Starts and supervises N worker processes on this machine
+
+        Workers coordinate through heartbeats, so additional coordinators on
+        other machines sharing the same database simply join the ring.
+
+        Args:
+            mongo_connection_string: MongoDB connection URI
+            alpha_vantage_key: Alpha Vantage API key
+            universe: Full symbol universe
+            workers: Number of worker processes
+            interval_minutes: Cadence during market hours
+            offhours_interval_minutes: Cadence outside market hours
+        """
+        self.args = (mongo_connection_string, alpha_vantage_key, universe,
+                     interval_minutes, offhours_interval_minutes)
+        self.worker_ids = [f"{socket.gethostname()}-{i}" for i in range(workers)]
+        self.processes = {}
+
+    def start_worker(self, worker_id: str):
+        process = multiprocessing.Process(target=run_worker, args=(worker_id, *self.args),
+                                          name=f"ingest-{worker_id}", daemon=True)
+        process.start()
+        self.processes[worker_id] = process
+
+    def run(self, check_interval: float = 5):
+        """Start every worker and restart any that exit until interrupted"""
+        print(f"🚀 Starting {len(self.worker_ids)} ingest workers for {len(self.args[2])} symbols")
+        for worker_id in self.worker_ids:
+            self.start_worker(worker_id)
+        try:
+            while True:
+                time.sleep(check_interval)
+                for worker_id, process in list(self.processes.items()):
+                    if not process.is_alive():
+                        print(f"♻️  Worker {worker_id} exited with code {process.exitcode}, restarting")
+                        self.start_worker(worker_id)
+        except KeyboardInterrupt:
+            print("\n🛑 Stopping ingest workers")
+            for process in self.processes.values():
+                process.join(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded multi-process market data ingestion")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes on this machine")
+    parser.add_argument('--symbols', default='SPY,QQQ,IWM,DIA,VIX',
+                        help="Comma separated symbols, or @file with one symbol per line")
+    parser.add_argument('--interval', type=int, default=5, help="Minutes between cycles during market hours")
+    parser.add_argument('--offhours-interval', type=int, default=60, help="Minutes between cycles outside market hours")
+    args = parser.parse_args()
+
+    mongo_connection_string = os.getenv('MONGODB_URI')
+    alpha_vantage_key = os.getenv('ALPHA_VANTAGE_KEY')
+    if not mongo_connection_string or not alpha_vantage_key:
+        print("Error: Please set MONGODB_URI and ALPHA_VANTAGE_KEY environment variables")
+        return
+
+    if args.symbols.startswith('@'):
+        with open(args.symbols[1:]) as f:
+            universe = [line.strip() for line in f if line.strip()]
+    else:
+        universe = [symbol.strip() for symbol in args.symbols.split(',') if symbol.strip()]
+
+    # Drop heartbeats left behind by a previous run on this host
+    registry = WorkerRegistry(MongoClient(mongo_connection_string)['adaptive_market_db']['ingest_workers'])
+    registry.collection.delete_many({'host': socket.gethostname()})
+
+    IngestCoordinator(mongo_connection_string, alpha_vantage_key, universe, workers=args.workers,
+                      interval_minutes=args.interval, offhours_interval_minutes=args.offhours_interval).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,10 @@ import json
 from bson import ObjectId
 import requests
 import asyncio
+from upstream_client import get_upstream_client
+from bar_store import BarStore
+from correlation_engine import MAX_SYMBOLS, RollingCorrelation
+from strategy_engine import read_market_snapshot
 
 app = FastAPI(title="Adaptive Market Strategy Agent API")
 
@@ -255,7 +259,8 @@ async def health_check():
         "status": "healthy", 
         "timestamp": datetime.now().isoformat(),
         "mongodb_connected": mongodb_connected,
-        "sample_strategies": list(SAMPLE_STOCKS.keys())
+        "sample_strategies": list(SAMPLE_STOCKS.keys()),
+        "upstream": get_upstream_client().metrics()
     }
 
 async def fetch_real_news_direct():
@@ -276,7 +281,8 @@ async def fetch_real_news_direct():
             'from': (datetime.now() - timedelta(hours=24)).strftime('%Y-%m-%d')
         }
         
-        response = requests.get(url, params=params, timeout=15)
+        # Pooled session with NewsAPI timeouts and retries, off the event loop
+        response = await asyncio.to_thread(get_upstream_client().get, 'newsapi', url, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -352,7 +358,7 @@ async def get_current_analysis():
     try:
         # Get latest market conditions
         if mongodb_connected and db is not None:
-            latest_market = list(db.market_conditions.find().sort("timestamp", -1).limit(4))
+            latest_market, _, _, _ = read_market_snapshot(db)
             
             # Get latest strategy recommendation
             latest_strategy = db.strategies.find_one(sort=[("timestamp", -1)])
@@ -392,8 +398,11 @@ async def get_current_analysis():
             print("📰 Using sample news events for demo")
             recent_events = SAMPLE_NEWS_EVENTS
         
-        # Calculate overall market regime
-        if market_data:
+        # Calculate overall market regime (the strategy engine's when it has one,
+        # since only it sees VIX and realized volatility)
+        if latest_strategy and latest_strategy.get('market_analysis', {}).get('regime') in MARKET_REGIME_EXPLANATIONS:
+            overall_regime = latest_strategy['market_analysis']['regime']
+        elif market_data:
             regime_signals = [item.get('regime_signals', {}) for item in market_data]
             trend_signals = [r.get('trend', 'neutral') for r in regime_signals]
             
@@ -565,9 +574,46 @@ async def get_market_regime_explanations():
         "status": "success"
     }
 
+# Rolling correlation engines per (symbols, window), kept in memory and
+# advanced with the bars completed since the previous request
+correlation_engines = {}
+correlation_bar_store = None
+
+@app.get("/api/correlations")
+async def get_correlations(symbols: str = "SPY,QQQ,IWM,DIA", window: int = 60):
+    """Rolling correlation and covariance matrices of daily returns, with average correlation and dispersion"""
+    global correlation_bar_store
+    universe = list(dict.fromkeys(s.strip().upper() for s in symbols.split(',') if s.strip()))
+    if not 2 <= len(universe) <= MAX_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"Provide between 2 and {MAX_SYMBOLS} symbols")
+    if not 5 <= window <= 500:
+        raise HTTPException(status_code=400, detail="Window must be between 5 and 500 bars")
+    try:
+        if correlation_bar_store is None:
+            correlation_bar_store = BarStore()
+        # At most one tail download per symbol every 15 minutes; the download and
+        # file reads run in a worker thread so other requests keep being served
+        await asyncio.to_thread(correlation_bar_store.update, universe, max_age=900)
+        panel = await asyncio.to_thread(correlation_bar_store.panel, universe, days=int(window * 1.5) + 10)
+        completed_rows = len(panel.index) - 1
+        
+        key = (tuple(universe), window)
+        engine = correlation_engines.get(key)
+        if engine is None or not engine.connects_to(panel):
+            engine = RollingCorrelation.from_panel(panel, window, completed_rows)
+            if len(correlation_engines) >= 32:
+                correlation_engines.pop(next(iter(correlation_engines)))
+            correlation_engines[key] = engine
+        else:
+            engine.sync(panel, completed_rows)
+        return {**engine.to_dict(), "status": "success"}
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error computing correlations: {str(e)}")
+
 @app.get("/api/historical-data/{symbol}")
-async def get_historical_data(symbol: str, days: int = 30):
-    """Get historical data for a symbol"""
+async def get_historical_data(symbol: str, days: int = 30, interval: str = "1d"):
+    """Get historical data for a symbol (bars loaded by backfill.py)"""
     try:
         start_date = datetime.now() - timedelta(days=days)
         
@@ -575,6 +621,7 @@ async def get_historical_data(symbol: str, days: int = 30):
         if mongodb_connected and db is not None:
             historical_data = list(db.historical_data.find({
                 "symbol": symbol,
+                "interval": interval,
                 "date": {"$gte": start_date}
             }).sort("date", 1))
         else:
@@ -1,95 +1,833 @@
-import requests
 import pandas as pd
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, InsertOne, MongoClient, ReplaceOne
+from pymongo.errors import BulkWriteError
+from bson.codec_options import CodecOptions, TypeRegistry
 from datetime import datetime, timedelta
 import time
 import os
-from typing import Dict, List
-import yfinance as yf
+import threading
+import math
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Callable, Dict, List, Optional
 import numpy as np
+from bar_store import BarStore
+from data_providers import (AlphaVantageProvider, MarketDataProvider, QuotaExhaustedError,
+                            YahooFinanceProvider)
+from market_scheduler import IngestScheduler, MarketCalendar, SymbolPriorityScheduler
+from market_storage import MarketConditionsStorage
+from regime_engine import REGIME_HISTORY_DAYS, regime_vectors
+from volatility_engine import VolatilityState
+from correlation_engine import MAX_SYMBOLS, RollingCorrelation
+from upstream_client import get_upstream_client
+from indicator_engine import (BarPanel, IncrementalIndicatorState, bar_timestamps,
+                              finalize_indicators, latest_panel_indicators)
+
+
+def encode_numpy_value(value):
+    """
+    BSON fallback encoder for NumPy values
+    
+    Only called for values BSON cannot encode natively, so documents are
+    converted once at the driver boundary instead of walked in Python.
+    np.float64 subclasses float and needs no conversion at all.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value
+
+
+# Codec options that let MongoDB writes accept NumPy scalars and arrays directly
+NUMPY_CODEC_OPTIONS = CodecOptions(type_registry=TypeRegistry(fallback_encoder=encode_numpy_value))
+
+
+# Token bucket settings for providers without a rate limit
+UNLIMITED_RATE = (1e6, 1e6)
+UNLIMITED_CALLS = 10 ** 9
+
+# A quote moving more than this percent in a day is treated as bad data...
+MAX_QUOTE_CHANGE_PERCENT = 50
+# ...except for symbols with their own limit (None = no limit). Volatility
+# indices move far more than stocks: VIX rose about 115% on 2018-02-05.
+QUOTE_CHANGE_LIMITS = {'VIX': None, '^VIX': None}
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_rate: float,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Thread-safe token bucket used to pace calls to one upstream provider
+        
+        Args:
+            capacity: Maximum number of calls that can be made in a burst
+            refill_rate: Tokens added per second (e.g. 5/60 for 5 calls per minute)
+            clock: Monotonic clock, injectable for testing
+            sleep: Sleep function, injectable for testing
+        """
+        self.capacity = float(capacity)
+        self.refill_rate = float(refill_rate)
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(capacity)
+        self.updated_at = clock()
+        self.lock = threading.Lock()
+    
+    def _refill(self):
+        now = self.clock()
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+        self.updated_at = now
+    
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if they are available right now, without waiting"""
+        with self.lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+    
+    def set_rate(self, capacity: float, refill_rate: float):
+        """Change the burst size and refill rate, keeping tokens already earned"""
+        with self.lock:
+            self._refill()
+            self.capacity = float(capacity)
+            self.refill_rate = float(refill_rate)
+            self.tokens = min(self.tokens, self.capacity)
+    
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None,
+                cancel_event: Optional[threading.Event] = None) -> bool:
+        """
+        Block until tokens are available
+        
+        Args:
+            tokens: Number of tokens to take
+            timeout: Maximum seconds to wait, None waits forever
+            cancel_event: Stop waiting (without taking tokens) once this is set
+            
+        Returns:
+            True if the tokens were taken, False if the timeout expired or the
+            wait was cancelled
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait = (tokens - self.tokens) / self.refill_rate
+            if deadline is not None:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            if cancel_event is not None:
+                if cancel_event.wait(wait):
+                    return False
+            else:
+                self.sleep(wait)
+
+
+class AlphaVantageQuotaPlanner:
+    def __init__(self, per_minute: int = 5, per_day: int = 25, cycle_interval_seconds: float = 300,
+                 min_refresh_seconds: float = 0, clock: Callable[[], float] = time.time):
+        """
+        Decides each cycle which symbols get the premium Alpha Vantage quote
+        
+        Keeps per-minute and per-day call budgets and spreads the remaining
+        daily allowance evenly over the cycles left in the (UTC) day, so a
+        large universe does not burn the quota by mid-morning.
+        
+        Args:
+            per_minute: Alpha Vantage calls allowed per rolling minute
+            per_day: Alpha Vantage calls allowed per day
+            cycle_interval_seconds: Expected time between fetch cycles
+            min_refresh_seconds: Symbols refreshed more recently than this are
+                skipped for the cycle (no upstream call, no new document)
+            clock: Wall clock in epoch seconds, injectable for testing
+        """
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.cycle_interval_seconds = cycle_interval_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self.clock = clock
+        self.recent_calls = deque()
+        self.day = None
+        self.day_calls = 0
+        self.allowance_carry = 0.0
+        self.last_refreshed = {}
+        self.lock = threading.Lock()
+    
+    def _roll(self, now: float):
+        """Expire calls older than a minute and reset the daily count at midnight UTC"""
+        while self.recent_calls and now - self.recent_calls[0] >= 60:
+            self.recent_calls.popleft()
+        day = int(now // 86400)
+        if day != self.day:
+            self.day = day
+            self.day_calls = 0
+            self.allowance_carry = 0.0
+    
+    def record_call(self):
+        """Charge one Alpha Vantage call against both budgets"""
+        with self.lock:
+            now = self.clock()
+            self._roll(now)
+            self.recent_calls.append(now)
+            self.day_calls += 1
+    
+    def mark_exhausted(self):
+        """Alpha Vantage reported the daily limit, so stop planning calls until tomorrow"""
+        with self.lock:
+            self._roll(self.clock())
+            self.day_calls = max(self.day_calls, self.per_day)
+    
+    def record_refresh(self, symbol: str):
+        """Remember when a symbol last got a fresh quote"""
+        with self.lock:
+            self.last_refreshed[symbol] = self.clock()
+    
+    def remaining(self) -> Dict[str, int]:
+        """Calls left in the current minute and day"""
+        with self.lock:
+            self._roll(self.clock())
+            return {
+                'minute': max(0, self.per_minute - len(self.recent_calls)),
+                'day': max(0, self.per_day - self.day_calls)
+            }
+    
+    def plan_cycle(self, symbols: List[str], excluded: Optional[set] = None,
+                   cycles_left: Optional[int] = None) -> Dict[str, str]:
+        """
+        Route every symbol of a cycle to a provider
+        
+        Args:
+            symbols: Symbols in priority order (earlier symbols get the premium provider first)
+            excluded: Symbols Alpha Vantage cannot serve
+            cycles_left: Cycles remaining today (defaults to the time left in
+                the UTC day divided by cycle_interval_seconds)
+            
+        Returns:
+            Dictionary mapping symbol to 'alpha_vantage', 'yahoo_finance' or
+            'fresh' (refreshed recently, so skipped; its latest stored
+            document stays current)
+        """
+        remaining = self.remaining()
+        with self.lock:
+            now = self.clock()
+            if cycles_left is None:
+                seconds_left = 86400 - (now % 86400)
+                cycles_left = math.ceil(seconds_left / self.cycle_interval_seconds)
+            
+            # Spread the daily allowance evenly, carrying fractions between cycles
+            self.allowance_carry += remaining['day'] / max(1, cycles_left)
+            budget = min(remaining['minute'], remaining['day'], int(self.allowance_carry))
+            
+            plan = {}
+            for symbol in symbols:
+                refreshed_at = self.last_refreshed.get(symbol)
+                if refreshed_at is not None and now - refreshed_at < self.min_refresh_seconds:
+                    plan[symbol] = 'fresh'
+                elif budget > 0 and symbol not in (excluded or ()):
+                    plan[symbol] = 'alpha_vantage'
+                    budget -= 1
+                    self.allowance_carry -= 1
+                else:
+                    plan[symbol] = 'yahoo_finance'
+            return plan
+
+
+class MarketDataBatchWriter:
+    def __init__(self, collection, flush_size: int = 500, insert_only: bool = False):
+        """
+        Collects a fetch cycle's documents and upserts them with unordered bulk writes
+        
+        Args:
+            collection: MongoDB collection to write to
+            flush_size: Flush automatically once this many documents are pending
+            insert_only: Insert without the deduplication _id instead of
+                upserting (time-series collections do not support upserts)
+        """
+        self.collection = collection
+        self.flush_size = flush_size
+        self.insert_only = insert_only
+        self.pending = []
+        self.written = 0
+        self.errors = []
+    
+    def add(self, document: Dict) -> None:
+        """Queue a document (with its _id already set) for upsert"""
+        self.pending.append(document)
+        if len(self.pending) >= self.flush_size:
+            self.flush()
+    
+    def flush(self) -> int:
+        """
+        Write all pending documents in one unordered bulk_write
+        
+        Per-document failures are reported and recorded in self.errors
+        without stopping the rest of the batch.
+        
+        Returns:
+            Number of documents written by this flush
+        """
+        if not self.pending:
+            return 0
+        
+        batch, self.pending = self.pending, []
+        if self.insert_only:
+            operations = [InsertOne({k: v for k, v in doc.items() if k != '_id'}) for doc in batch]
+        else:
+            operations = [ReplaceOne({'_id': doc['_id']}, doc, upsert=True) for doc in batch]
+        try:
+            result = self.collection.bulk_write(operations, ordered=False)
+            written = result.inserted_count + result.upserted_count + result.matched_count
+        except BulkWriteError as e:
+            details = e.details
+            written = details.get('nInserted', 0) + details.get('nUpserted', 0) + details.get('nMatched', 0)
+            for error in details.get('writeErrors', []):
+                doc_id = batch[error['index']].get('_id')
+                self.errors.append({'_id': doc_id, 'code': error.get('code'), 'message': error.get('errmsg')})
+                print(f"❌ Error storing {doc_id}: {error.get('errmsg')}")
+        except Exception as e:
+            written = 0
+            for doc in batch:
+                self.errors.append({'_id': doc.get('_id'), 'code': None, 'message': str(e)})
+            print(f"❌ Error storing batch of {len(batch)} documents: {e}")
+        
+        self.written += written
+        print(f"✅ Bulk stored {written}/{len(batch)} documents")
+        return written
+
+
+# Timeframes aggregated from 1-minute bars: minutes per bar (None = one bar per session)
+AGGREGATE_TIMEFRAMES = {'5m': 5, '15m': 15, '1h': 60, '1d': None}
+# Indicator state timeframe key per aggregated timeframe. The aggregated daily
+# state commits a session's bar at the close, while the bar-store daily state
+# ('1d') still treats that bar as in progress, so they are persisted apart.
+AGGREGATE_STATE_KEYS = {'5m': '5m', '15m': '15m', '1h': '1h', '1d': '1d_aggregated'}
+MINUTE_NS = 60 * 10 ** 9
+
+
+class BarAggregator:
+    def __init__(self, symbol: str, states: Dict[str, IncrementalIndicatorState],
+                 calendar: Optional[MarketCalendar] = None):
+        """
+        Streaming aggregation of one symbol's 1-minute bars into larger timeframes
+        
+        Intraday bars are aligned to the session open (like Yahoo Finance's
+        9:30, 10:30, ... hourly bars) and the last bar of a session ends at
+        the close. Daily bars are stamped with midnight exchange time, the
+        same timestamps as the daily bar store. A bar is committed to its
+        timeframe's indicator state as soon as its last minute arrives, or
+        when a minute from a later bar shows up first. Bars at or before a
+        state's last_bar_ts are never committed twice, so replaying minutes
+        after a restart is safe.
+        
+        Args:
+            symbol: Stock symbol
+            states: Indicator state per timeframe in AGGREGATE_TIMEFRAMES
+            calendar: Exchange calendar for session boundaries
+        """
+        self.symbol = symbol
+        self.states = states
+        self.calendar = calendar or MarketCalendar()
+        self.partial = {timeframe: None for timeframe in states}
+        self.last_minute_ts = None
+        self._sessions = {}
+    
+    def _session(self, day):
+        if day not in self._sessions:
+            self._sessions[day] = self.calendar.session(day)
+        return self._sessions[day]
+    
+    def buckets(self, minute_ts: int) -> Optional[Dict[str, tuple]]:
+        """(start, end) in nanoseconds of the bar containing a minute, per timeframe"""
+        local = datetime.fromtimestamp(minute_ts / 1e9, self.calendar.tz)
+        session = self._session(local.date())
+        if session is None or not session[0] <= local < session[1]:
+            return None
+        session_open, session_close = (int(t.timestamp()) * 10 ** 9 for t in session)
+        midnight = int(datetime.combine(local.date(), datetime.min.time(), tzinfo=self.calendar.tz).timestamp()) * 10 ** 9
+        buckets = {}
+        for timeframe in self.states:
+            minutes = AGGREGATE_TIMEFRAMES[timeframe]
+            if minutes is None:
+                buckets[timeframe] = (midnight, session_close)
+            else:
+                width = minutes * MINUTE_NS
+                start = session_open + (minute_ts - session_open) // width * width
+                buckets[timeframe] = (start, min(start + width, session_close))
+        return buckets
+    
+    def _commit(self, timeframe: str) -> bool:
+        bar, self.partial[timeframe] = self.partial[timeframe], None
+        state = self.states[timeframe]
+        if state.last_bar_ts is not None and bar['start'] <= state.last_bar_ts:
+            return False
+        state.update(bar['close'], bar['volume'], bar['start'])
+        return True
+    
+    def update(self, minute_ts: int, open_: float, high: float, low: float, close: float,
+               volume: float) -> List[str]:
+        """
+        Add a completed 1-minute bar
+        
+        Args:
+            minute_ts: Start of the minute in nanoseconds since epoch
+            open_, high, low, close, volume: The minute's OHLCV
+            
+        Returns:
+            Timeframes whose bar was completed and committed by this minute
+        """
+        if self.last_minute_ts is not None and minute_ts <= self.last_minute_ts:
+            return []
+        buckets = self.buckets(minute_ts)
+        if buckets is None:
+            return []
+        self.last_minute_ts = minute_ts
+        
+        committed = []
+        for timeframe, (start, end) in buckets.items():
+            bar = self.partial[timeframe]
+            if bar is not None and bar['start'] != start:
+                # A later bar started before this one saw its last minute
+                if self._commit(timeframe):
+                    committed.append(timeframe)
+                bar = None
+            if bar is None:
+                self.partial[timeframe] = {'start': start, 'open': open_, 'high': high, 'low': low,
+                                           'close': close, 'volume': volume}
+            else:
+                bar['high'] = max(bar['high'], high)
+                bar['low'] = min(bar['low'], low)
+                bar['close'] = close
+                bar['volume'] += volume
+            if minute_ts + MINUTE_NS >= end and self._commit(timeframe):
+                committed.append(timeframe)
+        return committed
+    
+    def flush(self, now_ns: int) -> List[str]:
+        """Commit partial bars whose end has passed without their last minute (e.g. a halt)"""
+        committed = []
+        for timeframe, bar in self.partial.items():
+            if bar is None:
+                continue
+            buckets = self.buckets(bar['start'] if AGGREGATE_TIMEFRAMES[timeframe] else self.last_minute_ts)
+            if buckets is not None and now_ns >= buckets[timeframe][1] and self._commit(timeframe):
+                committed.append(timeframe)
+        return committed
+
 
 class MarketDataFetcher:
-    def __init__(self, mongo_connection_string: str, alpha_vantage_key: str):
+    def __init__(self, mongo_connection_string: str, alpha_vantage_key: str,
+                 max_workers: int = 5, symbols: Optional[List[str]] = None,
+                 incremental_indicators: bool = False, bar_store: Optional[BarStore] = None,
+                 write_batch_size: int = 500, hedge_delay: Optional[float] = 2.0,
+                 quota_planner: Optional[AlphaVantageQuotaPlanner] = None,
+                 priority_scheduler: Optional[SymbolPriorityScheduler] = None,
+                 storage_mode: Optional[str] = None, raw_ttl_days: float = 30,
+                 quote_provider: Optional[MarketDataProvider] = None,
+                 bar_provider: Optional[MarketDataProvider] = None, database=None,
+                 intraday_bars: bool = False, snapshot_ttl_days: float = 2,
+                 quote_change_limits: Optional[Dict[str, Optional[float]]] = None):
         """
         Initialize the market data fetcher
         
         Args:
             mongo_connection_string: MongoDB Atlas connection string
             alpha_vantage_key: Alpha Vantage API key
+            max_workers: Number of symbols fetched concurrently per cycle
+            symbols: Symbol universe to track (defaults to the major ETFs and VIX)
+            incremental_indicators: Maintain persisted O(1) indicator state per
+                symbol instead of recomputing rolling windows every cycle
+            bar_store: Local OHLCV store (defaults to a daily store under $BAR_STORE_DIR)
+            write_batch_size: Documents per bulk write when storing a cycle
+            hedge_delay: Seconds to wait for Alpha Vantage before also asking
+                Yahoo Finance (None disables hedging and waits for a full failure)
+            quota_planner: Alpha Vantage budget planner (defaults to the free tier limits)
+            priority_scheduler: Per-symbol refresh scheduler (defaults to polling
+                benchmarks and active symbols every cycle)
+            storage_mode: None keeps the plain market_conditions collection;
+                'timeseries' or 'indexed' enable TTL expiry and daily rollups
+                (see MarketConditionsStorage)
+            raw_ttl_days: Days raw snapshots are kept when storage_mode is set
+            quote_provider: Primary quote source (defaults to Alpha Vantage)
+            bar_provider: OHLCV source for the bar store and backup quotes
+                (defaults to Yahoo Finance)
+            database: MongoDB database to use instead of connecting with
+                mongo_connection_string (e.g. for offline benchmarks)
+            intraday_bars: Ingest 1-minute bars every cycle and store
+                indicators and regime signals per aggregated timeframe
+                (5m, 15m, 1h, 1d) under 'timeframes'
+            snapshot_ttl_days: Days per-cycle market_snapshots documents are kept
+            quote_change_limits: Largest valid daily change percent per symbol
+                (None = no limit), on top of QUOTE_CHANGE_LIMITS; other symbols
+                use MAX_QUOTE_CHANGE_PERCENT
         """
         self.alpha_vantage_key = alpha_vantage_key
-        self.alpha_vantage_base_url = "https://www.alphavantage.co/query"
+        self.http = get_upstream_client()
+        self.quote_provider = quote_provider or AlphaVantageProvider(alpha_vantage_key, self.http)
+        self.bar_provider = bar_provider or YahooFinanceProvider()
         
         # MongoDB setup
-        self.client = MongoClient(mongo_connection_string)
-        self.db = self.client['adaptive_market_db']
+        if database is not None:
+            self.client = database.client
+            self.db = database
+        else:
+            self.client = MongoClient(mongo_connection_string)
+            self.db = self.client.get_database('adaptive_market_db', codec_options=NUMPY_CODEC_OPTIONS)
         self.market_conditions = self.db['market_conditions']
+        self.write_batch_size = write_batch_size
+        self.storage = None
+        if storage_mode:
+            self.storage = MarketConditionsStorage(self.db, mode=storage_mode, raw_ttl_days=raw_ttl_days)
+            self.market_conditions = self.storage.setup()
+        else:
+            # Latest-per-symbol reads (strategy engine, API) walk this index
+            try:
+                self.market_conditions.create_index([('symbol', ASCENDING), ('timestamp', DESCENDING)],
+                                                    name='symbol_timestamp')
+            except Exception as e:
+                print(f"⚠️  Could not create the symbol_timestamp index: {e}")
+        
+        # One snapshot of the whole universe per completed cycle, keyed by a
+        # chronologically sortable cycle id so the latest is an _id index probe
+        self.market_snapshots = self.db['market_snapshots']
+        try:
+            self.market_snapshots.create_index('timestamp', name='timestamp_ttl',
+                                               expireAfterSeconds=int(snapshot_ttl_days * 86400))
+        except Exception as e:
+            print(f"⚠️  Could not create the market_snapshots TTL index: {e}")
+        self._latest_documents = None
         
         # Symbols to track
-        self.symbols = ['SPY', 'QQQ', 'IWM', 'DIA', 'VIX']
-        
-    def convert_numpy_types(self, obj):
-        """Convert numpy types to native Python types for MongoDB storage"""
-        if isinstance(obj, dict):
-            return {key: self.convert_numpy_types(value) for key, value in obj.items()}
-        elif isinstance(obj, list):
-            return [self.convert_numpy_types(item) for item in obj]
-        elif isinstance(obj, np.integer):
-            return int(obj)
-        elif isinstance(obj, np.floating):
-            return float(obj)
-        elif isinstance(obj, np.bool_):
-            return bool(obj)
-        elif isinstance(obj, np.ndarray):
-            return obj.tolist()
-        elif hasattr(obj, 'dtype'):  # Additional numpy type check
-            if 'bool' in str(obj.dtype):
-                return bool(obj)
-            elif 'int' in str(obj.dtype):
-                return int(obj)
-            elif 'float' in str(obj.dtype):
-                return float(obj)
-        return obj
-        
-    def fetch_alpha_vantage_data(self, symbol: str) -> Dict:
-        """
-        Fetch real-time data from Alpha Vantage
+        # An empty list is a valid (empty) shard, only None means the default universe
+        self.symbols = ['SPY', 'QQQ', 'IWM', 'DIA', 'VIX'] if symbols is None else symbols
+        
+        # Concurrency and per-provider rate limiting. Each provider is only
+        # charged when it is actually called, so Yahoo fallbacks do not eat
+        # into the Alpha Vantage allowance (5 calls per minute on the free tier).
+        # The 'alpha_vantage' and 'yahoo_finance' limiters pace the quote and
+        # bar providers, whichever providers are plugged in.
+        self.max_workers = max_workers
+        self.rate_limiters = {
+            'alpha_vantage': TokenBucket(*(self.quote_provider.rate_limit or UNLIMITED_RATE)),
+            'yahoo_finance': TokenBucket(*(self.bar_provider.rate_limit or UNLIMITED_RATE))
+        }
+        
+        # Per-minute and per-day Alpha Vantage budgets, planned per cycle
+        per_minute = int(self.quote_provider.rate_limit[1] * 60) if self.quote_provider.rate_limit else UNLIMITED_CALLS
+        self.quota_planner = quota_planner or AlphaVantageQuotaPlanner(
+            per_minute=per_minute, per_day=self.quote_provider.daily_quota or UNLIMITED_CALLS)
+        
+        # Active symbols are refreshed every cycle, quiet ones less often
+        self.priority_scheduler = priority_scheduler or SymbolPriorityScheduler(self.symbols)
+        
+        # Hedged quotes: Yahoo Finance races Alpha Vantage after hedge_delay,
+        # or right away for symbols Alpha Vantage is known not to serve
+        self.hedge_delay = hedge_delay
+        self.hedge_immediately = set(self.quote_provider.unsupported_symbols)
+        self.quote_change_limits = {**QUOTE_CHANGE_LIMITS, **(quote_change_limits or {})}
+        self.primary_failure_limit = 3
+        self._primary_failures = {}
+        self._hedge_executor = ThreadPoolExecutor(max_workers=max_workers * 2)
+        
+        # Per-cycle bar cache: the last 60 days of bars per symbol are shared
+        # by the Yahoo quote, change % and all technical indicators. Bars come
+        # from the local store, which only downloads the missing tail.
+        self.bar_store = bar_store or BarStore(interval='1d', download=self.bar_provider.download_bars)
+        self.bar_history_days = 60
+        self._bar_cache = {}
+        self._bar_cache_lock = threading.Lock()
+        
+        # Latest indicator values for the whole universe, computed from one
+        # batched multi-ticker download per cycle
+        self._panel_indicators = {}
+        
+        # Daily/weekly/monthly regime codes per symbol, from the same stored bars
+        self._regime_vectors = {}
+        
+        # Rolling volatility estimators for the universe, advanced by the
+        # bars completed since the previous cycle
+        self.volatility_state = None
+        self._volatility = {}
+        
+        # Rolling cross-asset correlation of the universe (VIX excluded),
+        # published to market_features as breadth and dispersion features
+        self.correlation_window = 60
+        self.correlation_engine = None
+        self.owns_full_universe = True
+        
+        # Streaming indicator state per symbol, persisted between runs
+        self.incremental_indicators = incremental_indicators
+        self.indicator_state = self.db['indicator_state']
+        self._indicator_states = {}
+        
+        # 1-minute bars aggregated in streaming fashion into larger timeframes,
+        # each with its own persisted indicator state
+        self.intraday_bars = intraday_bars
+        self.calendar = MarketCalendar()
+        self._aggregators = {}
+        
+        # Full-process limits, scaled down when this fetcher only owns a shard
+        self._full_rates = {name: (bucket.capacity, bucket.refill_rate)
+                            for name, bucket in self.rate_limiters.items()}
+        self._full_quota = (self.quota_planner.per_minute, self.quota_planner.per_day,
+                            self.priority_scheduler.max_calls_per_minute)
+    
+    def assign_shard(self, symbols: List[str], slot: int = 0, slots: int = 1):
+        """
+        Restrict this fetcher to a shard of the universe
+        
+        Every upstream rate limit and quota is split between the slots so the
+        shares add up to the full limit: each slot gets the floor of an even
+        split and the first (limit % slots) slots one call more, so a slot
+        may get none when there are more slots than calls.
+        
+        Args:
+            symbols: Symbols owned by this fetcher
+            slot: Index of this fetcher among the workers sharing the limits
+            slots: Number of workers sharing the limits
+        """
+        owned = set(symbols)
+        # Keep the list object: the priority scheduler holds a reference to it
+        self.symbols[:] = list(symbols)
+        self._indicator_states = {key: state for key, state in self._indicator_states.items()
+                                  if state.symbol in owned}
+        self._aggregators = {symbol: aggregator for symbol, aggregator in self._aggregators.items()
+                             if symbol in owned}
+        if self._latest_documents is not None:
+            self._latest_documents = {symbol: document for symbol, document in self._latest_documents.items()
+                                      if symbol in owned}
+        
+        def share(limit: int) -> int:
+            return limit // slots + (1 if slot < limit % slots else 0)
+        
+        for name, (capacity, refill_rate) in self._full_rates.items():
+            # The refill rate is what bounds the combined rate; a bucket still
+            # needs room for one token to ever hand out a call
+            self.rate_limiters[name].set_rate(max(1, share(int(capacity))), refill_rate / slots)
+        per_minute, per_day, calls_per_minute = self._full_quota
+        self.quota_planner.per_minute = share(per_minute)
+        self.quota_planner.per_day = share(per_day)
+        self.priority_scheduler.max_calls_per_minute = share(calls_per_minute)
+        # Correlation features of a shard are not the market's, so only a full fetcher publishes them
+        self.owns_full_universe = slots == 1
+        
+    def fetch_alpha_vantage_data(self, symbol: str, cancel_event: Optional[threading.Event] = None) -> Dict:
+        """
+        Fetch a real-time quote from the primary provider (Alpha Vantage by default)
         
         Args:
             symbol: Stock symbol (e.g., 'SPY')
+            cancel_event: Give up without spending quota if this is set while
+                waiting for a rate-limit token
             
         Returns:
             Dictionary with price and volume data
         """
         try:
-            # Get real-time quote
-            url = f"{self.alpha_vantage_base_url}?function=GLOBAL_QUOTE&symbol={symbol}&apikey={self.alpha_vantage_key}"
-            response = requests.get(url)
-            data = response.json()
-            
-            if 'Global Quote' in data:
-                quote = data['Global Quote']
-                return {
-                    'symbol': symbol,
-                    'price': float(quote['05. price']),
-                    'change': float(quote['09. change']),
-                    'change_percent': float(quote['10. change percent'].replace('%', '')),
-                    'volume': int(quote['06. volume']),
-                    'previous_close': float(quote['08. previous close']),
-                    'timestamp': datetime.utcnow()
-                }
-            else:
-                print(f"Error fetching {symbol}: {data}")
+            # Get real-time quote from the primary provider
+            if not self.rate_limiters['alpha_vantage'].acquire(cancel_event=cancel_event):
                 return None
-                
+            self.quota_planner.record_call()
+            return self.quote_provider.get_quote(symbol)
+            
+        except QuotaExhaustedError as e:
+            # Daily allowance used up: route everything to Yahoo until it resets
+            self.quota_planner.mark_exhausted()
+            print(f"⚠️  {self.quote_provider.name} quota exhausted: {e}")
+            return None
         except Exception as e:
             print(f"Error fetching Alpha Vantage data for {symbol}: {e}")
             return None
     
+    def clear_bar_cache(self):
+        """Drop all cached bars so the next cycle downloads fresh history"""
+        with self._bar_cache_lock:
+            self._bar_cache.clear()
+            self._panel_indicators = {}
+            self._regime_vectors = {}
+            self._volatility = {}
+    
+    def refresh_bar_panel(self) -> Optional[BarPanel]:
+        """
+        Update the bar store for the whole universe with one batched tail
+        download and compute all indicators and multi-horizon regime codes
+        in vectorized passes
+        
+        Returns:
+            The BarPanel read from the store, or None if loading it failed
+        """
+        try:
+            self.rate_limiters['yahoo_finance'].acquire()
+            self.bar_store.update(self.symbols)
+            panel = self.bar_store.panel(self.symbols, days=self.bar_history_days)
+            indicators = latest_panel_indicators(panel)
+            volatility = self.update_volatility(panel)
+            self.priority_scheduler.update_volatility(dict(zip(panel.symbols, volatility['realized_volatility'])))
+            history = self.bar_store.panel(self.symbols, days=REGIME_HISTORY_DAYS)
+            vectors = regime_vectors(history.close, history.volume)
+            self.update_correlations(history)
+            
+            with self._bar_cache_lock:
+                for symbol in panel.symbols:
+                    bars = panel.frame(symbol)
+                    if len(bars):
+                        self._bar_cache[symbol] = bars
+                self._panel_indicators = indicators
+                self._regime_vectors = dict(zip(history.symbols, vectors.tolist()))
+                self._volatility = {
+                    symbol: {name: None if np.isnan(values[j]) else float(values[j])
+                             for name, values in volatility.items()}
+                    for j, symbol in enumerate(panel.symbols)
+                }
+            
+            print(f"📦 Loaded {len(panel.index)} bars for {len(indicators)}/{len(self.symbols)} symbols from the bar store")
+            return panel
+            
+        except Exception as e:
+            print(f"⚠️  Batched bar load failed, falling back to per-symbol history: {e}")
+            return None
+    
+    def update_volatility(self, panel: BarPanel) -> Dict[str, np.ndarray]:
+        """
+        Advance the universe volatility state with newly completed daily bars
+        
+        All rows but the last (in-progress) one are completed. The state is
+        rebuilt from the panel when the universe changed or its last bar is
+        no longer in the panel (first cycle or a long outage).
+        
+        Args:
+            panel: Daily bars for the universe
+            
+        Returns:
+            Latest estimators per symbol with the in-progress bar applied
+            provisionally (see VolatilityState.values)
+        """
+        completed_rows = len(panel.index) - 1
+        state = self.volatility_state
+        timestamps = bar_timestamps(panel.index[:completed_rows])
+        if (state is None or state.symbols != panel.symbols or
+                (state.last_bar_ts is not None and state.last_bar_ts not in timestamps)):
+            self.volatility_state = VolatilityState.from_panel(panel, completed_rows=completed_rows)
+        else:
+            state.sync(panel, completed_rows=completed_rows)
+        
+        if completed_rows < 0:
+            return self.volatility_state.values()
+        last = completed_rows
+        return self.volatility_state.values(panel.open[last], panel.high[last], panel.low[last], panel.close[last])
+    
+    def update_correlations(self, history: BarPanel) -> Optional[RollingCorrelation]:
+        """
+        Advance the rolling correlation engine with newly completed daily bars
+        
+        Covers up to MAX_SYMBOLS symbols of the universe, VIX excluded. The
+        engine is rebuilt when the universe changed or it no longer connects
+        to the stored history.
+        
+        Args:
+            history: Daily bars for the universe covering the correlation window
+            
+        Returns:
+            The updated engine, or None with fewer than two symbols
+        """
+        symbols = [symbol for symbol in history.symbols if symbol != 'VIX'][:MAX_SYMBOLS]
+        if len(symbols) < 2:
+            self.correlation_engine = None
+            return None
+        panel = history.select(symbols)
+        completed_rows = len(panel.index) - 1
+        if self.correlation_engine is None or not self.correlation_engine.connects_to(panel):
+            self.correlation_engine = RollingCorrelation.from_panel(panel, self.correlation_window, completed_rows)
+        else:
+            self.correlation_engine.sync(panel, completed_rows)
+        return self.correlation_engine
+    
+    def store_market_features(self):
+        """Publish the universe's correlation features for the strategy engine"""
+        if self.correlation_engine is None or not self.owns_full_universe:
+            return
+        try:
+            self.db['market_features'].replace_one(
+                {'_id': 'correlation'},
+                {'_id': 'correlation', **self.correlation_engine.features(), 'timestamp': datetime.utcnow()},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"⚠️  Could not store correlation features: {e}")
+    
+    def get_bars(self, symbol: str) -> pd.DataFrame:
+        """
+        Get daily bars for a symbol, refreshing the store at most once per cycle
+        
+        Args:
+            symbol: Stock symbol
+            
+        Returns:
+            DataFrame of daily OHLCV bars (empty if nothing is stored)
+        """
+        with self._bar_cache_lock:
+            if symbol in self._bar_cache:
+                return self._bar_cache[symbol]
+        
+        self.rate_limiters['yahoo_finance'].acquire()
+        self.bar_store.update([symbol])
+        hist = self.bar_store.frame(symbol, days=self.bar_history_days)
+        
+        with self._bar_cache_lock:
+            self._bar_cache[symbol] = hist
+        return hist
+    
+    def get_tail_bars(self, symbol: str, timeframe: str = '1d') -> pd.DataFrame:
+        """
+        Daily bars a symbol's indicator state has not seen yet
+        
+        Only the bars after the state's last bar are read, plus that bar
+        itself as overlap so sync_indicator_state can check they connect.
+        Without a state, or when the stored history no longer contains its
+        last bar (a gap or a re-adjusted history), the full history window is
+        returned so the state is rebuilt.
+        
+        Args:
+            symbol: Stock symbol
+            timeframe: Bar timeframe of the indicator state
+            
+        Returns:
+            DataFrame of daily OHLCV bars ending with the in-progress bar
+        """
+        with self._bar_cache_lock:
+            if symbol in self._bar_cache:
+                return self._bar_cache[symbol]
+        
+        state = self.load_indicator_state(symbol, timeframe)
+        if state is None or state.last_bar_ts is None:
+            return self.get_bars(symbol)
+        
+        self.rate_limiters['yahoo_finance'].acquire()
+        self.bar_store.update([symbol])
+        tail = self.bar_store.frame(symbol, start_ts=state.last_bar_ts)
+        if len(tail) > 1 and bar_timestamps(tail.index[:1])[0] == state.last_bar_ts:
+            return tail
+        
+        hist = self.bar_store.frame(symbol, days=self.bar_history_days)
+        with self._bar_cache_lock:
+            self._bar_cache[symbol] = hist
+        return hist
+    
     def fetch_yahoo_finance_backup(self, symbol: str) -> Dict:
         """
         Backup data source using Yahoo Finance (faster, no API limits)
         
+        The quote is derived from the cycle's cached daily bars, so it costs
+        no extra upstream call when indicators are calculated afterwards.
+        
         Args:
             symbol: Stock symbol
             
@@ -97,9 +835,7 @@ class MarketDataFetcher:
             Dictionary with market data
         """
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            hist = ticker.history(period="2d")
+            hist = self.get_bars(symbol)
             
             if len(hist) >= 2:
                 current = hist.iloc[-1]
@@ -112,7 +848,8 @@ class MarketDataFetcher:
                     'change_percent': float(((current['Close'] - previous['Close']) / previous['Close']) * 100),
                     'volume': int(current['Volume']),
                     'previous_close': float(previous['Close']),
-                    'timestamp': datetime.utcnow()
+                    'timestamp': datetime.utcnow(),
+                    'source': self.bar_provider.name
                 }
             else:
                 return None
@@ -121,6 +858,213 @@ class MarketDataFetcher:
             print(f"Error fetching Yahoo Finance data for {symbol}: {e}")
             return None
     
+    def load_indicator_state(self, symbol: str, timeframe: str = '1d') -> Optional[IncrementalIndicatorState]:
+        """
+        Get the indicator state for a symbol from memory or MongoDB
+        
+        Args:
+            symbol: Stock symbol
+            timeframe: Bar timeframe
+            
+        Returns:
+            The stored state, or None if the symbol has never been synced
+        """
+        key = f"{symbol}_{timeframe}"
+        if key not in self._indicator_states:
+            document = self.indicator_state.find_one({'_id': key})
+            if not document:
+                return None
+            self._indicator_states[key] = IncrementalIndicatorState.from_document(document)
+        return self._indicator_states[key]
+    
+    def save_indicator_state(self, state: IncrementalIndicatorState):
+        """Persist an indicator state so the next run can resume from it"""
+        document = state.to_document()
+        self._indicator_states[document['_id']] = state
+        self.indicator_state.replace_one({'_id': document['_id']}, document, upsert=True)
+    
+    def sync_indicator_state(self, symbol: str, bars: pd.DataFrame,
+                             timeframe: str = '1d') -> IncrementalIndicatorState:
+        """
+        Bring a symbol's indicator state up to date with its completed bars
+        
+        All bars except the last (in-progress) one are treated as completed.
+        New completed bars are applied in O(1) each; if the stored state
+        cannot be connected to the history (first run or a gap larger than
+        the history window) it is rebuilt from the bars instead.
+        
+        Args:
+            symbol: Stock symbol
+            bars: OHLCV history ending with the in-progress bar
+            timeframe: Bar timeframe
+            
+        Returns:
+            The synced state
+        """
+        completed = bars.iloc[:-1]
+        timestamps = bar_timestamps(completed.index)
+        closes = completed['Close'].to_numpy(dtype=np.float64)
+        volumes = completed['Volume'].to_numpy(dtype=np.float64)
+        
+        state = self.load_indicator_state(symbol, timeframe)
+        if state is not None and state.last_bar_ts is not None:
+            position = np.searchsorted(timestamps, state.last_bar_ts)
+            connected = position < len(timestamps) and timestamps[position] == state.last_bar_ts
+        else:
+            connected = False
+        
+        if not connected:
+            print(f"🔁 Resyncing {timeframe} indicator state for {symbol} from {len(completed)} bars")
+            state = IncrementalIndicatorState.from_history(symbol, closes, volumes, timestamps, timeframe)
+        else:
+            new_rows = range(position + 1, len(timestamps))
+            if not new_rows:
+                return state
+            for i in new_rows:
+                state.update(closes[i], volumes[i], int(timestamps[i]))
+        
+        self.save_indicator_state(state)
+        return state
+    
+    def seed_aggregators(self, symbols: List[str]):
+        """
+        Create bar aggregators with indicator states warmed up from bar history
+        
+        Intraday states are synced from one batched download per timeframe
+        and the daily state from the bar store, so persisted states that still
+        connect to the history are resumed rather than rebuilt. The daily state
+        is the aggregator's own (see AGGREGATE_STATE_KEYS), not the one
+        calculate_technical_indicators keeps.
+        
+        Args:
+            symbols: Symbols without an aggregator yet
+        """
+        histories = {}
+        for timeframe, minutes in AGGREGATE_TIMEFRAMES.items():
+            if minutes is None:
+                continue
+            try:
+                self.rate_limiters['yahoo_finance'].acquire()
+                frame = self.bar_provider.download_bars(symbols, period='1mo', interval=timeframe)
+                histories[timeframe] = BarPanel.from_yfinance(frame, symbols)
+            except Exception as e:
+                print(f"⚠️  Could not load {timeframe} bars to warm up indicators: {e}")
+        
+        for symbol in symbols:
+            states = {}
+            for timeframe in AGGREGATE_TIMEFRAMES:
+                if timeframe == '1d':
+                    bars = self.get_bars(symbol)
+                elif timeframe in histories:
+                    bars = histories[timeframe].frame(symbol)
+                else:
+                    bars = None
+                key = AGGREGATE_STATE_KEYS[timeframe]
+                if bars is not None and len(bars) > 1:
+                    states[timeframe] = self.sync_indicator_state(symbol, bars, key)
+                else:
+                    states[timeframe] = (self.load_indicator_state(symbol, key) or
+                                         IncrementalIndicatorState(symbol, key))
+            self._aggregators[symbol] = BarAggregator(symbol, states, self.calendar)
+    
+    def refresh_intraday_bars(self, symbols: Optional[List[str]] = None) -> int:
+        """
+        Stream the latest 1-minute bars of the universe into every timeframe
+        
+        One batched download returns the latest session's minutes. Only
+        completed minutes newer than an aggregator's last minute are applied,
+        and only states that committed a bar are persisted.
+        
+        Args:
+            symbols: Symbols to refresh (defaults to the whole universe)
+            
+        Returns:
+            Number of timeframe bars committed
+        """
+        symbols = symbols or self.symbols
+        new_symbols = [symbol for symbol in symbols if symbol not in self._aggregators]
+        if new_symbols:
+            self.seed_aggregators(new_symbols)
+        
+        try:
+            self.rate_limiters['yahoo_finance'].acquire()
+            frame = self.bar_provider.download_bars(symbols, period='1d', interval='1m')
+            panel = BarPanel.from_yfinance(frame, symbols)
+        except Exception as e:
+            print(f"⚠️  1-minute bar download failed: {e}")
+            return 0
+        
+        timestamps = bar_timestamps(panel.index)
+        now_ns = int(time.time() * 10 ** 9)
+        completed_minutes = timestamps + MINUTE_NS <= now_ns
+        committed = 0
+        for j, symbol in enumerate(panel.symbols):
+            aggregator = self._aggregators[symbol]
+            rows = np.flatnonzero(completed_minutes & ~np.isnan(panel.close[:, j]))
+            if aggregator.last_minute_ts is not None:
+                rows = rows[timestamps[rows] > aggregator.last_minute_ts]
+            completed = []
+            for i in rows:
+                completed += aggregator.update(int(timestamps[i]), panel.open[i, j], panel.high[i, j],
+                                               panel.low[i, j], panel.close[i, j],
+                                               float(np.nan_to_num(panel.volume[i, j])))
+            completed += aggregator.flush(now_ns)
+            for timeframe in set(completed):
+                self.save_indicator_state(aggregator.states[timeframe])
+            committed += len(completed)
+        
+        print(f"🕐 Aggregated 1-minute bars into {committed} completed timeframe bars")
+        return committed
+    
+    def timeframe_signals(self, symbol: str) -> Dict:
+        """
+        Indicators and regime signals per aggregated timeframe
+        
+        Each timeframe's in-progress bar is applied provisionally, the same
+        way the live quote is applied to the daily state.
+        
+        Args:
+            symbol: Stock symbol
+            
+        Returns:
+            Dictionary mapping timeframe to its bar, indicators and regime signals
+        """
+        aggregator = self._aggregators.get(symbol)
+        if aggregator is None:
+            return {}
+        
+        timeframes = {}
+        for timeframe, state in aggregator.states.items():
+            bar = aggregator.partial[timeframe]
+            if bar is not None:
+                values = state.values(bar['close'], bar['volume'])
+                price, volume, reference, bar_ts = bar['close'], bar['volume'], state.last_close, bar['start']
+            elif state.closes.count >= 2:
+                values = state.values()
+                price, volume, reference = state.last_close, state.volumes.ago(0), state.closes.ago(1)
+                bar_ts = state.last_bar_ts
+            else:
+                continue
+            
+            data = {
+                'price': price,
+                'volume': volume,
+                'change_percent': (price - reference) / reference * 100 if reference else 0.0
+            }
+            try:
+                indicators = finalize_indicators(values, data)
+            except (ValueError, ZeroDivisionError):
+                # Volume average still warming up
+                indicators = {}
+            timeframes[timeframe] = {
+                'bar_start': None if bar_ts is None else datetime.utcfromtimestamp(bar_ts / 1e9),
+                'complete': bar is None,
+                **data,
+                'indicators': indicators,
+                'regime_signals': self.determine_regime_signals(data, indicators)
+            }
+        return timeframes
+    
     def calculate_technical_indicators(self, symbol: str, data: Dict) -> Dict:
         """
         Calculate basic technical indicators
@@ -133,9 +1077,24 @@ class MarketDataFetcher:
             Dictionary with technical indicators
         """
         try:
-            # Get historical data for calculations
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period="60d")  # 60 days for indicators
+            # Streaming mode: O(1) update of the persisted state, with the live
+            # quote applied as a provisional bar
+            if self.incremental_indicators:
+                hist = self.get_tail_bars(symbol)
+                if len(hist) < 2:
+                    return {}
+                state = self.sync_indicator_state(symbol, hist)
+                if state.bar_count < 20:
+                    return {}
+                return finalize_indicators(state.values(data['price'], data['volume']), data)
+            
+            # Use the vectorized panel values when the batched download had this symbol
+            panel_values = self._panel_indicators.get(symbol)
+            if panel_values:
+                return finalize_indicators(panel_values, data)
+            
+            # Get historical data for calculations (shared per-cycle cache)
+            hist = self.get_bars(symbol)
             
             if len(hist) < 20:
                 return {}
@@ -216,9 +1175,169 @@ class MarketDataFetcher:
         
         return signals
     
+    def is_valid_quote(self, data: Optional[Dict]) -> bool:
+        """Sanity-check a quote before it is allowed to win a hedged race"""
+        if not data:
+            return False
+        try:
+            price = float(data['price'])
+            previous_close = float(data['previous_close'])
+            change_percent = float(data['change_percent'])
+            max_change = self.quote_change_limits.get(data.get('symbol'), MAX_QUOTE_CHANGE_PERCENT)
+            return (
+                math.isfinite(price) and price > 0 and
+                math.isfinite(previous_close) and previous_close > 0 and
+                math.isfinite(change_percent) and (max_change is None or abs(change_percent) < max_change) and
+                data.get('volume', 0) >= 0
+            )
+        except (KeyError, TypeError, ValueError):
+            return False
+    
+    def should_hedge_immediately(self, symbol: str) -> bool:
+        """True for symbols Alpha Vantage does not serve or keeps failing on"""
+        return (symbol in self.hedge_immediately or
+                self._primary_failures.get(symbol, 0) >= self.primary_failure_limit)
+    
+    def fetch_quote(self, symbol: str, route: str = 'alpha_vantage') -> Optional[Dict]:
+        """
+        Fetch a quote from Alpha Vantage with Yahoo Finance as backup
+        
+        With hedging enabled, Yahoo Finance is started after hedge_delay
+        seconds (or immediately for symbols known to fail) while Alpha
+        Vantage is still in flight. The first valid quote wins; a losing
+        Alpha Vantage call that is still waiting for quota is cancelled.
+        
+        Args:
+            symbol: Stock symbol
+            route: Provider chosen by the quota planner; 'yahoo_finance'
+                skips Alpha Vantage entirely
+            
+        Returns:
+            Quote dictionary with the winning 'source', or None if both failed
+        """
+        if route == 'yahoo_finance':
+            data = self.fetch_yahoo_finance_backup(symbol)
+            return data if self.is_valid_quote(data) else None
+        
+        if self.hedge_delay is None:
+            data = self.fetch_alpha_vantage_data(symbol)
+            if not self.is_valid_quote(data):
+                print(f"⚠️  Alpha Vantage failed for {symbol}, using Yahoo Finance")
+                data = self.fetch_yahoo_finance_backup(symbol)
+            return data if self.is_valid_quote(data) else None
+        
+        cancel_event = threading.Event()
+        primary = self._hedge_executor.submit(self.fetch_alpha_vantage_data, symbol, cancel_event)
+        secondary = None
+        hedge_at = time.monotonic() + (0 if self.should_hedge_immediately(symbol) else self.hedge_delay)
+        pending = {primary}
+        
+        try:
+            while pending:
+                timeout = None if secondary else max(0.0, hedge_at - time.monotonic())
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    data = future.result()
+                    valid = self.is_valid_quote(data)
+                    if future is primary:
+                        self._primary_failures[symbol] = 0 if valid else self._primary_failures.get(symbol, 0) + 1
+                    if valid:
+                        return data
+                
+                # Hedge once the delay has passed or the primary has already failed
+                if secondary is None and (primary.done() or time.monotonic() >= hedge_at):
+                    secondary = self._hedge_executor.submit(self.fetch_yahoo_finance_backup, symbol)
+                    pending.add(secondary)
+            return None
+        
+        finally:
+            # Cancel the loser: drop it if not started, stop it waiting for quota otherwise
+            cancel_event.set()
+            for future in (primary, secondary):
+                if future is not None:
+                    future.cancel()
+    
+    def prepare_market_document(self, market_data: Dict) -> Dict:
+        """
+        Convert a market data dictionary into the document stored in MongoDB
+        
+        Args:
+            market_data: Complete market data dictionary
+            
+        Returns:
+            Document with a deduplication _id (NumPy values are encoded
+            by NUMPY_CODEC_OPTIONS when the document is written)
+        """
+        clean_data = dict(market_data)
+        
+        # Add unique identifier for deduplication
+        clean_data['_id'] = f"{clean_data['symbol']}_{clean_data['timestamp'].strftime('%Y%m%d_%H%M')}"
+        return clean_data
+    
+    def snapshot_entry(self, market_data: Dict) -> Dict:
+        """Compact per-symbol entry of a cycle snapshot (no intraday timeframes)"""
+        fields = ('symbol', 'price', 'change', 'change_percent', 'volume', 'previous_close', 'source',
+                  'timestamp', 'indicators', 'regime_signals', 'regime_vector', 'volatility')
+        return {field: market_data[field] for field in fields if field in market_data}
+    
+    def store_cycle_snapshot(self, cycle_id: str, refreshed: List[Dict]) -> bool:
+        """
+        Write one market_snapshots document holding every symbol's latest data
+        
+        Symbols the priority scheduler skipped this cycle keep their previous
+        entry (after a restart, the entry of the previous snapshot) until it
+        is older than twice the symbol's refresh interval; staler entries are
+        dropped rather than served as current. A snapshot is written every
+        cycle, even one that refreshed nothing, so its timestamp tells
+        readers the fetcher is alive. Only a fetcher that owns the full
+        universe publishes snapshots.
+        
+        Args:
+            cycle_id: Id of the completed cycle (UTC start time, sortable)
+            refreshed: Market data built this cycle
+            
+        Returns:
+            True if a snapshot was written
+        """
+        if not self.owns_full_universe:
+            return False
+        try:
+            if self._latest_documents is None:
+                previous = self.market_snapshots.find_one(sort=[('_id', -1)]) or {}
+                tracked = set(self.symbols)
+                self._latest_documents = {entry['symbol']: entry for entry in previous.get('symbols', [])
+                                          if entry.get('symbol') in tracked}
+            for market_data in refreshed:
+                self._latest_documents[market_data['symbol']] = self.snapshot_entry(market_data)
+            now = datetime.utcnow()
+            self._latest_documents = {
+                symbol: entry for symbol, entry in self._latest_documents.items()
+                if isinstance(entry.get('timestamp'), datetime) and
+                (now - entry['timestamp']).total_seconds() <= 2 * self.priority_scheduler.interval(symbol)
+            }
+            if not self._latest_documents:
+                return False
+            
+            snapshot = {
+                '_id': cycle_id,
+                'cycle_id': cycle_id,
+                'timestamp': now,
+                'refreshed': len(refreshed),
+                'symbols': [self._latest_documents[symbol] for symbol in self.symbols
+                            if symbol in self._latest_documents],
+                'features': {'correlation': self.correlation_engine.features()} if self.correlation_engine else {}
+            }
+            self.market_snapshots.replace_one({'_id': cycle_id}, snapshot, upsert=True)
+            print(f"🗂️  Stored snapshot {cycle_id} with {len(snapshot['symbols'])} symbols")
+            return True
+        except Exception as e:
+            print(f"❌ Error storing cycle snapshot: {e}")
+            return False
+    
     def store_market_data(self, market_data: Dict) -> bool:
         """
-        Store market data in MongoDB with numpy type conversion
+        Store market data in MongoDB (numpy types are handled by the codec)
         
         Args:
             market_data: Complete market data dictionary
@@ -227,18 +1346,18 @@ class MarketDataFetcher:
             True if successful, False otherwise
         """
         try:
-            # Convert numpy types to native Python types
-            clean_data = self.convert_numpy_types(market_data)
+            clean_data = self.prepare_market_document(market_data)
             
-            # Add unique identifier for deduplication
-            clean_data['_id'] = f"{clean_data['symbol']}_{clean_data['timestamp'].strftime('%Y%m%d_%H%M')}"
-            
-            # Insert or update
-            self.market_conditions.replace_one(
-                {'_id': clean_data['_id']},
-                clean_data,
-                upsert=True
-            )
+            if self.storage and self.storage.is_timeseries:
+                clean_data.pop('_id')
+                self.market_conditions.insert_one(clean_data)
+            else:
+                # Insert or update
+                self.market_conditions.replace_one(
+                    {'_id': clean_data['_id']},
+                    clean_data,
+                    upsert=True
+                )
             
             print(f"✅ Stored data for {clean_data['symbol']}: ${clean_data['price']}")
             return True
@@ -247,62 +1366,158 @@ class MarketDataFetcher:
             print(f"❌ Error storing market data: {e}")
             return False
     
-    def fetch_and_store_all_symbols(self):
+    def build_market_data(self, symbol: str, route: str = 'alpha_vantage') -> Optional[Dict]:
         """
-        Fetch data for all symbols and store in MongoDB
+        Fetch and enrich data for a single symbol
+        
+        Args:
+            symbol: Stock symbol
+            route: Provider chosen by the quota planner
+            
+        Returns:
+            Complete market data dictionary, or None if fetching failed
+        """
+        try:
+            data = self.fetch_quote(symbol, route)
+            
+            if not data:
+                print(f"❌ Failed to fetch data for {symbol}")
+                return None
+            self.quota_planner.record_refresh(symbol)
+            
+            # Calculate technical indicators
+            indicators = self.calculate_technical_indicators(symbol, data)
+            self.priority_scheduler.update_volume_ratio(symbol, indicators.get('volume_ratio'))
+            
+            # Generate regime signals
+            signals = self.determine_regime_signals(data, indicators)
+            
+            # Combine all data
+            market_data = {
+                **data,
+                'indicators': indicators,
+                'regime_signals': signals
+            }
+            volatility = self._volatility.get(symbol)
+            if volatility is not None:
+                market_data['volatility'] = volatility
+            regime_vector = self._regime_vectors.get(symbol)
+            if regime_vector is not None:
+                market_data['regime_vector'] = regime_vector
+            if self.intraday_bars:
+                market_data['timeframes'] = self.timeframe_signals(symbol)
+            return market_data
+            
+        except Exception as e:
+            print(f"❌ Error processing {symbol}: {e}")
+            return None
+    
+    def process_symbol(self, symbol: str) -> bool:
         """
+        Fetch, enrich and store data for a single symbol
+        
+        Args:
+            symbol: Stock symbol
+            
+        Returns:
+            True if the symbol was stored, False otherwise
+        """
+        market_data = self.build_market_data(symbol)
+        return bool(market_data) and self.store_market_data(market_data)
+    
+    def fetch_and_store_all_symbols(self, max_workers: Optional[int] = None,
+                                    symbols: Optional[List[str]] = None) -> int:
+        """
+        Fetch data for all due symbols concurrently and store in MongoDB
+        
+        Rate limiting is handled by the per-provider token buckets, so the
+        wall time of a cycle is bounded by upstream quota rather than by a
+        fixed sleep after every symbol. Documents are collected and written
+        with unordered bulk upserts of write_batch_size documents.
+        
+        Args:
+            max_workers: Override for the number of concurrent fetches
+            symbols: Symbols to refresh (defaults to the ones the priority
+                scheduler reports as due)
+            
+        Returns:
+            Number of symbols stored successfully
+        """
+        workers = max_workers or self.max_workers
+        started = time.monotonic()
         print(f"🔄 Fetching market data at {datetime.now().strftime('%H:%M:%S')}")
         
-        for symbol in self.symbols:
-            try:
-                # Try Alpha Vantage first, then Yahoo Finance backup
-                data = self.fetch_alpha_vantage_data(symbol)
-                if not data:
-                    print(f"⚠️  Alpha Vantage failed for {symbol}, using Yahoo Finance")
-                    data = self.fetch_yahoo_finance_backup(symbol)
-                
-                if data:
-                    # Calculate technical indicators
-                    indicators = self.calculate_technical_indicators(symbol, data)
-                    
-                    # Generate regime signals
-                    signals = self.determine_regime_signals(data, indicators)
-                    
-                    # Combine all data
-                    complete_data = {
-                        **data,
-                        'indicators': indicators,
-                        'regime_signals': signals
-                    }
-                    
-                    # Store in MongoDB
-                    self.store_market_data(complete_data)
-                    
-                else:
-                    print(f"❌ Failed to fetch data for {symbol}")
-                
-                # Rate limiting - wait between API calls
-                time.sleep(12)  # 5 calls per minute = 12 seconds between calls
-                
-            except Exception as e:
-                print(f"❌ Error processing {symbol}: {e}")
-                continue
+        # Start every cycle with fresh bars for the whole universe
+        self.clear_bar_cache()
+        self.refresh_bar_panel()
+        if self.intraday_bars:
+            self.refresh_intraday_bars()
+        
+        # Refresh the symbols that are due, then decide which get Alpha Vantage
+        cycle_started = time.time()
+        if symbols is None:
+            symbols = self.priority_scheduler.due_symbols(self.symbols, now=cycle_started)
+            print(f"🎯 {len(symbols)}/{len(self.symbols)} symbols due this cycle")
+        plan = self.quota_planner.plan_cycle(symbols, excluded=self.hedge_immediately)
+        routes = {route: sum(1 for r in plan.values() if r == route) for route in set(plan.values())}
+        print(f"🧭 Quota plan: {routes}")
+        
+        writer = MarketDataBatchWriter(self.market_conditions, flush_size=self.write_batch_size,
+                                       insert_only=bool(self.storage and self.storage.is_timeseries))
+        refreshed = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for symbol, route in plan.items():
+                if route == 'fresh':
+                    continue
+                self.priority_scheduler.mark_polled(symbol, now=cycle_started)
+                futures[executor.submit(self.build_market_data, symbol, route)] = symbol
+            for future in as_completed(futures):
+                market_data = future.result()
+                if not market_data:
+                    continue
+                try:
+                    writer.add(self.prepare_market_document(market_data))
+                    refreshed.append(market_data)
+                except Exception as e:
+                    print(f"❌ Error preparing {futures[future]}: {e}")
+        writer.flush()
+        stored = writer.written
+        self.store_market_features()
+        self.store_cycle_snapshot(datetime.utcfromtimestamp(cycle_started).strftime('%Y%m%dT%H%M%S'), refreshed)
+        if self.storage:
+            self.storage.maybe_rollup()
+        
+        print(f"📊 Stored {stored}/{len(symbols)} symbols in {time.monotonic() - started:.1f}s")
+        remaining = self.quota_planner.remaining()
+        print(f"🎟️  Alpha Vantage quota left: {remaining['minute']}/min, {remaining['day']}/day")
+        alpha_vantage_stats = self.http.metrics().get('alpha_vantage')
+        if alpha_vantage_stats and alpha_vantage_stats['requests']:
+            print(f"📡 Alpha Vantage: {alpha_vantage_stats['requests']} requests, "
+                  f"p50 {alpha_vantage_stats['p50_ms']}ms, p95 {alpha_vantage_stats['p95_ms']}ms, "
+                  f"{alpha_vantage_stats['errors']} errors, {alpha_vantage_stats['retries']} retries")
+        return stored
     
-    def start_continuous_fetching(self, interval_minutes: int = 5):
+    def start_continuous_fetching(self, interval_minutes: int = 5, offhours_interval_minutes: Optional[int] = 60):
         """
-        Start continuous data fetching every X minutes
+        Start continuous data fetching on wall-clock aligned slots
+        
+        Cycles run every interval_minutes during the US equity session and
+        every offhours_interval_minutes outside it (see IngestScheduler).
         
         Args:
-            interval_minutes: Interval between fetches
+            interval_minutes: Interval between fetches while the market is open
+            offhours_interval_minutes: Interval outside market hours (None to
+                wait for the next open)
         """
-        print(f"🚀 Starting continuous market data fetching every {interval_minutes} minutes")
+        print(f"🚀 Starting continuous market data fetching every {interval_minutes} minutes "
+              f"({offhours_interval_minutes or 'no'} off-hours cadence)")
         print("Press Ctrl+C to stop")
         
+        scheduler = IngestScheduler(interval_minutes, offhours_interval_minutes)
+        self.priority_scheduler.base_interval = interval_minutes * 60
         try:
-            while True:
-                self.fetch_and_store_all_symbols()
-                print(f"💤 Sleeping for {interval_minutes} minutes...")
-                time.sleep(interval_minutes * 60)
+            scheduler.run(self.fetch_and_store_all_symbols)
                 
         except KeyboardInterrupt:
             print("\n🛑 Stopping market data fetcher")
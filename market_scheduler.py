@@ -0,0 +1,342 @@
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta
+from datetime import time as dtime
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+MARKET_TZ = ZoneInfo('America/New_York')
+REGULAR_OPEN = dtime(9, 30)
+REGULAR_CLOSE = dtime(16, 0)
+EARLY_CLOSE = dtime(13, 0)
+
+
+def easter_sunday(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th given weekday of a month (n=-1 for the last one)"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def observed(day: date) -> date:
+    """Saturday holidays move to Friday, Sunday holidays to Monday"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=None)
+def nyse_holidays(year: int) -> frozenset:
+    """
+    NYSE full-day holidays for a year, derived from the exchange's rules
+
+    Args:
+        year: Calendar year
+
+    Returns:
+        Set of dates the exchange is closed (weekends excluded)
+    """
+    holidays = {
+        nth_weekday(year, 1, 0, 3),   # Martin Luther King Jr. Day
+        nth_weekday(year, 2, 0, 3),   # Washington's Birthday
+        easter_sunday(year) - timedelta(days=2),  # Good Friday
+        nth_weekday(year, 5, 0, -1),  # Memorial Day
+        observed(date(year, 7, 4)),   # Independence Day
+        nth_weekday(year, 9, 0, 1),   # Labor Day
+        nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        observed(date(year, 12, 25))  # Christmas
+    }
+    # New Year's Day is not moved back into the previous year when it falls on a Saturday
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(observed(new_year))
+    if year >= 2022:
+        holidays.add(observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(holidays)
+
+
+def nyse_early_closes(year: int) -> frozenset:
+    """Days the exchange closes at 13:00 ET"""
+    candidates = [
+        date(year, 7, 3),                                       # Day before Independence Day
+        nth_weekday(year, 11, 3, 4) + timedelta(days=1),        # Day after Thanksgiving
+        date(year, 12, 24)                                      # Christmas Eve
+    ]
+    holidays = nyse_holidays(year)
+    return frozenset(day for day in candidates if day.weekday() < 5 and day not in holidays)
+
+
+class MarketCalendar:
+    def __init__(self, tz: ZoneInfo = MARKET_TZ):
+        """US equity regular session calendar (NYSE holidays and early closes)"""
+        self.tz = tz
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in nyse_holidays(day.year)
+
+    def session(self, day: date) -> Optional[Tuple[datetime, datetime]]:
+        """
+        Regular session of a day
+
+        Args:
+            day: Calendar date in exchange time
+
+        Returns:
+            (open, close) as timezone-aware datetimes, or None if the market is closed
+        """
+        if not self.is_trading_day(day):
+            return None
+        close = EARLY_CLOSE if day in nyse_early_closes(day.year) else REGULAR_CLOSE
+        return (datetime.combine(day, REGULAR_OPEN, tzinfo=self.tz),
+                datetime.combine(day, close, tzinfo=self.tz))
+
+    def is_open(self, when: datetime) -> bool:
+        local = when.astimezone(self.tz)
+        session = self.session(local.date())
+        return session is not None and session[0] <= local < session[1]
+
+    def next_open(self, when: datetime) -> datetime:
+        """First session open strictly after `when`"""
+        local = when.astimezone(self.tz)
+        day = local.date()
+        while True:
+            session = self.session(day)
+            if session and session[0] > local:
+                return session[0]
+            day += timedelta(days=1)
+
+
+class IngestScheduler:
+    def __init__(self, interval_minutes: int = 5, offhours_interval_minutes: Optional[int] = 60,
+                 calendar: Optional[MarketCalendar] = None,
+                 clock: Callable[[], float] = time.time, sleep: Callable[[float], None] = time.sleep):
+        """
+        Wall-clock aligned cycle scheduler that follows the US equity session
+
+        During the session cycles run on interval boundaries (09:30, 09:35, ...)
+        plus one at the close. Outside it they run on the slower off-hours
+        boundaries, and always at the next open. A cycle that starts late runs
+        once for all the slots it missed.
+
+        Args:
+            interval_minutes: Cadence during the regular session
+            offhours_interval_minutes: Cadence outside the session (None to
+                sleep until the next open)
+            calendar: Market calendar (defaults to NYSE)
+            clock: Wall clock in epoch seconds, injectable for testing
+            sleep: Sleep function, injectable for testing
+        """
+        self.interval = timedelta(minutes=interval_minutes)
+        self.offhours_interval = timedelta(minutes=offhours_interval_minutes) if offhours_interval_minutes else None
+        self.calendar = calendar or MarketCalendar()
+        self.clock = clock
+        self.sleep = sleep
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self.clock(), tz=self.calendar.tz)
+
+    @staticmethod
+    def _align(local: datetime, interval: timedelta) -> datetime:
+        """First interval boundary (counted from local midnight) strictly after `local`"""
+        midnight = datetime.combine(local.date(), dtime(0), tzinfo=local.tzinfo)
+        elapsed = local.replace(tzinfo=None) - midnight.replace(tzinfo=None)
+        return midnight + interval * (elapsed // interval + 1)
+
+    def next_slot(self, after: datetime) -> datetime:
+        """
+        First scheduled cycle strictly after a moment
+
+        Args:
+            after: Timezone-aware datetime
+
+        Returns:
+            Timezone-aware datetime of the next slot in exchange time
+        """
+        local = after.astimezone(self.calendar.tz)
+        session = self.calendar.session(local.date())
+        if session and session[0] <= local < session[1]:
+            return min(self._align(local, self.interval), session[1])
+
+        next_open = self.calendar.next_open(local)
+        if self.offhours_interval is None:
+            return next_open
+        return min(self._align(local, self.offhours_interval), next_open)
+
+    def slots_between(self, start: datetime, end: datetime) -> List[datetime]:
+        """Scheduled slots in (start, end]"""
+        slots = []
+        slot = self.next_slot(start)
+        while slot <= end:
+            slots.append(slot)
+            slot = self.next_slot(slot)
+        return slots
+
+    def run(self, cycle: Callable[[], object], max_cycles: Optional[int] = None):
+        """
+        Run `cycle` once right away, then on every slot until interrupted
+
+        Args:
+            cycle: Function running one fetch cycle
+            max_cycles: Stop after this many cycles (None runs forever)
+        """
+        # Start with fresh data instead of waiting up to a whole interval
+        due = self.now()
+        cycles = 0
+        while max_cycles is None or cycles < max_cycles:
+            now = self.now()
+            if now < due:
+                # Sleep in short steps so a suspended host notices the wall clock jumping
+                self.sleep(min((due - now).total_seconds(), 60))
+                continue
+
+            missed = len(self.slots_between(due, now))
+            if missed:
+                print(f"⏭️  Running once for {missed + 1} missed slots")
+
+            cycle()
+            cycles += 1
+
+            due = self.next_slot(self.now())
+            state = "market open" if self.calendar.is_open(due) else "market closed"
+            print(f"💤 Next cycle at {due:%Y-%m-%d %H:%M %Z} ({state})")
+
+
+class SymbolPriorityScheduler:
+    def __init__(self, symbols: List[str], benchmarks: Iterable[str] = ('SPY', 'QQQ', 'IWM', 'DIA', 'VIX'),
+                 base_interval: float = 300, normal_multiple: int = 3, quiet_multiple: int = 12,
+                 hot_score: float = 1.5, quiet_score: float = 0.8, max_calls_per_minute: int = 60,
+                 clock: Callable[[], float] = time.time):
+        """
+        Decides which symbols are due for a refresh each cycle
+
+        Benchmarks and active symbols (high realized volatility relative to the
+        universe, or a high volume ratio) are refreshed every base_interval;
+        ordinary symbols every normal_multiple intervals and quiet ones every
+        quiet_multiple intervals. Symbols without activity data yet are always
+        due. At most max_calls_per_minute symbols are handed out per rolling
+        minute, most overdue first.
+
+        Args:
+            symbols: Symbol universe
+            benchmarks: Symbols always polled at the base interval
+            base_interval: Fastest refresh interval in seconds
+            normal_multiple: Interval multiple for ordinary symbols
+            quiet_multiple: Interval multiple for quiet symbols
+            hot_score: Activity score at or above which a symbol is active
+            quiet_score: Activity score at or below which a symbol is quiet
+            max_calls_per_minute: Global refresh ceiling
+            clock: Wall clock in epoch seconds, injectable for testing
+        """
+        self.symbols = symbols
+        self.benchmarks = set(benchmarks)
+        self.base_interval = base_interval
+        self.normal_multiple = normal_multiple
+        self.quiet_multiple = quiet_multiple
+        self.hot_score = hot_score
+        self.quiet_score = quiet_score
+        self.max_calls_per_minute = max_calls_per_minute
+        self.clock = clock
+        self.volatility = {}
+        self.median_volatility = None  # Recomputed on every update_volatility, read per symbol
+        self.volume_ratio = {}
+        self.last_polled = {}
+        self.recent_polls = deque()
+        self.lock = threading.Lock()
+
+    def update_volatility(self, volatility: Dict[str, float]):
+        """Record the latest realized volatility per symbol (NaN/None entries are ignored)"""
+        with self.lock:
+            for symbol, value in volatility.items():
+                if value is not None and value == value:
+                    self.volatility[symbol] = float(value)
+            if self.volatility:
+                values = sorted(self.volatility.values())
+                self.median_volatility = values[len(values) // 2]
+
+    def update_volume_ratio(self, symbol: str, volume_ratio: Optional[float]):
+        if volume_ratio is not None:
+            with self.lock:
+                self.volume_ratio[symbol] = float(volume_ratio)
+
+    def activity_score(self, symbol: str) -> Optional[float]:
+        """
+        Relative activity of a symbol
+
+        Returns:
+            Max of volatility relative to the universe median and volume
+            ratio, or None if nothing is known about the symbol yet
+        """
+        scores = []
+        median = self.median_volatility
+        if symbol in self.volatility and median:
+            scores.append(self.volatility[symbol] / median)
+        if symbol in self.volume_ratio:
+            scores.append(self.volume_ratio[symbol])
+        return max(scores) if scores else None
+
+    def interval(self, symbol: str) -> float:
+        """Refresh interval of a symbol in seconds"""
+        if symbol in self.benchmarks:
+            return self.base_interval
+        score = self.activity_score(symbol)
+        if score is None or score >= self.hot_score:
+            return self.base_interval
+        if score <= self.quiet_score:
+            return self.base_interval * self.quiet_multiple
+        return self.base_interval * self.normal_multiple
+
+    def due_symbols(self, symbols: Optional[List[str]] = None, now: Optional[float] = None) -> List[str]:
+        """
+        Symbols to refresh now, most urgent first
+
+        Args:
+            symbols: Universe to consider (defaults to the scheduler's symbols)
+            now: Epoch seconds (defaults to the clock)
+
+        Returns:
+            Due symbols ordered by benchmark status then lateness, capped by
+            the calls left in the current minute
+        """
+        now = self.clock() if now is None else now
+        # Aligned cycles land a few seconds either side of the exact interval
+        slack = 0.1 * self.base_interval
+        due = []
+        with self.lock:
+            for symbol in symbols or self.symbols:
+                last = self.last_polled.get(symbol)
+                interval = self.interval(symbol)
+                if last is None or now - last >= interval - slack:
+                    lateness = float('inf') if last is None else (now - last) / interval
+                    due.append((symbol not in self.benchmarks, -lateness, symbol))
+
+            while self.recent_polls and now - self.recent_polls[0] >= 60:
+                self.recent_polls.popleft()
+            allowance = max(0, self.max_calls_per_minute - len(self.recent_polls))
+        return [symbol for _, _, symbol in sorted(due)[:allowance]]
+
+    def mark_polled(self, symbol: str, now: Optional[float] = None):
+        now = self.clock() if now is None else now
+        with self.lock:
+            self.last_polled[symbol] = now
+            self.recent_polls.append(now)
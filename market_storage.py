@@ -0,0 +1,161 @@
+import time
+from datetime import datetime, timedelta, timezone
+from datetime import time as dtime
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+STORAGE_MODES = ('timeseries', 'indexed')
+
+
+class MarketConditionsStorage:
+    def __init__(self, db, mode: str = 'timeseries', raw_ttl_days: float = 30,
+                 collection_name: str = 'market_conditions',
+                 summary_collection_name: str = 'market_daily_summary',
+                 rollup_interval: float = 3600, rollup_timezone: str = 'America/New_York'):
+        """
+        Bounded storage layout for raw market snapshots
+
+        'timeseries' stores snapshots in a MongoDB time-series collection
+        (symbol as metaField) with automatic expiry. 'indexed' keeps a regular
+        collection with a TTL index instead, and is used automatically when
+        market_conditions already exists as a regular collection. Both modes
+        keep a (symbol, timestamp) index and roll raw snapshots up into one
+        summary document per symbol and trading day before they expire.
+
+        Args:
+            db: MongoDB database
+            mode: 'timeseries' or 'indexed'
+            raw_ttl_days: Days raw snapshots are kept
+            collection_name: Raw snapshot collection
+            summary_collection_name: Daily rollup collection
+            rollup_interval: Minimum seconds between automatic rollups
+            rollup_timezone: Timezone that defines a trading day
+        """
+        if mode not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode {mode!r}, expected one of {STORAGE_MODES}")
+        self.db = db
+        self.mode = mode
+        self.raw_ttl_seconds = int(raw_ttl_days * 86400)
+        self.collection_name = collection_name
+        self.summary_collection_name = summary_collection_name
+        self.rollup_interval = rollup_interval
+        self.rollup_timezone = rollup_timezone
+        self._last_rollup = None
+
+    @property
+    def is_timeseries(self) -> bool:
+        return self.mode == 'timeseries'
+
+    def setup(self):
+        """
+        Create the collections and indexes (safe to call on every start)
+
+        Returns:
+            The raw snapshot collection
+        """
+        existing = self.db.list_collection_names(filter={'name': self.collection_name})
+        if self.is_timeseries:
+            if not existing:
+                self.db.create_collection(
+                    self.collection_name,
+                    timeseries={'timeField': 'timestamp', 'metaField': 'symbol', 'granularity': 'minutes'},
+                    expireAfterSeconds=self.raw_ttl_seconds
+                )
+                print(f"🗄️  Created time-series collection {self.collection_name}")
+            else:
+                info = next(iter(self.db.list_collections(filter={'name': self.collection_name})), {})
+                if info.get('type') == 'timeseries':
+                    self.db.command('collMod', self.collection_name, expireAfterSeconds=self.raw_ttl_seconds)
+                else:
+                    print(f"⚠️  {self.collection_name} is a regular collection, using indexed storage with TTL")
+                    self.mode = 'indexed'
+
+        collection = self.db[self.collection_name]
+        collection.create_index([('symbol', ASCENDING), ('timestamp', DESCENDING)], name='symbol_timestamp')
+        if not self.is_timeseries:
+            try:
+                collection.create_index('timestamp', name='timestamp_ttl', expireAfterSeconds=self.raw_ttl_seconds)
+            except OperationFailure as e:
+                # An index on timestamp already exists with different options
+                print(f"⚠️  Could not add TTL index to {self.collection_name}: {e}")
+        else:
+            collection.create_index([('timestamp', DESCENDING)], name='timestamp')
+
+        summary = self.db[self.summary_collection_name]
+        summary.create_index([('symbol', ASCENDING), ('date', DESCENDING)], name='symbol_date')
+        return collection
+
+    def rollup_pipeline(self, since: Optional[datetime] = None) -> List[Dict]:
+        """Aggregation that merges raw snapshots into per-symbol daily summaries"""
+        day = {'$dateTrunc': {'date': '$timestamp', 'unit': 'day', 'timezone': self.rollup_timezone}}
+        pipeline = [{'$match': {'timestamp': {'$gte': since}}}] if since else []
+        pipeline += [
+            {'$sort': {'symbol': 1, 'timestamp': 1}},
+            {'$group': {
+                '_id': {'symbol': '$symbol', 'date': day},
+                'open': {'$first': '$price'},
+                'high': {'$max': '$price'},
+                'low': {'$min': '$price'},
+                'close': {'$last': '$price'},
+                'volume': {'$last': '$volume'},
+                'change_percent': {'$last': '$change_percent'},
+                'indicators': {'$last': '$indicators'},
+                'regime_signals': {'$last': '$regime_signals'},
+                'samples': {'$sum': 1},
+                'last_timestamp': {'$last': '$timestamp'}
+            }},
+            {'$project': {
+                '_id': {'$concat': ['$_id.symbol', '_', {'$dateToString': {
+                    'date': '$_id.date', 'format': '%Y%m%d', 'timezone': self.rollup_timezone}}]},
+                'symbol': '$_id.symbol',
+                'date': '$_id.date',
+                'open': 1, 'high': 1, 'low': 1, 'close': 1, 'volume': 1, 'change_percent': 1,
+                'indicators': 1, 'regime_signals': 1, 'samples': 1, 'last_timestamp': 1
+            }},
+            {'$merge': {'into': self.summary_collection_name, 'on': '_id',
+                        'whenMatched': 'replace', 'whenNotMatched': 'insert'}}
+        ]
+        return pipeline
+
+    def rollup(self, since: Optional[datetime] = None):
+        """
+        Roll raw snapshots up into market_daily_summary
+
+        Args:
+            since: Only re-aggregate snapshots from this UTC time on (None
+                aggregates everything still stored)
+        """
+        started = time.monotonic()
+        self.db[self.collection_name].aggregate(self.rollup_pipeline(since), allowDiskUse=True)
+        self._last_rollup = time.monotonic()
+        print(f"🧮 Rolled up daily summaries in {self._last_rollup - started:.1f}s")
+
+    def day_start(self, days_ago: int = 0) -> datetime:
+        """Start of a trading day in rollup_timezone, as a naive UTC datetime"""
+        tz = ZoneInfo(self.rollup_timezone)
+        day = datetime.now(tz).date() - timedelta(days=days_ago)
+        return datetime.combine(day, dtime(0), tzinfo=tz).astimezone(timezone.utc).replace(tzinfo=None)
+
+    def maybe_rollup(self) -> bool:
+        """
+        Roll up yesterday and today if rollup_interval has passed since the last rollup
+
+        The first rollup of a process covers everything still stored, so days
+        missed while the fetcher was down are summarized before they expire.
+
+        Returns:
+            True if a rollup ran
+        """
+        if self._last_rollup is not None and time.monotonic() - self._last_rollup < self.rollup_interval:
+            return False
+        # Start on a day boundary: a partial day would replace a complete summary
+        since = None if self._last_rollup is None else self.day_start(days_ago=1)
+        try:
+            self.rollup(since)
+            return True
+        except Exception as e:
+            print(f"⚠️  Daily rollup failed: {e}")
+            return False
@@ -1,5 +1,5 @@
 import os
-import requests
+from upstream_client import get_upstream_client
 from pymongo import MongoClient
 from datetime import datetime, timedelta
 import time
@@ -18,6 +18,7 @@ class NewsDataFetcher:
         """
         self.newsapi_key = newsapi_key
         self.newsapi_base_url = "https://newsapi.org/v2/everything"
+        self.http = get_upstream_client()
         
         # MongoDB setup
         self.client = MongoClient(mongo_connection_string)
@@ -64,7 +65,7 @@ class NewsDataFetcher:
                 'apiKey': self.newsapi_key
             }
             
-            response = requests.get(self.newsapi_base_url, params=params)
+            response = self.http.get('newsapi', self.newsapi_base_url, params=params)
             data = response.json()
             
             if response.status_code == 200 and data.get('status') == 'ok':
@@ -0,0 +1,131 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from indicator_engine import rsi
+
+# Horizon name: bars per step
+HORIZONS = {'daily': 1, 'weekly': 5, 'monthly': 21}
+
+# Labels per signal; a signal's code is the index of its label (-1 = not enough history)
+SIGNAL_LABELS = {
+    'trend': ('strong_down', 'down', 'up', 'strong_up'),
+    'momentum': ('oversold', 'weak', 'neutral', 'strong', 'overbought'),
+    'volume': ('normal', 'above_average', 'high')
+}
+
+# Order of the codes in a regime vector: every signal for each horizon in turn
+VECTOR_FIELDS = tuple(f"{horizon}_{signal}" for horizon in HORIZONS for signal in SIGNAL_LABELS)
+
+# Daily move that counts as a strong trend (as in determine_regime_signals),
+# scaled by sqrt(bars) for longer horizons
+STRONG_MOVE_PERCENT = 1.0
+RSI_WINDOW = 14
+VOLUME_WINDOW = 20
+
+# Calendar days of daily bars needed for a monthly RSI and volume average
+REGIME_HISTORY_DAYS = 640
+
+
+def forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """Carry the last non-NaN value down the time axis of a (T, N) matrix"""
+    rows = np.where(np.isnan(matrix), 0, np.arange(len(matrix))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return matrix[rows, np.arange(matrix.shape[1])]
+
+
+def trend_codes(change_percent: np.ndarray, bars: int) -> np.ndarray:
+    strong = STRONG_MOVE_PERCENT * np.sqrt(bars)
+    codes = np.select([change_percent > strong, change_percent > 0, change_percent < -strong],
+                      [3, 2, 0], default=1)
+    return np.where(np.isnan(change_percent), -1, codes)
+
+
+def momentum_codes(rsi_values: np.ndarray, known: np.ndarray) -> np.ndarray:
+    # NaN RSI with enough history (no gains or losses) compares as neutral
+    codes = np.select([rsi_values > 70, rsi_values > 60, rsi_values < 30, rsi_values < 40],
+                      [4, 3, 0, 1], default=2)
+    return np.where(known, codes, -1)
+
+
+def volume_codes(volume_ratio: np.ndarray) -> np.ndarray:
+    codes = np.select([volume_ratio > 1.5, volume_ratio > 1.1], [2, 1], default=0)
+    return np.where(np.isnan(volume_ratio), -1, codes)
+
+
+def regime_vectors(closes: np.ndarray, volumes: np.ndarray,
+                   horizons: Optional[Dict[str, int]] = None) -> np.ndarray:
+    """
+    Trend, momentum and volume codes on every horizon for a whole universe
+
+    For a horizon of k bars, trend is the move over the last k bars,
+    momentum is the 14-step RSI of every k-th close ending at the last bar,
+    and volume compares the mean volume of the last k bars with the mean
+    over the last 20 * k bars. Daily thresholds match determine_regime_signals.
+
+    Args:
+        closes: (T, N) daily close matrix (NaN where a symbol has no bar)
+        volumes: (T, N) daily volume matrix
+        horizons: Horizon name to bars (defaults to HORIZONS)
+
+    Returns:
+        (N, len(horizons) * 3) int8 matrix of codes in VECTOR_FIELDS order,
+        -1 where a symbol has too few real (unfilled) bars for the horizon
+    """
+    horizons = horizons or HORIZONS
+    closes = np.asarray(closes, dtype=np.float64)
+    volumes = np.asarray(volumes, dtype=np.float64)
+    # Count real bars before filling, so carried closes do not pass as history
+    bars_known = (~np.isnan(closes)).sum(axis=0)
+    closes = forward_fill(closes)
+    t, n = closes.shape
+    codes = np.full((n, len(horizons) * len(SIGNAL_LABELS)), -1, dtype=np.int8)
+
+    for h, bars in enumerate(horizons.values()):
+        column = h * len(SIGNAL_LABELS)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if t > bars:
+                change = (closes[-1] / closes[-1 - bars] - 1) * 100
+                codes[:, column] = np.where(bars_known > bars, trend_codes(change, bars), -1)
+
+            # The last RSI only needs the last RSI_WINDOW changes
+            sampled = closes[::-bars][:RSI_WINDOW + 1][::-1]
+            if len(sampled) > RSI_WINDOW:
+                known = bars_known > RSI_WINDOW * bars
+                codes[:, column + 1] = momentum_codes(rsi(sampled, RSI_WINDOW)[-1], known)
+
+            if t >= VOLUME_WINDOW * bars:
+                recent = np.nanmean(volumes[-bars:], axis=0)
+                baseline = np.nanmean(volumes[-VOLUME_WINDOW * bars:], axis=0)
+                codes[:, column + 2] = np.where(bars_known >= VOLUME_WINDOW * bars,
+                                                volume_codes(recent / baseline), -1)
+    return codes
+
+
+def decode_regime_vector(vector: List[int]) -> Dict[str, Dict[str, Optional[str]]]:
+    """Labels of a stored regime vector per horizon (None where history was short)"""
+    decoded = {}
+    for field, code in zip(VECTOR_FIELDS, vector):
+        horizon, signal = field.split('_', 1)
+        decoded.setdefault(horizon, {})[signal] = SIGNAL_LABELS[signal][code] if code >= 0 else None
+    return decoded
+
+
+def summarize_horizons(documents: List[Dict]) -> Dict[str, Dict[str, int]]:
+    """
+    Count up, down and strong trends per horizon over market documents
+
+    Documents without a regime_vector are skipped.
+    """
+    summary = {horizon: {'up': 0, 'down': 0, 'strong': 0, 'high_volume': 0} for horizon in HORIZONS}
+    for document in documents:
+        vector = document.get('regime_vector')
+        if not vector:
+            continue
+        for horizon, signals in decode_regime_vector(vector).items():
+            trend = signals['trend']
+            if trend:
+                summary[horizon]['up' if 'up' in trend else 'down'] += 1
+                summary[horizon]['strong'] += 'strong' in trend
+            summary[horizon]['high_volume'] += signals['volume'] == 'high'
+    return summary
@@ -1,9 +1,17 @@
 #!/usr/bin/env python3
 
+import argparse
 import pymongo
+from pymongo.errors import PyMongoError
 from datetime import datetime, timedelta
 import os
+import threading
 import time
+from typing import Callable, Optional
+
+from regime_engine import summarize_horizons
+from strategy_rules import select_strategies, strategy_features
+from volatility_engine import volatility_regime
 
 def generate_strategy_reasoning(strategy_name, market_data, market_regime, events):
     """Generate intelligent reasoning for strategy recommendations"""
@@ -58,11 +66,87 @@ def generate_strategy_reasoning(strategy_name, market_data, market_regime, event
     
     return " ".join(reasoning_parts)
 
+# Symbols the market regime is read from; VIX is read alongside as the volatility gauge
+TRACKED_SYMBOLS = ('SPY', 'QQQ', 'IWM', 'DIA')
+VIX_SYMBOL = 'VIX'
+
+def latest_market_snapshot(db, symbols=TRACKED_SYMBOLS, vix_symbol=VIX_SYMBOL):
+    """
+    Latest market_conditions document per symbol in one aggregation
+    
+    The $sort matches the (symbol, timestamp) index, so $group/$first is
+    answered with one index probe per symbol (DISTINCT_SCAN) no matter how
+    much history is stored.
+    
+    Args:
+        db: MongoDB database
+        symbols: Symbols to read, in the order they are returned
+        vix_symbol: Volatility gauge read in the same query (None to skip)
+        
+    Returns:
+        Tuple of (latest documents of the symbols that have one, latest VIX document or None)
+    """
+    wanted = list(symbols) + ([vix_symbol] if vix_symbol else [])
+    pipeline = [
+        {'$match': {'symbol': {'$in': wanted}}},
+        {'$sort': {'symbol': 1, 'timestamp': -1}},
+        {'$group': {'_id': '$symbol', 'latest': {'$first': '$$ROOT'}}},
+        {'$replaceRoot': {'newRoot': '$latest'}}
+    ]
+    latest = {doc['symbol']: doc for doc in db.market_conditions.aggregate(pipeline)}
+    return [latest[symbol] for symbol in symbols if symbol in latest], latest.get(vix_symbol)
+
+# A snapshot older than two default 5-minute fetch cycles means the fetcher
+# stopped publishing them (stopped, or sharded across workers)
+SNAPSHOT_MAX_AGE_SECONDS = 600
+
+def read_market_snapshot(db, symbols=TRACKED_SYMBOLS, vix_symbol=VIX_SYMBOL,
+                         max_age_seconds=SNAPSHOT_MAX_AGE_SECONDS):
+    """
+    Latest completed fetch cycle from market_snapshots in one point read
+    
+    Snapshot ids are cycle start times, so the latest one is the first
+    entry of the _id index; only the requested symbols' entries are
+    returned. Falls back to latest_market_snapshot and the market_features
+    document when no snapshot was written in the last max_age_seconds.
+    
+    Args:
+        db: MongoDB database
+        symbols: Symbols to read, in the order they are returned
+        vix_symbol: Volatility gauge read from the same snapshot (None to skip)
+        max_age_seconds: Oldest snapshot still served
+        
+    Returns:
+        Tuple of (symbol documents, VIX document or None, market features, cycle id or None)
+    """
+    wanted = list(symbols) + ([vix_symbol] if vix_symbol else [])
+    pipeline = [
+        {'$sort': {'_id': -1}},
+        {'$limit': 1},
+        {'$project': {
+            'cycle_id': 1,
+            'timestamp': 1,
+            'features': 1,
+            'symbols': {'$filter': {'input': '$symbols', 'as': 'entry',
+                                    'cond': {'$in': ['$$entry.symbol', wanted]}}}
+        }}
+    ]
+    snapshot = next(iter(db.market_snapshots.aggregate(pipeline)), None)
+    oldest = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+    if snapshot is None or snapshot.get('timestamp') is None or snapshot['timestamp'] < oldest:
+        latest_market, vix = latest_market_snapshot(db, symbols, vix_symbol)
+        correlation = db.market_features.find_one({'_id': 'correlation'}) or {}
+        return latest_market, vix, {'correlation': correlation}, None
+    
+    latest = {entry['symbol']: entry for entry in snapshot.get('symbols') or []}
+    return ([latest[symbol] for symbol in symbols if symbol in latest], latest.get(vix_symbol),
+            snapshot.get('features') or {}, snapshot.get('cycle_id'))
+
 def analyze_market_conditions(db):
     """Analyze current market conditions and generate strategy recommendations"""
     
-    # Get latest market data (last 4 records for major ETFs)
-    latest_market = list(db.market_conditions.find().sort("timestamp", -1).limit(4))
+    # Get the latest record of each major ETF (and VIX) from one consistent cycle
+    latest_market, vix, features, cycle_id = read_market_snapshot(db)
     
     if not latest_market:
         print("No market data found")
@@ -71,108 +155,33 @@ def analyze_market_conditions(db):
     # Get recent events
     recent_events = list(db.events.find().sort("published_at", -1).limit(5))
     
-    # Analyze market regime
-    regime_signals = [item.get('regime_signals', {}) for item in latest_market]
-    trend_signals = [r.get('trend', 'neutral') for r in regime_signals]
-    volume_signals = [r.get('volume', 'normal') for r in regime_signals]
-    
-    # Determine overall market regime
-    strong_trends = sum(1 for t in trend_signals if 'strong' in t)
-    up_trends = sum(1 for t in trend_signals if 'up' in t)
-    high_volume = sum(1 for v in volume_signals if v == 'high')
-    
-    if strong_trends >= 2:
-        regime = "trending"
-        regime_confidence = 0.8 + (strong_trends * 0.05)
-    elif up_trends >= 2:
-        regime = "trending"
-        regime_confidence = 0.6 + (up_trends * 0.05)
-    else:
-        regime = "range_bound"
-        regime_confidence = 0.7
-    
-    # Cap confidence at 1.0
-    regime_confidence = min(regime_confidence, 1.0)
-    
-    # Calculate market metrics for strategy selection
-    prices = [item['price'] for item in latest_market]
-    changes = [item['change_percent'] for item in latest_market]
-    rsi_values = [item['indicators']['rsi'] for item in latest_market]
-    
-    avg_change = sum(changes) / len(changes)
-    avg_rsi = sum(rsi_values) / len(rsi_values)
-    volatility = max(changes) - min(changes)
-    
-    # Strategy selection logic
-    strategies = []
-    
-    # Mean Reversion Strategy
-    if avg_rsi > 55 and avg_change > 0.8:
-        confidence = 0.3 + (avg_rsi - 55) * 0.01 + (avg_change - 0.8) * 0.1
-        strategies.append({
-            "name": "Mean Reversion Strategy",
-            "confidence_score": min(confidence, 0.8),
-            "risk_level": "low",
-            "timeframe": "3-7 days"
-        })
-    
-    # Momentum Breakout Strategy
-    if strong_trends >= 2 and avg_change > 0.5:
-        confidence = 0.4 + (strong_trends * 0.1) + (avg_change * 0.05)
-        strategies.append({
-            "name": "Momentum Breakout Strategy",
-            "confidence_score": min(confidence, 0.9),
-            "risk_level": "medium",
-            "timeframe": "1-3 weeks"
-        })
-    
-    # Trend Following Strategy
-    if up_trends >= 3:
-        confidence = 0.5 + (up_trends * 0.08)
-        strategies.append({
-            "name": "Trend Following Strategy",
-            "confidence_score": min(confidence, 0.85),
-            "risk_level": "medium",
-            "timeframe": "2-4 weeks"
-        })
-    
-    # Volatility Trading Strategy
-    if volatility > 2.0 or high_volume >= 2:
-        confidence = 0.4 + (volatility * 0.05)
-        strategies.append({
-            "name": "Volatility Trading Strategy",
-            "confidence_score": min(confidence, 0.75),
-            "risk_level": "high",
-            "timeframe": "1-5 days"
-        })
-    
-    # Event-Driven Strategy
-    if len(recent_events) > 2:
-        confidence = 0.3 + (len(recent_events) * 0.05)
-        strategies.append({
-            "name": "Event-Driven Strategy",
-            "confidence_score": min(confidence, 0.7),
-            "risk_level": "medium",
-            "timeframe": "1-7 days"
-        })
-    
-    # Defensive Strategy (fallback)
-    if not strategies or avg_change < 0:
-        strategies.append({
-            "name": "Defensive Strategy",
-            "confidence_score": 0.6,
-            "risk_level": "low",
-            "timeframe": "1-3 months"
-        })
-    
-    # Select primary strategy (highest confidence)
-    primary_strategy = max(strategies, key=lambda x: x['confidence_score'])
+    # Volatility regime from VIX, realized volatility and the size of daily moves
+    volatility_analysis = volatility_regime(
+        vix['price'] if vix else None,
+        [item.get('volatility', {}).get('realized_volatility') for item in latest_market],
+        [item['change_percent'] for item in latest_market]
+    )
+    
+    # Breadth: how much the tracked universe moves together
+    correlation = features.get('correlation') or {}
+    
+    # Regime and strategy selection rules (shared with the vectorized replay)
+    selection = select_strategies(strategy_features(latest_market, volatility_analysis, len(recent_events)))
+    regime = selection['regime']
+    regime_confidence = selection['regime_confidence']
+    primary_strategy = selection['primary_strategy']
     
     # Generate reasoning
     market_analysis = {
         "regime": regime,
         "confidence": regime_confidence,
-        "event_impact": "high" if len(recent_events) > 3 else "medium" if len(recent_events) > 1 else "low"
+        "event_impact": "high" if len(recent_events) > 3 else "medium" if len(recent_events) > 1 else "low",
+        "horizons": summarize_horizons(latest_market),
+        "volatility": volatility_analysis,
+        "breadth": {
+            "average_correlation": correlation.get('average_correlation'),
+            "dispersion": correlation.get('dispersion')
+        }
     }
     
     reasoning = generate_strategy_reasoning(
@@ -184,14 +193,194 @@ def analyze_market_conditions(db):
     
     return {
         "primary_strategy": primary_strategy,
-        "alternative_strategies": strategies[1:3],  # Top 2 alternatives
+        "alternative_strategies": selection['alternative_strategies'],
         "market_analysis": market_analysis,
         "reasoning": reasoning,
+        "cycle_id": cycle_id,
         "timestamp": datetime.now()
     }
 
+# Collections whose writes can change a recommendation
+WATCHED_COLLECTIONS = ('market_conditions', 'events', 'market_features', 'market_snapshots')
+
+class MarketDataWatcher:
+    def __init__(self, db, collections=WATCHED_COLLECTIONS, debounce_seconds: float = 3.0,
+                 max_delay_seconds: float = 30.0, poll_interval: float = 2.0,
+                 use_change_streams: bool = True, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Turns writes to the watched collections into debounced analysis triggers
+        
+        Inserts and replacements are read from a MongoDB change stream. When
+        change streams are unavailable (standalone servers, local stand-ins,
+        time-series market_conditions) the latest timestamps and document
+        counts are polled instead. A burst of writes such as one fetch cycle's
+        bulk upserts triggers once, after debounce_seconds without a new
+        write or max_delay_seconds after the first one.
+        
+        Args:
+            db: MongoDB database
+            collections: Collections to watch
+            debounce_seconds: Quiet period that ends a burst
+            max_delay_seconds: Longest a burst can postpone a trigger
+            poll_interval: Seconds between polls in polling mode
+            use_change_streams: Try change streams before polling
+            clock: Monotonic clock
+            sleep: Sleep function used while polling
+        """
+        self.db = db
+        self.collections = list(collections)
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.poll_interval = poll_interval
+        self.use_change_streams = use_change_streams
+        self.clock = clock
+        self.sleep = sleep
+        self.stream = None
+        self._fingerprint = None
+    
+    def _open_stream(self, resume_token=None) -> bool:
+        """Open a change stream on the watched collections, False if unsupported"""
+        try:
+            info = next(iter(self.db.list_collections(filter={'name': 'market_conditions'})), {})
+            if info.get('type') == 'timeseries':
+                print("⚠️  market_conditions is a time-series collection, polling for changes")
+                return False
+        except (PyMongoError, NotImplementedError):
+            pass
+        try:
+            pipeline = [{'$match': {
+                'operationType': {'$in': ['insert', 'replace', 'update']},
+                'ns.coll': {'$in': self.collections}
+            }}]
+            self.stream = self.db.watch(pipeline, max_await_time_ms=500, resume_after=resume_token)
+            return True
+        except (PyMongoError, NotImplementedError, AttributeError, TypeError) as e:
+            print(f"⚠️  Change streams unavailable ({e}), polling for changes")
+            self.stream = None
+            return False
+    
+    def fingerprint(self) -> tuple:
+        """Latest timestamps and counts of the watched collections (polling mode)"""
+        parts = []
+        for name in self.collections:
+            collection = self.db[name]
+            field = 'published_at' if name == 'events' else 'timestamp'
+            latest = collection.find_one(sort=[(field, -1)], projection={field: 1})
+            parts.append((collection.estimated_document_count(), latest.get(field) if latest else None))
+        return tuple(parts)
+    
+    def _poll(self, timeout: float) -> int:
+        self.sleep(timeout)
+        fingerprint = self.fingerprint()
+        changed = self._fingerprint is not None and fingerprint != self._fingerprint
+        self._fingerprint = fingerprint
+        return int(changed)
+    
+    def _read_stream(self, timeout: float) -> int:
+        """Count changes arriving within timeout seconds"""
+        deadline = self.clock() + timeout
+        changes = 0
+        while True:
+            try:
+                change = self.stream.try_next()
+            except PyMongoError as e:
+                print(f"⚠️  Change stream interrupted ({e}), reopening")
+                token = self.stream.resume_token
+                self.stream.close()
+                if not self._open_stream(token):
+                    self._fingerprint = self.fingerprint()
+                return changes + 1  # Writes may have been missed
+            if change is not None:
+                changes += 1
+            elif self.clock() >= deadline:
+                return changes
+    
+    def next_changes(self, timeout: float) -> int:
+        """Wait up to timeout seconds and return the number of writes seen"""
+        if self.stream is not None:
+            return self._read_stream(timeout)
+        return self._poll(timeout)
+    
+    def run(self, on_change: Callable[[int], None], stop_event: Optional[threading.Event] = None):
+        """
+        Call on_change(writes) once per burst of writes until stop_event is set
+        
+        Args:
+            on_change: Callback receiving the number of writes in the burst
+            stop_event: Set to stop watching
+        """
+        if not (self.use_change_streams and self._open_stream()):
+            self._fingerprint = self.fingerprint()
+        print(f"👀 Watching {', '.join(self.collections)} via "
+              f"{'change streams' if self.stream is not None else f'polling every {self.poll_interval:g}s'}")
+        
+        pending = 0
+        first_write = last_write = None
+        try:
+            while not (stop_event and stop_event.is_set()):
+                if pending:
+                    now = self.clock()
+                    timeout = max(0.0, min(last_write + self.debounce_seconds,
+                                           first_write + self.max_delay_seconds) - now)
+                else:
+                    timeout = self.poll_interval
+                changes = self.next_changes(timeout)
+                now = self.clock()
+                if changes:
+                    pending += changes
+                    first_write = first_write if first_write is not None else now
+                    last_write = now
+                if pending and (now - last_write >= self.debounce_seconds or
+                                now - first_write >= self.max_delay_seconds):
+                    writes, pending = pending, 0
+                    first_write = last_write = None
+                    on_change(writes)
+        finally:
+            if self.stream is not None:
+                self.stream.close()
+
+def run_analysis(db):
+    """Analyze the market, store the recommendation and print a summary"""
+    try:
+        print(f"\n🤖 Analyzing market conditions at {datetime.now().strftime('%H:%M:%S')}")
+        
+        # Analyze market and generate strategy
+        strategy_recommendation = analyze_market_conditions(db)
+        
+        if strategy_recommendation:
+            # Store in database
+            result = db.strategies.insert_one(strategy_recommendation)
+            
+            # Print summary
+            strategy = strategy_recommendation['primary_strategy']
+            market = strategy_recommendation['market_analysis']
+            
+            print(f"📊 Market Regime: {market['regime']} ({market['confidence']*100:.0f}% confidence)")
+            print(f"🎯 Strategy: {strategy['name']}")
+            print(f"💪 Confidence: {strategy['confidence_score']*100:.0f}%")
+            print(f"⚖️ Risk: {strategy['risk_level']}")
+            print(f"⏰ Timeframe: {strategy['timeframe']}")
+            print(f"💭 Reasoning: {strategy_recommendation['reasoning'][:100]}...")
+            
+            print(f"✅ Strategy recommendation stored with ID: {result.inserted_id}")
+        else:
+            print("⚠️ No strategy recommendation generated")
+        
+    except Exception as e:
+        print(f"❌ Error in strategy analysis: {e}")
+
 def main():
     """Main execution loop"""
+    parser = argparse.ArgumentParser(description="Generate strategy recommendations from stored market data")
+    parser.add_argument('--mode', choices=['watch', 'interval'], default='watch',
+                        help="watch: analyze as soon as new data is stored; interval: analyze on a fixed timer")
+    parser.add_argument('--interval', type=int, default=300, help="Seconds between analyses in interval mode")
+    parser.add_argument('--debounce', type=float, default=3.0, help="Quiet seconds that end a burst of writes")
+    parser.add_argument('--max-delay', type=float, default=30.0, help="Longest a burst can delay an analysis")
+    parser.add_argument('--poll-interval', type=float, default=2.0,
+                        help="Seconds between polls when change streams are unavailable")
+    args = parser.parse_args()
     
     # MongoDB connection
     MONGODB_URI = os.getenv('MONGODB_URI')
@@ -204,43 +393,23 @@ def main():
         db = client.adaptive_market_db
         print("✅ Connected to MongoDB")
         
-        while True:
-            try:
-                print(f"\n🤖 Analyzing market conditions at {datetime.now().strftime('%H:%M:%S')}")
-                
-                # Analyze market and generate strategy
-                strategy_recommendation = analyze_market_conditions(db)
-                
-                if strategy_recommendation:
-                    # Store in database
-                    result = db.strategies.insert_one(strategy_recommendation)
-                    
-                    # Print summary
-                    strategy = strategy_recommendation['primary_strategy']
-                    market = strategy_recommendation['market_analysis']
-                    
-                    print(f"📊 Market Regime: {market['regime']} ({market['confidence']*100:.0f}% confidence)")
-                    print(f"🎯 Strategy: {strategy['name']}")
-                    print(f"💪 Confidence: {strategy['confidence_score']*100:.0f}%")
-                    print(f"⚖️ Risk: {strategy['risk_level']}")
-                    print(f"⏰ Timeframe: {strategy['timeframe']}")
-                    print(f"💭 Reasoning: {strategy_recommendation['reasoning'][:100]}...")
-                    
-                    print(f"✅ Strategy recommendation stored with ID: {result.inserted_id}")
-                else:
-                    print("⚠️ No strategy recommendation generated")
-                
-            except Exception as e:
-                print(f"❌ Error in strategy analysis: {e}")
-            
-            # Wait 5 minutes before next analysis
-            print("⏳ Waiting 5 minutes for next analysis...")
-            time.sleep(300)
+        # Start from a current recommendation
+        run_analysis(db)
+        
+        if args.mode == 'watch':
+            watcher = MarketDataWatcher(db, debounce_seconds=args.debounce, max_delay_seconds=args.max_delay,
+                                        poll_interval=args.poll_interval)
+            watcher.run(lambda writes: run_analysis(db))
+        else:
+            while True:
+                print(f"⏳ Waiting {args.interval} seconds for next analysis...")
+                time.sleep(args.interval)
+                run_analysis(db)
             
-    except Exception as e:
-        print(f"❌ Database connection error: {e}")
     except KeyboardInterrupt:
         print("\n🛑 Strategy engine stopped")
+    except Exception as e:
+        print(f"❌ Database connection error: {e}")
 
 if __name__ == "__main__":
     main()
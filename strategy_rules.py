@@ -0,0 +1,262 @@
+from typing import Dict, List
+
+import numpy as np
+
+# Candidate strategies in the order the rules append them; index = strategy code
+STRATEGY_NAMES = (
+    'Mean Reversion Strategy',
+    'Momentum Breakout Strategy',
+    'Trend Following Strategy',
+    'Volatility Trading Strategy',
+    'Event-Driven Strategy',
+    'Defensive Strategy'
+)
+MEAN_REVERSION, MOMENTUM_BREAKOUT, TREND_FOLLOWING, VOLATILITY_TRADING, EVENT_DRIVEN, DEFENSIVE = range(6)
+
+# Strategy name: (risk level, timeframe)
+STRATEGY_PROFILES = {
+    'Mean Reversion Strategy': ('low', '3-7 days'),
+    'Momentum Breakout Strategy': ('medium', '1-3 weeks'),
+    'Trend Following Strategy': ('medium', '2-4 weeks'),
+    'Volatility Trading Strategy': ('high', '1-5 days'),
+    'Event-Driven Strategy': ('medium', '1-7 days'),
+    'Defensive Strategy': ('low', '1-3 months')
+}
+
+REGIMES = ('trending', 'range_bound', 'high_volatility')
+TRENDING, RANGE_BOUND, HIGH_VOLATILITY = range(3)
+
+# Columns of a feature matrix (one row per market snapshot)
+FEATURE_FIELDS = (
+    'avg_change',               # Mean daily change percent of the tracked ETFs
+    'avg_rsi',                  # Mean RSI of the tracked ETFs
+    'change_range',             # Largest minus smallest daily change percent
+    'strong_trends',            # ETFs with a strong_up/strong_down trend signal
+    'up_trends',                # ETFs with an up/strong_up trend signal
+    'high_volume',              # ETFs with a high volume signal
+    'events',                   # Recent events considered
+    'high_volatility',          # 1 if volatility_regime voted high_volatility
+    'volatility_confidence'     # volatility_regime confidence
+)
+(AVG_CHANGE, AVG_RSI, CHANGE_RANGE, STRONG_TRENDS, UP_TRENDS, HIGH_VOLUME, EVENTS,
+ HIGH_VOLATILITY_FLAG, VOLATILITY_CONFIDENCE) = range(len(FEATURE_FIELDS))
+
+
+def strategy_features(latest_market: List[Dict], volatility_analysis: Dict, event_count: int) -> Dict:
+    """
+    Scalar inputs of the strategy rules from the latest market documents
+
+    Args:
+        latest_market: Latest document of each tracked ETF (at least one)
+        volatility_analysis: Output of volatility_regime
+        event_count: Recent events considered
+
+    Returns:
+        Dictionary keyed by FEATURE_FIELDS
+    """
+    trend_signals = [item.get('regime_signals', {}).get('trend', 'neutral') for item in latest_market]
+    volume_signals = [item.get('regime_signals', {}).get('volume', 'normal') for item in latest_market]
+    changes = [item['change_percent'] for item in latest_market]
+    rsi_values = [item['indicators']['rsi'] for item in latest_market]
+    return {
+        'avg_change': sum(changes) / len(changes),
+        'avg_rsi': sum(rsi_values) / len(rsi_values),
+        'change_range': max(changes) - min(changes),
+        'strong_trends': sum(1 for t in trend_signals if 'strong' in t),
+        'up_trends': sum(1 for t in trend_signals if 'up' in t),
+        'high_volume': sum(1 for v in volume_signals if v == 'high'),
+        'events': event_count,
+        'high_volatility': bool(volatility_analysis['high_volatility']),
+        'volatility_confidence': volatility_analysis['confidence']
+    }
+
+
+def feature_matrix(rows: List[Dict]) -> np.ndarray:
+    """(N, len(FEATURE_FIELDS)) float64 matrix from strategy_features dictionaries"""
+    return np.array([[float(row[field]) for field in FEATURE_FIELDS] for row in rows],
+                    dtype=np.float64).reshape(len(rows), len(FEATURE_FIELDS))
+
+
+def select_strategies(features: Dict) -> Dict:
+    """
+    Market regime and candidate strategies for one snapshot
+
+    The primary strategy is the most confident candidate (the first one on
+    ties) and the alternatives are the second and third candidates in rule
+    order, as analyze_market_conditions has always reported them.
+
+    Args:
+        features: Dictionary keyed by FEATURE_FIELDS (see strategy_features)
+
+    Returns:
+        Dictionary with regime, regime_confidence, strategies (in rule
+        order), primary_strategy and alternative_strategies
+    """
+    avg_change = features['avg_change']
+    avg_rsi = features['avg_rsi']
+    change_range = features['change_range']
+    strong_trends = features['strong_trends']
+    up_trends = features['up_trends']
+
+    if features['high_volatility']:
+        regime = "high_volatility"
+        regime_confidence = features['volatility_confidence']
+    elif strong_trends >= 2:
+        regime = "trending"
+        regime_confidence = 0.8 + (strong_trends * 0.05)
+    elif up_trends >= 2:
+        regime = "trending"
+        regime_confidence = 0.6 + (up_trends * 0.05)
+    else:
+        regime = "range_bound"
+        regime_confidence = 0.7
+
+    # Cap confidence at 1.0
+    regime_confidence = min(regime_confidence, 1.0)
+
+    candidates = []
+
+    # Mean Reversion Strategy
+    if avg_rsi > 55 and avg_change > 0.8:
+        confidence = 0.3 + (avg_rsi - 55) * 0.01 + (avg_change - 0.8) * 0.1
+        candidates.append(('Mean Reversion Strategy', min(confidence, 0.8)))
+
+    # Momentum Breakout Strategy
+    if strong_trends >= 2 and avg_change > 0.5:
+        confidence = 0.4 + (strong_trends * 0.1) + (avg_change * 0.05)
+        candidates.append(('Momentum Breakout Strategy', min(confidence, 0.9)))
+
+    # Trend Following Strategy
+    if up_trends >= 3:
+        confidence = 0.5 + (up_trends * 0.08)
+        candidates.append(('Trend Following Strategy', min(confidence, 0.85)))
+
+    # Volatility Trading Strategy
+    if change_range > 2.0 or features['high_volume'] >= 2 or regime == "high_volatility":
+        confidence = 0.4 + (change_range * 0.05)
+        candidates.append(('Volatility Trading Strategy', min(confidence, 0.75)))
+
+    # Event-Driven Strategy
+    if features['events'] > 2:
+        confidence = 0.3 + (features['events'] * 0.05)
+        candidates.append(('Event-Driven Strategy', min(confidence, 0.7)))
+
+    # Defensive Strategy (fallback)
+    if not candidates or avg_change < 0:
+        candidates.append(('Defensive Strategy', 0.6))
+
+    strategies = [{
+        "name": name,
+        "confidence_score": confidence,
+        "risk_level": STRATEGY_PROFILES[name][0],
+        "timeframe": STRATEGY_PROFILES[name][1]
+    } for name, confidence in candidates]
+
+    return {
+        "regime": regime,
+        "regime_confidence": regime_confidence,
+        "strategies": strategies,
+        "primary_strategy": max(strategies, key=lambda x: x['confidence_score']),
+        "alternative_strategies": strategies[1:3]
+    }
+
+
+def replay_strategies(features: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    select_strategies over N historical snapshots in one vectorized pass
+
+    Every rule is evaluated as a column of an (N, 6) eligibility and
+    confidence matrix with the same arithmetic as the scalar rules, so
+    results match select_strategies exactly for finite features.
+
+    Args:
+        features: (N, len(FEATURE_FIELDS)) matrix in FEATURE_FIELDS order
+
+    Returns:
+        Dictionary of arrays: regime and regime_confidence (N,), primary and
+        primary_confidence (N,), alternatives and alternative_confidence
+        (N, 2) with -1 / NaN where there are fewer candidates, and the
+        eligible and confidence (N, 6) matrices. Strategy codes index
+        STRATEGY_NAMES and regime codes index REGIMES.
+    """
+    # Column-major so every feature and every strategy is one contiguous array
+    features = np.asfortranarray(features, dtype=np.float64)
+    avg_change = features[:, AVG_CHANGE]
+    avg_rsi = features[:, AVG_RSI]
+    change_range = features[:, CHANGE_RANGE]
+    strong_trends = features[:, STRONG_TRENDS]
+    up_trends = features[:, UP_TRENDS]
+    events = features[:, EVENTS]
+    high_volatility = features[:, HIGH_VOLATILITY_FLAG] != 0
+    n = len(features)
+
+    regime = np.select([high_volatility, strong_trends >= 2, up_trends >= 2],
+                       [HIGH_VOLATILITY, TRENDING, TRENDING], default=RANGE_BOUND).astype(np.int8)
+    regime_confidence = np.select(
+        [high_volatility, strong_trends >= 2, up_trends >= 2],
+        [features[:, VOLATILITY_CONFIDENCE], 0.8 + (strong_trends * 0.05), 0.6 + (up_trends * 0.05)],
+        default=0.7
+    )
+    regime_confidence = np.minimum(regime_confidence, 1.0)
+
+    eligible = np.empty((len(STRATEGY_NAMES), n), dtype=bool)
+    confidence = np.empty((len(STRATEGY_NAMES), n))
+    eligible[MEAN_REVERSION] = (avg_rsi > 55) & (avg_change > 0.8)
+    confidence[MEAN_REVERSION] = np.minimum(0.3 + (avg_rsi - 55) * 0.01 + (avg_change - 0.8) * 0.1, 0.8)
+    eligible[MOMENTUM_BREAKOUT] = (strong_trends >= 2) & (avg_change > 0.5)
+    confidence[MOMENTUM_BREAKOUT] = np.minimum(0.4 + (strong_trends * 0.1) + (avg_change * 0.05), 0.9)
+    eligible[TREND_FOLLOWING] = up_trends >= 3
+    confidence[TREND_FOLLOWING] = np.minimum(0.5 + (up_trends * 0.08), 0.85)
+    eligible[VOLATILITY_TRADING] = (change_range > 2.0) | (features[:, HIGH_VOLUME] >= 2) | high_volatility
+    confidence[VOLATILITY_TRADING] = np.minimum(0.4 + (change_range * 0.05), 0.75)
+    eligible[EVENT_DRIVEN] = events > 2
+    confidence[EVENT_DRIVEN] = np.minimum(0.3 + (events * 0.05), 0.7)
+    eligible[DEFENSIVE] = ~eligible[:DEFENSIVE].any(axis=0) | (avg_change < 0)
+    confidence[DEFENSIVE] = 0.6
+    confidence[~eligible] = np.nan
+
+    # argmax returns the first maximum, like max() over the candidates in rule order
+    columns = np.arange(n)
+    primary = np.argmax(np.where(eligible, confidence, -np.inf), axis=0)
+    primary_confidence = confidence[primary, columns]
+
+    # Alternatives are the 2nd and 3rd candidates in rule order, not the runners-up
+    rank = np.cumsum(eligible, axis=0, dtype=np.int8)
+    alternatives = np.full((2, n), -1, dtype=np.int64)
+    for k in range(2):
+        slot = eligible & (rank == k + 2)
+        alternatives[k] = np.where(slot.any(axis=0), np.argmax(slot, axis=0), -1)
+    alternative_confidence = np.where(alternatives >= 0, confidence[alternatives.clip(0), columns], np.nan)
+
+    return {
+        'regime': regime,
+        'regime_confidence': regime_confidence,
+        'primary': primary,
+        'primary_confidence': primary_confidence,
+        'alternatives': alternatives.T,
+        'alternative_confidence': alternative_confidence.T,
+        'eligible': eligible.T,
+        'confidence': confidence.T
+    }
+
+
+def replayed_recommendation(replay: Dict[str, np.ndarray], row: int) -> Dict:
+    """select_strategies-shaped result for one row of a replay"""
+    def strategy(code: int, confidence: float) -> Dict:
+        name = STRATEGY_NAMES[code]
+        return {
+            "name": name,
+            "confidence_score": float(confidence),
+            "risk_level": STRATEGY_PROFILES[name][0],
+            "timeframe": STRATEGY_PROFILES[name][1]
+        }
+
+    eligible = np.flatnonzero(replay['eligible'][row])
+    strategies = [strategy(code, replay['confidence'][row, code]) for code in eligible]
+    return {
+        "regime": REGIMES[replay['regime'][row]],
+        "regime_confidence": float(replay['regime_confidence'][row]),
+        "strategies": strategies,
+        "primary_strategy": strategy(replay['primary'][row], replay['primary_confidence'][row]),
+        "alternative_strategies": strategies[1:3]
+    }
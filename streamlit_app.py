@@ -8,8 +8,8 @@ import os
 import requests
 import time
 import random 
-import yfinance as yf
 import numpy as np
+from bar_store import BarStore
 
 def calculate_rsi(prices, window=14):
     """Calculate RSI (Relative Strength Index)"""
@@ -44,11 +44,14 @@ def get_dynamic_market_data():
     try:
         print("🔄 Fetching live market data from Yahoo Finance...")
         
+        # Only the bars missing from the local store are downloaded
+        bar_store = BarStore(interval='1d')
+        bar_store.update(tickers, max_age=60)
+        
         for ticker in tickers:
             try:
-                # Get ticker object and historical data
-                stock = yf.Ticker(ticker)
-                hist = stock.history(period="1mo", interval="1d")
+                # Last month of daily bars from the local store
+                hist = bar_store.frame(ticker, days=31)
                 
                 if hist.empty or len(hist) < 2:
                     raise Exception(f"Insufficient data for {ticker}")
@@ -0,0 +1,21 @@
+from datetime import datetime, timedelta
+
+from backfill import INTERVALS, plan_chunks
+
+
+def test_chunk_keys_survive_a_resume_on_a_later_day():
+    for interval in INTERVALS:
+        today = {chunk.key for chunk in plan_chunks(['SPY', 'QQQ'], [interval], 2, now=datetime(2026, 10, 15))}
+        tomorrow = {chunk.key for chunk in plan_chunks(['SPY', 'QQQ'], [interval], 2, now=datetime(2026, 10, 16))}
+        # Only the clamped first window and the window ending today may move
+        assert len(today - tomorrow) <= 2, interval
+
+
+def test_intraday_chunks_stay_inside_the_served_history():
+    now = datetime(2026, 10, 16)
+    for interval, (max_days, chunk_days, warmup_days) in INTERVALS.items():
+        chunks = plan_chunks(['SPY'], [interval], 10, now=now)
+        assert all(later.start == earlier.end for earlier, later in zip(chunks, chunks[1:])), interval
+        assert all(chunk.end - chunk.start <= timedelta(days=chunk_days) for chunk in chunks), interval
+        if max_days is not None:
+            assert chunks[0].start >= now + timedelta(days=1) - timedelta(days=max_days - warmup_days), interval
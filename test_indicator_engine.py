@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from indicator_engine import BarPanel, IncrementalIndicatorState, finalize_indicators, latest_panel_indicators
+
+
+def per_symbol_indicators(hist: pd.DataFrame):
+    """The per-symbol pandas calculation of MarketDataFetcher.calculate_technical_indicators"""
+    delta = hist['Close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    return {
+        'sma_20': float(hist['Close'].rolling(20).mean().iloc[-1]),
+        'sma_50': float(hist['Close'].rolling(50).mean().iloc[-1]),
+        'rsi': float(100 - (100 / (1 + (gain / loss).iloc[-1]))),
+        'volume_sma_20': float(hist['Volume'].rolling(20).mean().iloc[-1])
+    }
+
+
+def uneven_panel(seed: int = 11):
+    """Three symbols on the union of their timestamps, with holes inside the indicator windows"""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2026-06-01', periods=90, freq='D', tz='UTC')
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.02, (90, 3)), axis=0)
+    volume = rng.integers(1_000_000, 5_000_000, (90, 3)).astype(np.float64)
+    close[[70, 81, 88], 1] = np.nan   # Missing days inside the 20-bar window
+    close[:30, 2] = np.nan            # Listed later than the others
+    close[rng.choice(np.arange(30, 89), 10, replace=False), 2] = np.nan
+    volume[np.isnan(close)] = np.nan
+    return BarPanel(index, ['AAA', 'BBB', 'CCC'], close, close, close, close, volume)
+
+
+def test_uneven_panel_matches_per_symbol_history():
+    panel = uneven_panel()
+    latest = latest_panel_indicators(panel)
+    assert sorted(latest) == ['AAA', 'BBB', 'CCC']
+    for j, symbol in enumerate(panel.symbols):
+        rows = ~np.isnan(panel.close[:, j])
+        hist = pd.DataFrame({'Close': panel.close[rows, j], 'Volume': panel.volume[rows, j]})
+        expected = per_symbol_indicators(hist)
+        for name, value in expected.items():
+            np.testing.assert_allclose(latest[symbol][name], value, rtol=1e-9, equal_nan=True, err_msg=symbol)
+        assert finalize_indicators(latest[symbol], {'price': 100.0, 'volume': 2_000_000})['volume_sma_20'] > 0
+
+
+def test_symbols_without_the_latest_bar_or_enough_history_are_omitted():
+    panel = uneven_panel()
+    panel.close[-1, 0] = np.nan
+    panel.close[:-10, 1] = np.nan
+    assert sorted(latest_panel_indicators(panel)) == ['CCC']
+
+
+def test_incremental_state_matches_per_symbol_history():
+    rng = np.random.default_rng(5)
+    closes = 100 * np.cumprod(1 + rng.normal(0, 0.02, 1500))
+    volumes = rng.integers(1_000_000, 5_000_000, 1500).astype(np.float64)
+    state = IncrementalIndicatorState('AAA')
+    for i, (close, volume) in enumerate(zip(closes, volumes)):
+        if i >= 60 and i % 97 == 0:
+            # The live quote is applied provisionally on top of the completed bars
+            expected = per_symbol_indicators(pd.DataFrame({'Close': closes[:i + 1], 'Volume': volumes[:i + 1]}))
+            for name, value in state.values(close, volume).items():
+                np.testing.assert_allclose(value, expected[name], rtol=1e-9, err_msg=f"{name} at bar {i}")
+        state.update(close, volume, i)
+        if i >= 60 and i % 89 == 0:
+            expected = per_symbol_indicators(pd.DataFrame({'Close': closes[:i + 1], 'Volume': volumes[:i + 1]}))
+            restored = IncrementalIndicatorState.from_document(state.to_document())
+            for name, value in restored.values().items():
+                np.testing.assert_allclose(value, expected[name], rtol=1e-9, err_msg=f"{name} at bar {i}")
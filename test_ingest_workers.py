@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from ingest_workers import HashRing, WorkerRegistry
+
+UNIVERSE = [f"SYM{i:05d}" for i in range(10000)]
+
+
+def test_shards_partition_the_universe_in_order():
+    shards = HashRing(['w0', 'w1', 'w2', 'w3']).shards(UNIVERSE)
+    assert sorted(symbol for shard in shards.values() for symbol in shard) == UNIVERSE
+    for shard in shards.values():
+        assert shard == sorted(shard)
+        # 128 virtual nodes keep every shard within about 25% of an even split
+        assert abs(len(shard) - len(UNIVERSE) / 4) < 0.25 * len(UNIVERSE) / 4
+    # The mapping only depends on the member ids, not on their order
+    assert HashRing(['w3', 'w1', 'w0', 'w2', 'w1']).shards(UNIVERSE) == shards
+
+
+def test_adding_a_worker_only_moves_symbols_to_it():
+    for workers in (1, 3, 8):
+        members = [f"host-{i}" for i in range(workers)]
+        before = HashRing(members)
+        after = HashRing(members + ['host-new'])
+        moved = [symbol for symbol in UNIVERSE if before.node_for(symbol) != after.node_for(symbol)]
+        assert all(after.node_for(symbol) == 'host-new' for symbol in moved)
+        expected = len(UNIVERSE) / (workers + 1)
+        assert 0.7 * expected < len(moved) < 1.3 * expected, workers
+
+
+def test_removing_a_worker_only_moves_its_symbols():
+    members = [f"host-{i}" for i in range(5)]
+    before = HashRing(members)
+    after = HashRing(members[:2] + members[3:])
+    for symbol in UNIVERSE:
+        if before.node_for(symbol) != 'host-2':
+            assert after.node_for(symbol) == before.node_for(symbol)
+
+
+def test_empty_ring_owns_nothing():
+    assert HashRing([]).node_for('SPY') is None
+    assert HashRing([]).shards(['SPY']) == {}
+
+
+def test_registry_drops_workers_without_a_recent_heartbeat():
+    mongomock = pytest.importorskip('mongomock')
+    collection = mongomock.MongoClient()['test']['ingest_workers']
+    registry = WorkerRegistry(collection, stale_after=30)
+    registry.heartbeat('b')
+    registry.heartbeat('a')
+    collection.insert_one({'_id': 'stale', 'heartbeat': datetime.utcnow() - timedelta(seconds=31)})
+    assert registry.live_workers() == ['a', 'b']
+    registry.leave('a')
+    assert registry.live_workers() == ['b']
+
+
+def test_shard_rate_limits_add_up_to_the_provider_limit():
+    mongomock = pytest.importorskip('mongomock')
+    from data_providers import SyntheticProvider
+    from market_data_fetcher import MarketDataFetcher
+
+    provider = SyntheticProvider()
+    fetcher = MarketDataFetcher(None, None, symbols=[], quote_provider=provider, bar_provider=provider,
+                                database=mongomock.MongoClient()['test'], hedge_delay=None)
+    assert fetcher.symbols == []
+    fetcher._full_quota = (5, 25, 60)
+    for workers in (1, 3, 8):
+        shares = []
+        for slot in range(workers):
+            fetcher.assign_shard([], slot=slot, slots=workers)
+            shares.append((fetcher.quota_planner.per_minute, fetcher.quota_planner.per_day,
+                           fetcher.priority_scheduler.max_calls_per_minute))
+        assert [sum(column) for column in zip(*shares)] == [5, 25, 60], workers
+        assert max(shares)[0] - min(shares)[0] <= 1
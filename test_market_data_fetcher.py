@@ -0,0 +1,110 @@
+import threading
+from types import SimpleNamespace
+
+from pymongo import InsertOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from market_data_fetcher import MarketDataBatchWriter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_bursts_then_paces_at_the_refill_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(5, 5 / 60, clock=clock, sleep=clock.sleep)
+    assert all(bucket.try_acquire() for _ in range(5))
+    assert not bucket.try_acquire()
+
+    assert bucket.acquire()
+    assert clock.slept == [12.0]
+    clock.now += 6
+    assert not bucket.try_acquire()
+    clock.now += 600
+    # Idle time never earns more than a burst
+    assert sum(bucket.try_acquire() for _ in range(10)) == 5
+
+
+def test_token_bucket_timeout_and_cancel_take_nothing():
+    clock = FakeClock()
+    bucket = TokenBucket(1, 0.1, clock=clock, sleep=clock.sleep)
+    assert bucket.try_acquire()
+    assert not bucket.acquire(timeout=4)
+    assert clock.slept == [4]
+
+    cancelled = threading.Event()
+    cancelled.set()
+    assert not bucket.acquire(cancel_event=cancelled)
+    clock.now += 6
+    assert bucket.try_acquire()
+
+
+def test_token_bucket_set_rate_keeps_earned_tokens():
+    clock = FakeClock()
+    bucket = TokenBucket(10, 1, clock=clock, sleep=clock.sleep)
+    for _ in range(8):
+        bucket.try_acquire()
+    bucket.set_rate(4, 0.5)
+    assert sum(bucket.try_acquire() for _ in range(4)) == 2
+    clock.now += 100
+    assert sum(bucket.try_acquire() for _ in range(10)) == 4
+
+
+class FakeCollection:
+    """Records bulk writes; documents whose _id is in fail_ids are rejected"""
+
+    def __init__(self, fail_ids=()):
+        self.fail_ids = set(fail_ids)
+        self.batches = []
+
+    def bulk_write(self, operations, ordered=True):
+        assert not ordered
+        self.batches.append(operations)
+        documents = [op._doc for op in operations]
+        errors = [{'index': i, 'code': 11000, 'errmsg': 'duplicate'}
+                  for i, doc in enumerate(documents) if doc.get('_id') in self.fail_ids]
+        written = len(operations) - len(errors)
+        if errors:
+            raise BulkWriteError({'nInserted': 0, 'nUpserted': written, 'nMatched': 0, 'writeErrors': errors})
+        return SimpleNamespace(inserted_count=0, upserted_count=written, matched_count=0)
+
+
+def test_batch_writer_flushes_by_size_and_upserts_by_id():
+    collection = FakeCollection()
+    writer = MarketDataBatchWriter(collection, flush_size=3)
+    for i in range(7):
+        writer.add({'_id': f"SPY_{i}", 'price': i})
+    assert [len(batch) for batch in collection.batches] == [3, 3]
+    assert writer.flush() == 1
+    assert writer.flush() == 0
+    assert writer.written == 7
+    assert all(isinstance(op, ReplaceOne) and op._filter == {'_id': op._doc['_id']}
+               for batch in collection.batches for op in batch)
+
+
+def test_batch_writer_records_failed_documents_and_keeps_the_rest():
+    collection = FakeCollection(fail_ids={'QQQ_1'})
+    writer = MarketDataBatchWriter(collection)
+    for doc_id in ('SPY_1', 'QQQ_1', 'IWM_1'):
+        writer.add({'_id': doc_id})
+    assert writer.flush() == 2
+    assert writer.errors == [{'_id': 'QQQ_1', 'code': 11000, 'message': 'duplicate'}]
+
+
+def test_batch_writer_insert_only_drops_the_id():
+    collection = FakeCollection()
+    writer = MarketDataBatchWriter(collection, insert_only=True)
+    writer.add({'_id': 'SPY_1', 'price': 1})
+    writer.flush()
+    (operation,), = collection.batches
+    assert isinstance(operation, InsertOne) and operation._doc == {'price': 1}
@@ -0,0 +1,97 @@
+from datetime import date, datetime, timezone
+
+from market_scheduler import MARKET_TZ, IngestScheduler, MarketCalendar, nyse_early_closes, nyse_holidays
+
+
+def et(*args) -> datetime:
+    return datetime(*args, tzinfo=MARKET_TZ)
+
+
+def test_nyse_holidays():
+    assert nyse_holidays(2025) == {
+        date(2025, 1, 1), date(2025, 1, 20), date(2025, 2, 17), date(2025, 4, 18), date(2025, 5, 26),
+        date(2025, 6, 19), date(2025, 7, 4), date(2025, 9, 1), date(2025, 11, 27), date(2025, 12, 25)
+    }
+    # Independence Day on a Saturday is observed on Friday July 3rd
+    assert date(2026, 7, 3) in nyse_holidays(2026)
+    # New Year's Day on a Saturday is not observed on the Friday before
+    assert date(2021, 12, 31) not in nyse_holidays(2021) | nyse_holidays(2022)
+    # Juneteenth only from 2022
+    assert date(2021, 6, 18) not in nyse_holidays(2021)
+    assert date(2022, 6, 20) in nyse_holidays(2022)
+
+
+def test_early_closes():
+    assert nyse_early_closes(2025) == {date(2025, 7, 3), date(2025, 11, 28), date(2025, 12, 24)}
+    # July 3rd 2026 is the observed holiday, not a half day
+    assert nyse_early_closes(2026) == {date(2026, 11, 27), date(2026, 12, 24)}
+    assert MarketCalendar().session(date(2026, 11, 27)) == (et(2026, 11, 27, 9, 30), et(2026, 11, 27, 13, 0))
+
+
+def test_sessions_and_weekends():
+    calendar = MarketCalendar()
+    assert calendar.session(date(2026, 10, 17)) is None   # Saturday
+    assert calendar.session(date(2026, 4, 3)) is None     # Good Friday
+    assert calendar.is_open(et(2026, 10, 16, 9, 30))
+    assert not calendar.is_open(et(2026, 10, 16, 16, 0))
+    assert calendar.next_open(et(2026, 10, 16, 16, 0)) == et(2026, 10, 19, 9, 30)
+    assert calendar.next_open(et(2026, 4, 2, 17, 0)) == et(2026, 4, 6, 9, 30)
+
+
+def test_slots_align_to_the_session():
+    scheduler = IngestScheduler(5, 60)
+    assert scheduler.next_slot(et(2026, 10, 16, 10, 2)) == et(2026, 10, 16, 10, 5)
+    assert scheduler.next_slot(et(2026, 10, 16, 10, 5)) == et(2026, 10, 16, 10, 10)
+    assert scheduler.next_slot(et(2026, 10, 16, 8, 59)) == et(2026, 10, 16, 9, 0)
+    assert scheduler.next_slot(et(2026, 10, 16, 9, 10)) == et(2026, 10, 16, 9, 30)
+    # A slot at the close, then the off-hours cadence
+    assert scheduler.slots_between(et(2026, 10, 16, 15, 50), et(2026, 10, 16, 17, 30)) == [
+        et(2026, 10, 16, 15, 55), et(2026, 10, 16, 16, 0), et(2026, 10, 16, 17, 0)
+    ]
+    # Intervals that do not divide the session still stop at an early close
+    assert IngestScheduler(45, 60).next_slot(et(2026, 11, 27, 12, 50)) == et(2026, 11, 27, 13, 0)
+
+
+def test_without_off_hours_cadence_slots_wait_for_the_next_open():
+    scheduler = IngestScheduler(5, None)
+    assert scheduler.next_slot(et(2026, 10, 16, 16, 0)) == et(2026, 10, 19, 9, 30)
+    # Across the spring DST change the open stays at 09:30 exchange time
+    friday_close = et(2026, 3, 6, 16, 30)
+    monday_open = scheduler.next_slot(friday_close)
+    assert monday_open == et(2026, 3, 9, 9, 30)
+    assert monday_open.astimezone(timezone.utc).hour == 13
+    assert friday_close.astimezone(timezone.utc).hour == 21
+
+
+def test_off_hours_slots_across_the_autumn_dst_change():
+    scheduler = IngestScheduler(5, 60)
+    # 2026-11-01 01:00-02:00 happens twice; slots stay on wall-clock hours
+    slots = scheduler.slots_between(et(2026, 10, 31, 23, 30), et(2026, 11, 1, 4, 0))
+    assert [slot.astimezone(MARKET_TZ).hour for slot in slots] == [0, 1, 2, 3, 4]
+    assert all(later > earlier for earlier, later in zip(slots, slots[1:]))
+
+
+class FakeClock:
+    def __init__(self, now: datetime):
+        self.now = now.timestamp()
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+def test_run_starts_with_a_cycle_and_catches_up_once():
+    clock = FakeClock(et(2026, 10, 16, 10, 2))
+    scheduler = IngestScheduler(5, 60, clock=clock, sleep=clock.sleep)
+    started = []
+
+    def cycle():
+        started.append(datetime.fromtimestamp(clock.now, MARKET_TZ))
+        if len(started) == 2:
+            clock.now += 12 * 60  # A slow cycle misses two slots
+
+    scheduler.run(cycle, max_cycles=4)
+    assert started == [et(2026, 10, 16, 10, 2), et(2026, 10, 16, 10, 5),
+                       et(2026, 10, 16, 10, 20), et(2026, 10, 16, 10, 25)]
@@ -0,0 +1,111 @@
+import pytest
+
+from data_providers import MarketDataProvider, QuotaExhaustedError, SyntheticProvider
+from market_data_fetcher import AlphaVantageQuotaPlanner
+
+SYMBOLS = ['SPY', 'QQQ', 'IWM', 'DIA', 'XLF', 'XLK', 'XLE']
+DAY = 86400
+NOON = 20000 * DAY + DAY / 2  # Epoch seconds at 12:00 UTC
+
+
+class FakeClock:
+    def __init__(self, now: float = NOON):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def routes(plan, route):
+    return [symbol for symbol, planned in plan.items() if planned == route]
+
+
+def test_minute_limit_caps_a_cycle_until_calls_expire():
+    clock = FakeClock()
+    planner = AlphaVantageQuotaPlanner(per_minute=5, per_day=500, clock=clock)
+    plan = planner.plan_cycle(SYMBOLS, cycles_left=1)
+    assert routes(plan, 'alpha_vantage') == SYMBOLS[:5]
+    assert routes(plan, 'yahoo_finance') == SYMBOLS[5:]
+
+    for _ in range(5):
+        planner.record_call()
+    assert routes(planner.plan_cycle(SYMBOLS, cycles_left=1), 'alpha_vantage') == []
+    clock.now += 59
+    assert planner.remaining()['minute'] == 0
+    clock.now += 1
+    assert planner.remaining()['minute'] == 5
+
+
+def test_day_limit_and_reset_at_midnight_utc():
+    clock = FakeClock()
+    planner = AlphaVantageQuotaPlanner(per_minute=100, per_day=3, clock=clock)
+    assert len(routes(planner.plan_cycle(SYMBOLS, cycles_left=1), 'alpha_vantage')) == 3
+    for _ in range(3):
+        planner.record_call()
+    assert planner.remaining()['day'] == 0
+    assert routes(planner.plan_cycle(SYMBOLS, cycles_left=1), 'alpha_vantage') == []
+
+    clock.now = (clock.now // DAY + 1) * DAY
+    assert planner.remaining()['day'] == 3
+
+
+def test_daily_allowance_is_spread_and_carried_between_cycles():
+    clock = FakeClock()
+    planner = AlphaVantageQuotaPlanner(per_minute=100, per_day=10, clock=clock)
+    planned = []
+    for cycles_left in (8, 7, 6, 5):
+        # Calls left / cycles left per cycle (1.25, 1.29, 1.33, 1.4), the fractions carry over
+        plan = planner.plan_cycle(SYMBOLS, cycles_left=cycles_left)
+        planned.append(len(routes(plan, 'alpha_vantage')))
+        for _ in range(planned[-1]):
+            planner.record_call()
+    assert planned == [1, 1, 1, 2]
+
+    # A new day starts from a fresh allowance, not on top of yesterday's fraction
+    assert planner.allowance_carry > 0
+    clock.now = (clock.now // DAY + 1) * DAY
+    assert len(routes(planner.plan_cycle(SYMBOLS, cycles_left=1), 'alpha_vantage')) == len(SYMBOLS)
+    assert planner.allowance_carry == 10 - len(SYMBOLS)
+
+
+def test_excluded_and_recently_refreshed_symbols():
+    clock = FakeClock()
+    planner = AlphaVantageQuotaPlanner(per_minute=100, per_day=100, min_refresh_seconds=300, clock=clock)
+    planner.record_refresh('SPY')
+    clock.now += 299
+    plan = planner.plan_cycle(SYMBOLS[:3], excluded={'QQQ'}, cycles_left=1)
+    assert plan == {'SPY': 'fresh', 'QQQ': 'yahoo_finance', 'IWM': 'alpha_vantage'}
+    clock.now += 1
+    assert planner.plan_cycle(['SPY'], cycles_left=1) == {'SPY': 'alpha_vantage'}
+
+
+class ExhaustedProvider(MarketDataProvider):
+    name = 'stub'
+    daily_quota = 25
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_quote(self, symbol):
+        self.calls += 1
+        raise QuotaExhaustedError("daily limit reached")
+
+
+def test_exhausted_provider_routes_everything_to_yahoo_finance():
+    mongomock = pytest.importorskip('mongomock')
+    from market_data_fetcher import MarketDataFetcher
+
+    clock = FakeClock()
+    provider = ExhaustedProvider()
+    planner = AlphaVantageQuotaPlanner(per_minute=5, per_day=25, clock=clock)
+    fetcher = MarketDataFetcher(None, None, symbols=SYMBOLS, quote_provider=provider,
+                                bar_provider=SyntheticProvider(), quota_planner=planner,
+                                database=mongomock.MongoClient()['test'], hedge_delay=None)
+    assert routes(planner.plan_cycle(SYMBOLS, cycles_left=1), 'alpha_vantage') == SYMBOLS[:5]
+
+    assert fetcher.fetch_alpha_vantage_data('SPY') is None
+    assert provider.calls == 1
+    assert planner.remaining()['day'] == 0
+    assert set(planner.plan_cycle(SYMBOLS, cycles_left=1).values()) == {'yahoo_finance'}
+    clock.now = (clock.now // DAY + 1) * DAY
+    assert planner.remaining()['day'] == 25
@@ -0,0 +1,58 @@
+import numpy as np
+
+from strategy_rules import (REGIMES, STRATEGY_NAMES, feature_matrix, replay_strategies, replayed_recommendation,
+                            select_strategies)
+
+
+def random_strategy_features(count: int, seed: int = 7):
+    """Strategy rule inputs that land on and around every rule threshold"""
+    rng = np.random.default_rng(seed)
+
+    def around(thresholds, spread):
+        # Half exact thresholds (ties, boundaries), half continuous values
+        exact = rng.choice(thresholds, count)
+        return np.where(rng.random(count) < 0.5, exact, exact + rng.normal(0, spread, count))
+
+    confidences = np.round(rng.uniform(0.6, 1.0, count), 2)
+    return [{
+        'avg_change': float(avg_change),
+        'avg_rsi': float(avg_rsi),
+        'change_range': float(change_range),
+        'strong_trends': int(strong_trends),
+        'up_trends': int(up_trends),
+        'high_volume': int(high_volume),
+        'events': int(events),
+        'high_volatility': bool(high_volatility),
+        'volatility_confidence': float(confidence)
+    } for avg_change, avg_rsi, change_range, strong_trends, up_trends, high_volume, events, high_volatility, confidence
+        in zip(around([-0.5, 0.0, 0.5, 0.8, 2.0, 4.0], 0.5), around([30.0, 55.0, 60.0, 75.0], 8.0),
+               np.abs(around([0.0, 2.0, 6.0, 7.0], 1.0)), rng.integers(0, 5, count), rng.integers(0, 5, count),
+               rng.integers(0, 5, count), rng.integers(0, 6, count), rng.random(count) < 0.2, confidences)]
+
+
+def test_replay_matches_scalar_rules():
+    rows = random_strategy_features(20000)
+    replay = replay_strategies(feature_matrix(rows))
+    for i, row in enumerate(rows):
+        expected = select_strategies(row)
+        assert REGIMES[replay['regime'][i]] == expected['regime'], row
+        assert replay['regime_confidence'][i] == expected['regime_confidence'], row
+        assert STRATEGY_NAMES[replay['primary'][i]] == expected['primary_strategy']['name'], row
+        assert replay['primary_confidence'][i] == expected['primary_strategy']['confidence_score'], row
+        assert [STRATEGY_NAMES[code] for code in replay['alternatives'][i] if code >= 0] == \
+            [strategy['name'] for strategy in expected['alternative_strategies']], row
+        assert [replay['confidence'][i, STRATEGY_NAMES.index(strategy['name'])] for strategy in expected['strategies']] \
+            == [strategy['confidence_score'] for strategy in expected['strategies']], row
+
+
+def test_replayed_recommendation_matches_scalar_rules():
+    rows = random_strategy_features(2000, seed=3)
+    replay = replay_strategies(feature_matrix(rows))
+    for i, row in enumerate(rows):
+        assert replayed_recommendation(replay, i) == select_strategies(row), row
+
+
+def test_replay_of_no_snapshots():
+    replay = replay_strategies(feature_matrix([]))
+    assert replay['primary'].shape == (0,)
+    assert replay['alternatives'].shape == (0, 2)
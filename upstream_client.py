@@ -0,0 +1,209 @@
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes worth retrying: rate limited or transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class ProviderConfig:
+    def __init__(self, connect_timeout: float = 3.05, read_timeout: float = 10.0,
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_cap: float = 8.0,
+                 pool_size: int = 10, retry_budget_ratio: float = 0.2, max_retry_tokens: float = 10.0):
+        """
+        Connection, timeout and retry settings for one upstream provider
+
+        Args:
+            connect_timeout: Seconds to wait for a TCP/TLS connection
+            read_timeout: Seconds to wait between bytes of the response
+            max_retries: Retries per request after the first attempt
+            backoff_base: Base delay for exponential backoff
+            backoff_cap: Maximum delay between attempts
+            pool_size: Keep-alive connections kept per host
+            retry_budget_ratio: Retries earned per request, so retries stay a
+                bounded fraction of traffic when a provider is down
+            max_retry_tokens: Retry tokens available up front and the most that
+                can be saved up
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.pool_size = pool_size
+        self.retry_budget_ratio = retry_budget_ratio
+        self.max_retry_tokens = max_retry_tokens
+
+
+PROVIDER_CONFIGS = {
+    # No retries: every Alpha Vantage attempt spends quota, and the quota planner
+    # only charges one call per quote
+    'alpha_vantage': ProviderConfig(connect_timeout=3.05, read_timeout=10.0, max_retries=0),
+    'newsapi': ProviderConfig(connect_timeout=3.05, read_timeout=15.0, max_retries=1, pool_size=4),
+    'default': ProviderConfig()
+}
+
+
+class LatencyStats:
+    def __init__(self, window: int = 500):
+        """Rolling request latency and outcome counters for one provider"""
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.lock = threading.Lock()
+
+    def record(self, elapsed: float, ok: bool, retries: int):
+        with self.lock:
+            self.latencies.append(elapsed)
+            self.requests += 1
+            self.retries += retries
+            if not ok:
+                self.errors += 1
+
+    def summary(self) -> Dict:
+        with self.lock:
+            latencies = sorted(self.latencies)
+            requests_count, errors, retries = self.requests, self.errors, self.retries
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        return {
+            'requests': requests_count,
+            'errors': errors,
+            'retries': retries,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(latencies[-1] * 1000, 1) if latencies else None
+        }
+
+
+class UpstreamClient:
+    def __init__(self, configs: Optional[Dict[str, ProviderConfig]] = None):
+        """
+        Shared HTTP layer for all upstream providers
+
+        Each provider gets its own keep-alive session, timeouts and retry
+        budget, and every request is recorded in per-provider latency stats.
+
+        Args:
+            configs: Provider name to ProviderConfig (defaults to PROVIDER_CONFIGS)
+        """
+        self.configs = dict(configs or PROVIDER_CONFIGS)
+        self.sessions = {}
+        self.stats = {}
+        self.retry_tokens = {}
+        self.lock = threading.Lock()
+
+    def config(self, provider: str) -> ProviderConfig:
+        return self.configs.get(provider) or self.configs.get('default') or ProviderConfig()
+
+    def session(self, provider: str) -> requests.Session:
+        """Keep-alive session for a provider, created on first use"""
+        with self.lock:
+            if provider not in self.sessions:
+                config = self.config(provider)
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=config.pool_size, pool_maxsize=config.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self.sessions[provider] = session
+                self.stats[provider] = LatencyStats()
+                self.retry_tokens[provider] = config.max_retry_tokens
+            return self.sessions[provider]
+
+    def _take_retry_token(self, provider: str) -> bool:
+        with self.lock:
+            if self.retry_tokens[provider] >= 1:
+                self.retry_tokens[provider] -= 1
+                return True
+            return False
+
+    def _earn_retry_tokens(self, provider: str, config: ProviderConfig):
+        with self.lock:
+            self.retry_tokens[provider] = min(
+                config.max_retry_tokens,
+                self.retry_tokens[provider] + config.retry_budget_ratio
+            )
+
+    def _backoff(self, config: ProviderConfig, attempt: int, response: Optional[requests.Response]) -> float:
+        """Full-jitter exponential backoff, honouring a short Retry-After header"""
+        delay = random.uniform(0, min(config.backoff_cap, config.backoff_base * (2 ** attempt)))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), config.backoff_cap))
+        return delay
+
+    def get(self, provider: str, url: str, params: Optional[Dict] = None, **kwargs) -> requests.Response:
+        """
+        GET with the provider's pooled session, timeouts and bounded retries
+
+        Args:
+            provider: Provider name (e.g. 'alpha_vantage', 'newsapi')
+            url: Request URL
+            params: Query parameters
+            **kwargs: Extra arguments for requests.Session.get
+
+        Returns:
+            The final response (possibly a non-2xx one once retries are spent)
+
+        Raises:
+            requests.exceptions.RequestException: If the last attempt failed
+                with a connection error or timeout
+        """
+        config = self.config(provider)
+        session = self.session(provider)
+        kwargs.setdefault('timeout', (config.connect_timeout, config.read_timeout))
+        self._earn_retry_tokens(provider, config)
+
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            response = None
+            error = None
+            try:
+                response = session.get(url, params=params, **kwargs)
+                retryable = response.status_code in RETRY_STATUS_CODES
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+                retryable = True
+            except requests.exceptions.RequestException:
+                self.stats[provider].record(time.monotonic() - started, False, attempt)
+                raise
+
+            if not retryable or attempt >= config.max_retries or not self._take_retry_token(provider):
+                ok = error is None and response.status_code < 400
+                self.stats[provider].record(time.monotonic() - started, ok, attempt)
+                if error is not None:
+                    raise error
+                return response
+
+            time.sleep(self._backoff(config, attempt, response))
+            attempt += 1
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Latency and error summary per provider"""
+        with self.lock:
+            stats = dict(self.stats)
+        return {provider: provider_stats.summary() for provider, provider_stats in stats.items()}
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_upstream_client() -> UpstreamClient:
+    """Process-wide UpstreamClient shared by all modules"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = UpstreamClient()
+        return _shared_client
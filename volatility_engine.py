@@ -0,0 +1,233 @@
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from indicator_engine import BarPanel, bar_timestamps
+
+TRADING_DAYS = 252
+GARMAN_KLASS_K = 2 * math.log(2) - 1
+
+# Thresholds of the high_volatility regime (see MARKET_REGIME_EXPLANATIONS in main.py)
+VIX_HIGH = 25.0
+REALIZED_HIGH = 0.25  # Annualized, comparable to VIX / 100
+DAILY_MOVE_HIGH = 2.0  # Percent
+
+# Per-bar terms kept in the rolling window
+LOG_RETURN, SQUARED_RETURN, PARKINSON, GARMAN_KLASS = range(4)
+
+
+class VolatilityState:
+    # Recompute running sums from the window this often to stop float drift
+    RESUM_INTERVAL = 1000
+
+    def __init__(self, symbols: Sequence[str], window: int = 20, atr_window: int = 14):
+        """
+        Rolling volatility estimators for a whole universe, updated in O(N) per bar
+
+        Every bar adds one column of terms per symbol to a (terms, window, N)
+        ring buffer and adjusts running sums, so close-to-close, Parkinson
+        and Garman-Klass volatility and Wilder ATR never rescan history.
+        Symbols without a bar in a row are left unchanged.
+
+        Args:
+            symbols: Symbols in column order
+            window: Bars in the rolling volatility window
+            atr_window: Wilder ATR period
+        """
+        self.symbols = list(symbols)
+        self.window = window
+        self.atr_window = atr_window
+        n = len(self.symbols)
+        self.terms = np.zeros((4, window, n))
+        self.present = np.zeros((4, window, n), dtype=bool)
+        self.sums = np.zeros((4, n))
+        self.counts = np.zeros((4, n), dtype=np.int64)
+        self.heads = np.zeros(n, dtype=np.int64)
+        self.atr = np.full(n, np.nan)
+        self.true_ranges = np.zeros(n, dtype=np.int64)
+        self.last_close = np.full(n, np.nan)
+        self.last_bar_ts = None  # Bar timestamp as int nanoseconds since epoch (UTC)
+        self.updates_since_resum = 0
+
+    def _step(self, open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray):
+        """Terms, sums, counts and ATR after adding a row of bars (no mutation)"""
+        valid = ~(np.isnan(open_) | np.isnan(high) | np.isnan(low) | np.isnan(close))
+        cols = np.flatnonzero(valid)
+        o, h, l, c = open_[cols], high[cols], low[cols], close[cols]
+        previous = self.last_close[cols]
+        has_previous = ~np.isnan(previous)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_return = np.log(c / previous)
+            log_range = np.log(h / l)
+            log_body = np.log(c / o)
+        new = np.stack([
+            log_return,
+            log_return ** 2,
+            log_range ** 2 / (4 * math.log(2)),
+            0.5 * log_range ** 2 - GARMAN_KLASS_K * log_body ** 2
+        ])
+        new_present = np.stack([has_previous, has_previous, np.ones_like(has_previous), np.ones_like(has_previous)])
+        new = np.where(new_present & np.isfinite(new), new, 0.0)
+
+        heads = self.heads[cols]
+        old = self.terms[:, heads, cols]
+        old_present = self.present[:, heads, cols]
+        sums = self.sums.copy()
+        counts = self.counts.copy()
+        sums[:, cols] += new - np.where(old_present, old, 0.0)
+        counts[:, cols] += new_present.astype(np.int64) - old_present
+
+        # Wilder ATR: the first atr_window true ranges seed a simple mean
+        true_range = np.where(has_previous, np.fmax(h - l, np.fmax(np.abs(h - previous), np.abs(l - previous))), h - l)
+        seen = self.true_ranges[cols] + 1
+        atr = self.atr.copy()
+        previous_atr = np.nan_to_num(atr[cols])
+        period = np.minimum(seen, self.atr_window)
+        atr[cols] = (previous_atr * (period - 1) + true_range) / period
+        return cols, new, new_present, sums, counts, atr
+
+    def update(self, open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+               bar_ts: Optional[int] = None):
+        """
+        Commit a row of completed bars
+
+        Args:
+            open_, high, low, close: (N,) bar values in symbol order (NaN = no bar)
+            bar_ts: Bar timestamp in nanoseconds since epoch
+        """
+        cols, new, new_present, self.sums, self.counts, self.atr = self._step(open_, high, low, close)
+        heads = self.heads[cols]
+        self.terms[:, heads, cols] = new
+        self.present[:, heads, cols] = new_present
+        self.heads[cols] = (heads + 1) % self.window
+        self.true_ranges[cols] += 1
+        self.last_close[cols] = close[cols]
+        self.last_bar_ts = bar_ts
+
+        self.updates_since_resum += 1
+        if self.updates_since_resum >= self.RESUM_INTERVAL:
+            self.sums = np.where(self.present, self.terms, 0.0).sum(axis=1)
+            self.updates_since_resum = 0
+
+    def values(self, open_: Optional[np.ndarray] = None, high: Optional[np.ndarray] = None,
+               low: Optional[np.ndarray] = None, close: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Latest estimators, optionally including a provisional row of bars
+
+        Returns:
+            Dictionary of (N,) arrays: realized_volatility, parkinson_volatility
+            and garman_klass_volatility (annualized fractions), atr and
+            atr_percent (NaN while warming up)
+        """
+        sums, counts, atr, last_close = self.sums, self.counts, self.atr, self.last_close
+        if close is not None:
+            _, _, _, sums, counts, atr = self._step(open_, high, low, close)
+            last_close = np.where(np.isnan(close), last_close, close)
+
+        minimum = max(2, self.window // 2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            n = counts[LOG_RETURN]
+            variance = (sums[SQUARED_RETURN] - sums[LOG_RETURN] ** 2 / n) / (n - 1)
+            realized = np.where(n >= minimum, np.sqrt(np.maximum(variance, 0) * TRADING_DAYS), np.nan)
+            ranges = counts[PARKINSON]
+            parkinson = np.where(ranges >= minimum, np.sqrt(sums[PARKINSON] / ranges * TRADING_DAYS), np.nan)
+            garman_klass = np.where(ranges >= minimum,
+                                    np.sqrt(np.maximum(sums[GARMAN_KLASS] / ranges, 0) * TRADING_DAYS), np.nan)
+            seeded = self.true_ranges + (0 if close is None else ~np.isnan(close)) >= self.atr_window
+            atr = np.where(seeded, atr, np.nan)
+            return {
+                'realized_volatility': realized,
+                'parkinson_volatility': parkinson,
+                'garman_klass_volatility': garman_klass,
+                'atr': atr,
+                'atr_percent': atr / last_close * 100
+            }
+
+    @classmethod
+    def from_panel(cls, panel: BarPanel, window: int = 20, atr_window: int = 14,
+                   completed_rows: Optional[int] = None) -> 'VolatilityState':
+        """
+        Build the state from a bar panel in one pass down the time axis
+
+        Args:
+            panel: Daily bars for the universe
+            window: Bars in the rolling volatility window
+            atr_window: Wilder ATR period
+            completed_rows: Rows to commit (defaults to all)
+        """
+        state = cls(panel.symbols, window, atr_window)
+        state.sync(panel, completed_rows)
+        return state
+
+    def sync(self, panel: BarPanel, completed_rows: Optional[int] = None) -> int:
+        """
+        Commit the panel's rows that are newer than the last committed bar
+
+        Args:
+            panel: Daily bars with the same symbols as this state
+            completed_rows: Only rows before this index are committed
+
+        Returns:
+            Number of rows committed
+        """
+        timestamps = bar_timestamps(panel.index)
+        end = len(timestamps) if completed_rows is None else completed_rows
+        start = 0 if self.last_bar_ts is None else int(np.searchsorted(timestamps, self.last_bar_ts, side='right'))
+        for i in range(start, end):
+            self.update(panel.open[i], panel.high[i], panel.low[i], panel.close[i], int(timestamps[i]))
+        return max(0, end - start)
+
+
+def volatility_regime(vix_level: Optional[float], realized_volatility: List[Optional[float]],
+                      changes: List[float]) -> Dict:
+    """
+    Decide whether the market is in the high_volatility regime
+
+    Args:
+        vix_level: Latest VIX level (None if unavailable)
+        realized_volatility: Annualized realized volatility of the tracked ETFs
+        changes: Daily change percent of the tracked ETFs
+
+    Returns:
+        Dictionary with high_volatility (bool), confidence, the median
+        realized volatility and the VIX level
+    """
+    realized = [value for value in realized_volatility if value is not None and math.isfinite(value)]
+    median_realized = float(np.median(realized)) if realized else None
+    largest_move = max((abs(change) for change in changes), default=0.0)
+
+    votes = [
+        vix_level is not None and vix_level > VIX_HIGH,
+        median_realized is not None and median_realized > REALIZED_HIGH,
+        largest_move > DAILY_MOVE_HIGH
+    ]
+    high = sum(votes) >= 2 or (vix_level is not None and vix_level > VIX_HIGH * 1.2)
+    return {
+        'high_volatility': high,
+        'confidence': min(0.6 + 0.15 * sum(votes), 1.0),
+        'median_realized_volatility': median_realized,
+        'vix': vix_level
+    }
+
+
+def volatility_regime_batch(vix_levels: np.ndarray, median_realized: np.ndarray,
+                            largest_moves: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    volatility_regime over arrays of snapshots
+
+    Args:
+        vix_levels: VIX level per snapshot (NaN if unavailable)
+        median_realized: Median annualized realized volatility of the tracked ETFs (NaN if unknown)
+        largest_moves: Largest absolute daily change percent of the tracked ETFs
+
+    Returns:
+        Tuple of (high_volatility bool array, confidence array)
+    """
+    vix_levels = np.asarray(vix_levels, dtype=np.float64)
+    votes = ((vix_levels > VIX_HIGH).astype(np.int64)
+             + (np.asarray(median_realized) > REALIZED_HIGH)
+             + (np.asarray(largest_moves) > DAILY_MOVE_HIGH))
+    high = (votes >= 2) | (vix_levels > VIX_HIGH * 1.2)
+    return high, np.minimum(0.6 + 0.15 * votes, 1.0)